@@ -7,6 +7,8 @@ import streamlit as st
 from datetime import datetime, timedelta, timezone
 import json
 
+from utils.elements import element_relation
+
 st.set_page_config(
     page_title="Chart | Ming Qimen",
     page_icon="📈",
@@ -127,25 +129,16 @@ def calculate_ju_number(year, month, day, hour):
     base = (year + month + day + hour) % 9
     return base if base > 0 else 9
 
+# Energy score by element relationship of component to palace (see utils.elements)
+ENERGY_BY_RELATION = [3, 2, 0, -2, -3]
+
 def calculate_energy(comp_element, palace_element):
-    cycle = ["Wood", "Fire", "Earth", "Metal", "Water"]
-    if comp_element not in cycle or palace_element not in cycle:
+    relation = element_relation(comp_element, palace_element)
+    if relation < 0:
         return (0, ENERGY_LEVELS[0])
     
-    comp_idx = cycle.index(comp_element)
-    palace_idx = cycle.index(palace_element)
-    diff = (comp_idx - palace_idx) % 5
-    
-    if diff == 0:
-        return (3, ENERGY_LEVELS[3])
-    elif diff == 1:
-        return (2, ENERGY_LEVELS[2])
-    elif diff == 2:
-        return (0, ENERGY_LEVELS[0])
-    elif diff == 3:
-        return (-2, ENERGY_LEVELS[-2])
-    else:
-        return (-3, ENERGY_LEVELS[-3])
+    score = ENERGY_BY_RELATION[relation]
+    return (score, ENERGY_LEVELS[score])
 
 def get_nature_display(nature):
     if "Very Favorable" in str(nature):
@@ -9,6 +9,8 @@ import json
 import csv
 import io
 
+from utils.elements import element_relation, STRENGTH_NAMES, STRENGTH_VALUES
+
 st.set_page_config(
     page_title="Export | Ming Qimen",
     page_icon="📤",
@@ -22,16 +24,6 @@ def get_singapore_time():
     return datetime.now(SGT)
 
 # ============ CONSTANTS ============
-ELEMENT_PRODUCES = {
-    'Water': 'Wood', 'Wood': 'Fire', 'Fire': 'Earth',
-    'Earth': 'Metal', 'Metal': 'Water'
-}
-
-ELEMENT_CONTROLS = {
-    'Water': 'Fire', 'Fire': 'Metal', 'Metal': 'Wood',
-    'Wood': 'Earth', 'Earth': 'Water'
-}
-
 STEM_ELEMENTS = {
     'Jia': ('Wood', 'Yang'), '甲': ('Wood', 'Yang'),
     'Yi': ('Wood', 'Yin'), '乙': ('Wood', 'Yin'),
@@ -105,24 +97,11 @@ def calculate_strength(component_element, palace_element):
     if not component_element or not palace_element:
         return "Unknown", 0
     
-    # Same element
-    if component_element == palace_element:
-        return "Timely", 2
-    
-    # Palace produces component (component is prosperous)
-    if ELEMENT_PRODUCES.get(palace_element) == component_element:
-        return "Prosperous", 3
-    
-    # Palace controls component (component is confined)
-    if ELEMENT_CONTROLS.get(palace_element) == component_element:
-        return "Confined", -2
-    
-    # Component controls palace (component exhausts itself = dead)
-    if ELEMENT_CONTROLS.get(component_element) == palace_element:
-        return "Dead", -3
-    
-    # Component produces palace (neutral/resting)
-    return "Resting", 0
+    relation = element_relation(component_element, palace_element)
+    if relation < 0:
+        # Unrecognized element: no relationship, as before the lookup table
+        return "Resting", 0
+    return STRENGTH_NAMES[relation], STRENGTH_VALUES[relation]
 
 
 def get_stem_info(stem_char):
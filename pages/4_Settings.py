@@ -6,6 +6,9 @@ Phase 3: Fixed save functionality with proper state management
 import streamlit as st
 from datetime import datetime, date
 
+from utils.bazi_calculator import TEN_GOD_CHINESE, calculate_full_profile, get_hour_stem_branch
+from utils.bazi_profile import save_settings_profile
+
 st.set_page_config(
     page_title="Settings | Qi Men Pro",
     page_icon="⚙️",
@@ -79,74 +82,44 @@ def parse_time_input(time_str):
         return None
 
 def get_hour_branch(hour, minute=0):
-    total_minutes = hour * 60 + minute
-    if total_minutes >= 23 * 60 or total_minutes < 1 * 60:
-        return 0
-    branch_index = (hour + 1) // 2
-    return branch_index if branch_index < 12 else 0
-
-def calculate_year_pillar(year):
-    stem_index = (year - 4) % 10
-    branch_index = (year - 4) % 12
-    return STEMS[stem_index], BRANCHES[branch_index]
-
-def calculate_month_pillar(year, month, day):
-    adjusted_month = month if day >= 5 else (month - 1 if month > 1 else 12)
-    year_stem_index = (year - 4) % 10
-    month_stem_base = (year_stem_index % 5) * 2
-    month_stem_index = (month_stem_base + adjusted_month - 1) % 10
-    month_branch_index = (adjusted_month + 1) % 12
-    return STEMS[month_stem_index], BRANCHES[month_branch_index]
-
-def calculate_day_pillar(year, month, day):
-    from datetime import date as dt_date
-    ref_date = dt_date(1900, 1, 1)
-    target_date = dt_date(year, month, day)
-    days_diff = (target_date - ref_date).days
-    stem_index = (days_diff + 10) % 10
-    branch_index = (days_diff + 10) % 12
-    return STEMS[stem_index], BRANCHES[branch_index]
+    return get_hour_stem_branch(hour, 0)[1]
 
-def calculate_hour_pillar(day_stem, hour, minute=0):
-    hour_branch_index = get_hour_branch(hour, minute)
-    day_stem_index = STEMS.index(day_stem)
-    hour_stem_base = (day_stem_index % 5) * 2
-    hour_stem_index = (hour_stem_base + hour_branch_index) % 10
-    return STEMS[hour_stem_index], BRANCHES[hour_branch_index]
+ELEMENT_LABELS = {
+    "Wood": "Wood 木", "Fire": "Fire 火", "Earth": "Earth 土",
+    "Metal": "Metal 金", "Water": "Water 水",
+}
 
-def analyze_day_master(day_stem):
-    element, polarity = STEM_ELEMENTS[day_stem]
-    element_short = element.split()[0]
-    element_cycle = ["Wood", "Fire", "Earth", "Metal", "Water"]
-    elem_idx = element_cycle.index(element_short)
+def calculate_full_bazi(year, month, day, hour, minute=0):
+    """Four Pillars and Day Master analysis from the shared BaZi engine, in page format"""
+    full = calculate_full_profile(date(year, month, day), hour)
+    bazi = full["bazi"]
+    analysis = full["analysis"]
+    suggestion = full["profile_suggestion"]
     
-    resource_elem = element_cycle[(elem_idx - 1) % 5]
-    same_elem = element_short
-    output_elem = element_cycle[(elem_idx + 1) % 5]
-    controller_elem = element_cycle[(elem_idx + 2) % 5]
+    def pillar(key):
+        return {"stem": bazi[key].stem.display, "branch": bazi[key].branch.display}
     
-    return {
-        "day_master": day_stem,
-        "element": element,
-        "polarity": polarity,
-        "strength": "Moderate",
-        "useful_gods": [resource_elem, same_elem],
-        "unfavorable": [controller_elem, output_elem],
-        "profile": "Pioneer 🎯 (Indirect Wealth 偏财)"
-    }
-
-def calculate_full_bazi(year, month, day, hour, minute=0):
-    year_stem, year_branch = calculate_year_pillar(year)
-    month_stem, month_branch = calculate_month_pillar(year, month, day)
-    day_stem, day_branch = calculate_day_pillar(year, month, day)
-    hour_stem, hour_branch = calculate_hour_pillar(day_stem, hour, minute)
+    year_pillar = pillar("year_pillar")
+    year_pillar["animal"] = BRANCH_ANIMALS[year_pillar["branch"]]
+    
+    day_master = bazi["day_master"]
+    dominant_god = full["ten_gods"]["dominant_god"]
+    name = suggestion["profile"].partition(" (")[0]
     
     return {
-        "year": {"stem": year_stem, "branch": year_branch, "animal": BRANCH_ANIMALS[year_branch]},
-        "month": {"stem": month_stem, "branch": month_branch},
-        "day": {"stem": day_stem, "branch": day_branch},
-        "hour": {"stem": hour_stem, "branch": hour_branch},
-        "day_master_analysis": analyze_day_master(day_stem)
+        "year": year_pillar,
+        "month": pillar("month_pillar"),
+        "day": pillar("day_pillar"),
+        "hour": pillar("hour_pillar"),
+        "day_master_analysis": {
+            "day_master": day_master.display,
+            "element": ELEMENT_LABELS[day_master.element],
+            "polarity": day_master.polarity,
+            "strength": analysis["strength"],
+            "useful_gods": list(analysis["useful_gods"]),
+            "unfavorable": list(analysis["unfavorable"]),
+            "profile": f"{name} {suggestion['emoji']} ({dominant_god} {TEN_GOD_CHINESE[dominant_god]})",
+        }
     }
 
 # ============ CALLBACK FUNCTIONS ============
@@ -169,6 +142,7 @@ def save_profile_callback():
             "birth_time": data['birth_time'],
             "four_pillars": data['bazi']
         }
+        save_settings_profile(st.session_state.user_profile)
         st.session_state.show_save_success = True
 
 # ============ PAGE CONTENT ============
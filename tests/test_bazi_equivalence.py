@@ -0,0 +1,223 @@
+"""
+BaZi engine equivalence tests
+Pins calculate_full_profile() against the pillar logic the Settings page
+used before it was routed through utils.bazi_calculator, and the scalar
+engine against calculate_bazi_batch().
+
+The old page logic changed year on January 1 and month on the 5th of each
+calendar month, so it is only a reference where those shortcuts hold: day
+and hour pillars always, year pillars after 立春 (start of spring). Known
+charts pin the rest. Month pillars are pinned at every solar-term month
+boundary in 1900-2100.
+"""
+
+import json
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils import solar_terms
+from utils.bazi_calculator import (
+    PILLAR_KEYS, calculate_bazi, calculate_bazi_batch, calculate_full_profile, to_plain
+)
+
+# ==============================================================================
+# SETTINGS PAGE REFERENCE (removed from pages/4_Settings.py)
+# ==============================================================================
+
+STEMS = "甲乙丙丁戊己庚辛壬癸"
+BRANCHES = "子丑寅卯辰巳午未申酉戌亥"
+
+
+def legacy_hour_branch(hour, minute=0):
+    total_minutes = hour * 60 + minute
+    if total_minutes >= 23 * 60 or total_minutes < 1 * 60:
+        return 0
+    branch_index = (hour + 1) // 2
+    return branch_index if branch_index < 12 else 0
+
+
+def legacy_year_pillar(year):
+    return STEMS[(year - 4) % 10] + BRANCHES[(year - 4) % 12]
+
+
+def legacy_day_pillar(year, month, day):
+    days_diff = (date(year, month, day) - date(1900, 1, 1)).days
+    return STEMS[(days_diff + 10) % 10] + BRANCHES[(days_diff + 10) % 12]
+
+
+def legacy_hour_pillar(day_stem, hour, minute=0):
+    hour_branch_index = legacy_hour_branch(hour, minute)
+    hour_stem_index = ((STEMS.index(day_stem) % 5) * 2 + hour_branch_index) % 10
+    return STEMS[hour_stem_index] + BRANCHES[hour_branch_index]
+
+
+def four_pillars(moment: datetime) -> dict:
+    return calculate_full_profile(moment.date(), moment.hour)["settings_profile"]["four_pillars"]
+
+
+def sample_hours(start: datetime, end: datetime, step_hours: int):
+    """Every step_hours in [start, end); a step coprime to 24 visits every hour of the day"""
+    moment = start
+    while moment < end:
+        yield moment
+        moment += timedelta(hours=step_hours)
+
+
+SAMPLE = list(sample_hours(datetime(1900, 1, 1), datetime(2100, 1, 1), 97))
+
+
+def expected_month_pillar(bazi_year: int, chinese_month: int) -> str:
+    """Month pillar from the BaZi year and month (0 = 寅): 五虎遁 stem, 寅-based branch"""
+    year_stem = (bazi_year - 4) % 10
+    return STEMS[(year_stem % 5 * 2 + 2 + chinese_month) % 10] + BRANCHES[(chinese_month + 2) % 12]
+
+
+def month_boundaries():
+    """
+    (hour before, hour after, BaZi year, Chinese month) for every term that
+    starts a month (节) in the table; calculate_bazi takes whole hours, so
+    the hours are the last one starting before the term and the first after it
+    """
+    for year in range(solar_terms.FIRST_YEAR, solar_terms.LAST_YEAR + 1):
+        for term in range(0, solar_terms.TERMS_PER_YEAR, 2):
+            if (year, term) == (solar_terms.FIRST_YEAR, 0):
+                continue  # the hour before it is outside the table
+            start = solar_terms.term_start(year, term)
+            before = (start - timedelta(minutes=1)).replace(minute=0)
+            after = start.replace(minute=0) + timedelta(hours=1)
+            yield (before, after) + solar_terms.bazi_year_and_month(year, term)
+
+
+BOUNDARIES = list(month_boundaries())
+
+
+def scalar_indices(moment: datetime) -> list:
+    bazi = calculate_bazi(moment, moment.hour)
+    indices = []
+    for pillar in ("year_pillar", "month_pillar", "day_pillar", "hour_pillar"):
+        indices += [bazi[pillar].stem.index, bazi[pillar].branch.index]
+    return indices
+
+
+def batch_mismatches(moments) -> list:
+    """Moments where calculate_bazi and calculate_bazi_batch disagree"""
+    hours = np.array(moments, dtype="datetime64[h]")
+    days = hours.astype("datetime64[D]")
+    batch = calculate_bazi_batch(days, (hours - days).astype(int))
+    batch = np.stack([batch[key] for key in PILLAR_KEYS], axis=1)
+    return [moment for moment, row in zip(moments, batch.tolist()) if scalar_indices(moment) != row]
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+def test_day_and_hour_pillars_match_settings_logic():
+    mismatches = []
+    for moment in SAMPLE:
+        pillars = four_pillars(moment)
+        day = legacy_day_pillar(moment.year, moment.month, moment.day)
+        expected = (day, legacy_hour_pillar(day[0], moment.hour))
+        if (pillars["day"], pillars["hour"]) != expected:
+            mismatches.append(moment)
+    assert mismatches == []
+
+
+def test_year_pillar_matches_settings_logic_after_lichun():
+    # 立春 falls on February 3-5; the calendar year is the BaZi year after it
+    mismatches = [
+        moment for moment in SAMPLE
+        if (moment.month, moment.day) >= (2, 6)
+        and four_pillars(moment)["year"] != legacy_year_pillar(moment.year)
+    ]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("moment, expected", [
+    # 2000-01-01 noon: 己卯年 丙子月 戊午日 戊午时
+    (datetime(2000, 1, 1, 12), ("己卯", "丙子", "戊午", "戊午")),
+    # 立春 2024 at 16:26 CST: year and month change within the day
+    (datetime(2024, 2, 4, 16), ("癸卯", "乙丑", "戊戌", "庚申")),
+    (datetime(2024, 2, 4, 17), ("甲辰", "丙寅", "戊戌", "辛酉")),
+    # 立春 1985 at 05:11 CST
+    (datetime(1985, 2, 4, 4), ("甲子", "丁丑", "甲戌", "丙寅")),
+    (datetime(1985, 2, 4, 6), ("乙丑", "戊寅", "甲戌", "丁卯")),
+    # Before 立春 the Settings page's calendar year is a year ahead
+    (datetime(1985, 1, 1, 12), ("甲子", "丙子", "庚子", "壬午")),
+    # 子时 (23:00-01:00): 23:00 and 00:00 are both the 子 hour of the same day
+    (datetime(1985, 1, 1, 0), ("甲子", "丙子", "庚子", "丙子")),
+    (datetime(1985, 1, 1, 23), ("甲子", "丙子", "庚子", "丙子")),
+    (datetime(2024, 2, 10, 23), ("甲辰", "丙寅", "甲辰", "甲子")),
+])
+def test_known_charts(moment, expected):
+    pillars = four_pillars(moment)
+    assert (pillars["year"], pillars["month"], pillars["day"], pillars["hour"]) == expected
+
+
+@pytest.mark.parametrize("moment", [datetime(1985, 1, 1, 0), datetime(1985, 1, 1, 23), datetime(2024, 2, 10, 23)])
+def test_zi_hour_matches_settings_logic(moment):
+    pillars = four_pillars(moment)
+    assert pillars["day"] == legacy_day_pillar(moment.year, moment.month, moment.day)
+    assert pillars["hour"] == legacy_hour_pillar(pillars["day"][0], moment.hour)
+
+
+def test_lichun_year_change_against_settings_logic():
+    # The page switched year on January 1; the engine switches at 立春
+    assert four_pillars(datetime(2024, 2, 4, 16))["year"] != legacy_year_pillar(2024)
+    assert four_pillars(datetime(2024, 2, 4, 17))["year"] == legacy_year_pillar(2024)
+
+
+def test_month_pillars_change_at_solar_terms():
+    mismatches = []
+    for before, after, bazi_year, chinese_month in BOUNDARIES:
+        previous_year = bazi_year - (chinese_month == 0)
+        expected = (expected_month_pillar(previous_year, (chinese_month - 1) % 12),
+                    expected_month_pillar(bazi_year, chinese_month))
+        if (four_pillars(before)["month"], four_pillars(after)["month"]) != expected:
+            mismatches.append(after)
+    assert len(BOUNDARIES) == 12 * (solar_terms.LAST_YEAR - solar_terms.FIRST_YEAR + 1) - 1
+    assert mismatches == []
+
+
+def test_year_pillars_change_at_lichun():
+    mismatches = [
+        after for before, after, bazi_year, chinese_month in BOUNDARIES
+        if chinese_month == 0 and (four_pillars(before)["year"], four_pillars(after)["year"])
+        != (legacy_year_pillar(bazi_year - 1), legacy_year_pillar(bazi_year))
+    ]
+    assert mismatches == []
+
+
+def test_scalar_and_batch_engines_agree():
+    assert batch_mismatches(list(sample_hours(datetime(1900, 1, 1), datetime(2100, 1, 1), 23))) == []
+
+
+def test_scalar_and_batch_engines_agree_at_month_boundaries():
+    assert batch_mismatches([moment for boundary in BOUNDARIES for moment in boundary[:2]]) == []
+
+
+@pytest.mark.parametrize("start", [datetime(1984, 1, 20), datetime(2024, 1, 20), datetime(2099, 12, 1)])
+def test_scalar_and_batch_engines_agree_hourly_near_year_edges(start):
+    assert batch_mismatches(list(sample_hours(start, start + timedelta(days=31), 1))) == []
+
+
+def test_profiles_are_independent_copies():
+    first = calculate_full_profile(date(2000, 1, 1), 12)
+    first["settings_profile"]["useful_gods"].append("Fire")
+    first["profile_suggestion"]["profile"] = "changed"
+    second = calculate_full_profile(date(2000, 1, 1), 12)
+    assert second["profile_suggestion"]["profile"] != "changed"
+    assert second["settings_profile"]["useful_gods"] == first["settings_profile"]["useful_gods"][:-1]
+
+
+def test_results_serialize_through_to_plain():
+    profile = calculate_full_profile(date(2000, 1, 1), 12)
+    with pytest.raises(TypeError):
+        json.dumps(profile["bazi"])
+    bazi = json.loads(json.dumps(to_plain(profile)))["bazi"]
+    assert bazi["day_master"]["chinese"] == "戊"
+    assert bazi["year_pillar"]["display"] == "己卯"
+    assert bazi["year_pillar"]["stem"]["pinyin"] == "Ji"
+    assert json.loads(json.dumps(profile["settings_profile"]))["four_pillars"]["day"] == "戊午"
@@ -0,0 +1,38 @@
+"""
+BaZi strength tests
+Pins the batch strength analysis against the one-chart wrapper on the
+same births.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from utils.bazi_calculator import calculate_bazi
+from utils.bazi_strength import STRENGTH_LEVELS, STRONG_RATIO, WEAK_RATIO, analyze_births, analyze_weighted_strength
+from utils.mappings import ELEMENT_ORDER
+
+DATES = [date(1950, 1, 1) + timedelta(days=41 * i) for i in range(120)]
+HOURS = [(5 * i) % 24 for i in range(120)]
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+def test_batch_matches_single_charts():
+    batch = analyze_births(np.array(DATES, dtype="datetime64[D]"), np.array(HOURS))
+    for i, (birth_date, hour) in enumerate(zip(DATES, HOURS)):
+        single = analyze_weighted_strength(calculate_bazi(birth_date, hour))
+        assert single["strength"] == STRENGTH_LEVELS[batch["strength"][i]]
+        assert single["ratio"] == round(float(batch["ratio"][i]), 3)
+        assert single["useful_gods"] == [ELEMENT_ORDER[e] for e in batch["useful_gods"][i] if e >= 0]
+        assert single["unfavorable"] == [ELEMENT_ORDER[e] for e in batch["unfavorable"][i] if e >= 0]
+
+
+def test_strength_follows_the_support_ratio():
+    batch = analyze_births(np.array(DATES, dtype="datetime64[D]"), np.array(HOURS))
+    assert np.allclose(batch["support"] + batch["drain"], batch["element_scores"].sum(axis=1))
+    assert set(batch["strength"].tolist()) <= {0, 1, 2}
+    assert (batch["ratio"][batch["strength"] == 2] >= STRONG_RATIO).all()
+    assert (batch["ratio"][batch["strength"] == 0] <= WEAK_RATIO).all()
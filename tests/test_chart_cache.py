@@ -0,0 +1,128 @@
+"""
+Chart cache tests
+Pins the two-tier ChartCache (LRU, eviction, disk store, version purge,
+in-flight dedupe) and the compact chart form it stores on disk.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from utils import calculations
+from utils.calculations import Palace, QMDJChart, generate_chart, generate_charts_parallel
+from utils.chart_cache import ChartCache
+
+
+def make_cache(path=None, max_entries=4, version="v1"):
+    return ChartCache(
+        encode=lambda chart: chart.encode("utf-8"),
+        decode=lambda key, data: data.decode("utf-8"),
+        max_entries=max_entries,
+        path=path,
+        version=lambda: version,
+    )
+
+
+def key(hour):
+    return (f"2024-01-01T{hour:02d}:00:00", "UTC+8", "simulated")
+
+
+def palaces_of(chart):
+    return {num: palace.to_dict() for num, palace in chart.palaces.items()}
+
+
+# ==============================================================================
+# CACHE TIERS
+# ==============================================================================
+
+def test_lru_hit_and_eviction():
+    cache = make_cache(max_entries=2)
+    assert cache.get(key(1), lambda: "one") == "one"
+    assert cache.get(key(2), lambda: "two") == "two"
+    assert cache.get(key(1), lambda: "rebuilt") == "one"
+    cache.get(key(3), lambda: "three")  # evicts key(2), the least recently used
+    assert cache.get(key(2), lambda: "rebuilt") == "rebuilt"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (1, 4, 2, 2)
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = tmp_path / "charts.sqlite3"
+    make_cache(path).get(key(1), lambda: "stored")
+    cache = make_cache(path)
+    assert cache.get(key(1), lambda: "rebuilt") == "stored"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_other_versions_are_purged(tmp_path):
+    path = tmp_path / "charts.sqlite3"
+    make_cache(path, version="v1").get(key(1), lambda: "old")
+    assert make_cache(path, version="v2").get(key(1), lambda: "new") == "new"
+    assert make_cache(path, version="v1").get(key(1), lambda: "rebuilt") == "rebuilt"
+
+
+def test_concurrent_misses_build_once():
+    cache = make_cache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return "chart"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(key(1), build))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["chart"] * 8
+    assert len(builds) == 1
+
+
+def test_build_errors_are_not_cached():
+    cache = make_cache()
+    with pytest.raises(ValueError):
+        cache.get(key(1), lambda: (_ for _ in ()).throw(ValueError("engine failed")))
+    assert cache.get(key(1), lambda: "chart") == "chart"
+
+
+# ==============================================================================
+# CHARTS
+# ==============================================================================
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    cache = ChartCache(encode=QMDJChart.to_compact, decode=calculations._load_cached_chart, path=None)
+    monkeypatch.setattr(calculations, "chart_cache", cache)
+    return cache
+
+
+def test_every_path_builds_the_chart_of_the_hour(memory_cache):
+    moment = datetime(2024, 3, 5, 10, 47)
+    cached = generate_chart(moment)
+    assert cached.datetime == moment
+    assert palaces_of(cached) == palaces_of(generate_chart(moment, use_cache=False))
+    assert palaces_of(cached) == palaces_of(QMDJChart(datetime(2024, 3, 5, 10)))
+    assert palaces_of(cached) == palaces_of(generate_charts_parallel([moment], workers=1)[0])
+
+
+def test_compact_round_trip():
+    chart = QMDJChart(datetime(2024, 3, 5, 10))
+    data = chart.to_compact()
+    assert len(data) == calculations.COMPACT_SIZE
+    restored = QMDJChart.from_compact(chart.datetime, chart.timezone, data, chart.engine)
+    assert (restored.structure, restored.ju_number) == (chart.structure, chart.ju_number)
+    assert restored.palaces == chart.palaces
+
+
+def test_compact_form_keeps_raw_names():
+    chart = QMDJChart(datetime(2024, 3, 5, 10))
+    palace = chart.palaces[4]
+    raw = (None, None, ("Unknown Door", "未知门"), None, None)
+    chart.palaces[4] = Palace(4, *palace.codes, raw)
+    restored = QMDJChart.from_compact(chart.datetime, chart.timezone, chart.to_compact(), chart.engine)
+    assert restored.palaces[4].raw == raw
+    assert restored.palaces == chart.palaces
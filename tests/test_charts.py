@@ -0,0 +1,95 @@
+"""
+Chart generation tests
+Pins the columnar and batch chart paths against QMDJChart built one at a
+time.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.calculations import (
+    CODE_COMPONENTS, QMDJChart, VERDICT_ORDER, generate_charts, generate_charts_parallel, score_charts
+)
+
+START = datetime(2024, 6, 18)
+END = START + timedelta(days=7)  # spans 夏至, where Yang Dun turns to Yin Dun
+
+
+def charts_between(start: datetime, end: datetime, step: timedelta = timedelta(hours=2)) -> list:
+    charts = []
+    while start < end:
+        charts.append(QMDJChart(start))
+        start += step
+    return charts
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+def test_columnar_charts_match_chart_objects():
+    columns = generate_charts(START, END, "2h")
+    charts = charts_between(START, END)
+    assert len(columns["datetimes"]) == len(charts)
+    assert [dt.astype(datetime) for dt in columns["datetimes"]] == [chart.datetime for chart in charts]
+    assert columns["structure"].tolist() == [chart.structure != "Yang Dun" for chart in charts]
+    assert columns["ju_number"].tolist() == [chart.ju_number for chart in charts]
+    for row, component in enumerate(CODE_COMPONENTS):
+        expected = [[chart.palaces[num].codes[row] for num in range(1, 10)] for chart in charts]
+        assert columns[component].tolist() == expected, component
+    expected_scores = [[chart.calculate_palace_score(num) for num in range(1, 10)] for chart in charts]
+    assert columns["palace_score"].round(1).tolist() == expected_scores
+
+
+@pytest.mark.parametrize("step, count", [("30min", 48), ("1d", 1), (timedelta(hours=6), 4)])
+def test_generate_charts_steps(step, count):
+    assert len(generate_charts(START, START + timedelta(days=1), step)["datetimes"]) == count
+
+
+def test_generate_charts_rejects_bad_steps():
+    with pytest.raises(ValueError):
+        generate_charts(START, END, "2 weeks")
+    with pytest.raises(ValueError):
+        generate_charts(START, END, timedelta(0))
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, None), (2, 5)])
+def test_parallel_charts_match_serial(workers, chunk_size):
+    datetimes = [START + timedelta(hours=3 * i, minutes=i) for i in range(24)]
+    serial = [QMDJChart(dt) for dt in datetimes]
+    parallel = generate_charts_parallel(datetimes, workers=workers, chunk_size=chunk_size)
+    assert [chart.datetime for chart in parallel] == datetimes
+    for chart, expected in zip(parallel, serial):
+        assert (chart.structure, chart.ju_number, chart.engine) == (expected.structure, expected.ju_number, expected.engine)
+        assert chart.palaces == expected.palaces
+
+
+def test_parallel_compact_charts_round_trip():
+    datetimes = [START + timedelta(hours=2 * i) for i in range(6)]
+    blobs = generate_charts_parallel(datetimes, workers=1, compact=True)
+    for dt, data in zip(datetimes, blobs):
+        assert QMDJChart.from_compact(dt, "UTC+8", data).palaces == QMDJChart(dt).palaces
+
+
+def test_score_all_matches_scalar_scoring():
+    for chart in charts_between(START, START + timedelta(days=2)):
+        scored = chart.score_all()
+        for num in range(1, 10):
+            score = chart.calculate_palace_score(num)
+            assert scored[num]["score"] == pytest.approx(score)
+            assert scored[num]["verdict"] == chart.get_verdict(score)
+            assert scored[num]["formations"] == chart.detect_formations(num)
+            assert scored[num]["formation"] == chart.detect_formation(num)
+        ranked = [entry["palace_number"] for entry in chart.rank_palaces()]
+        assert ranked == sorted(range(1, 10), key=lambda num: -scored[num]["score"])
+
+
+def test_score_charts_batch_matches_score_all():
+    charts = charts_between(START, START + timedelta(days=1))
+    batch = score_charts(charts)
+    for i, chart in enumerate(charts):
+        scored = chart.score_all()
+        assert batch["palace_score"][i].tolist() == [scored[num]["score"] for num in range(1, 10)]
+        assert [VERDICT_ORDER[v] for v in batch["verdict"][i]] == [scored[num]["verdict"] for num in range(1, 10)]
+        assert batch["rank"][i].tolist()[0] == chart.rank_palaces(top=1)[0]["palace_number"]
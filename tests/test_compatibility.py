@@ -0,0 +1,96 @@
+"""
+Compatibility tests
+Pins the vectorized N x N compatibility matrix and top-k partners against
+pair-by-pair scoring of the same rules.
+"""
+
+import math
+from datetime import date
+
+import numpy as np
+import pytest
+
+from utils.bazi_calculator import calculate_full_profile
+from utils.compatibility import compatibility_matrix, find_partners, top_partners
+
+CYCLE = ["Wood", "Fire", "Earth", "Metal", "Water"]  # each produces the next
+COMBINATIONS = {frozenset(pair) for pair in [(0, 1), (2, 11), (3, 10), (4, 9), (5, 8), (6, 7)]}
+PILLARS = ("year_pillar", "month_pillar", "day_pillar", "hour_pillar")
+
+PROFILES = [
+    calculate_full_profile(date(1950 + 7 * i, 1 + i % 12, 1 + 2 * i), (5 * i) % 24)
+    for i in range(12)
+]
+
+
+def day_master_score(a, b) -> float:
+    distance = (CYCLE.index(b.element) - CYCLE.index(a.element)) % 5
+    score = 2.0 if distance in (0, 1, 4) else -1.5  # peers or producing / controlling
+    return score + (3.0 if abs(a.index - b.index) == 5 else 0.0)
+
+
+def branch_score(a, b) -> float:
+    score = 0.0
+    for pa in PILLARS:
+        for pb in PILLARS:
+            x, y = a[pa].branch.index, b[pb].branch.index
+            score += (frozenset((x, y)) in COMBINATIONS) - ((x - y) % 12 == 6)
+    return score
+
+
+def served(a, b) -> float:
+    """What b's Day Master element does for a's useful gods and unfavorable elements"""
+    element = b["bazi"]["day_master"].element
+    return 2.0 * (element in a["analysis"]["useful_gods"]) - 1.0 * (element in a["analysis"]["unfavorable"])
+
+
+def pair_scores(a, b) -> dict:
+    scores = {
+        "day_master": day_master_score(a["bazi"]["day_master"], b["bazi"]["day_master"]),
+        "branches": branch_score(a["bazi"], b["bazi"]),
+        "useful_gods": served(a, b) + served(b, a),
+    }
+    scores["total"] = sum(scores.values())
+    return scores
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+def test_matrix_matches_pairwise_scores():
+    matrix = compatibility_matrix(PROFILES)
+    for i, a in enumerate(PROFILES):
+        for j, b in enumerate(PROFILES):
+            if i == j:
+                assert all(math.isnan(matrix[key][i, j]) for key in matrix)
+                continue
+            for key, score in pair_scores(a, b).items():
+                assert matrix[key][i, j] == pytest.approx(score), (key, i, j)
+
+
+def test_weights():
+    plain = compatibility_matrix(PROFILES)
+    weighted = compatibility_matrix(PROFILES, {"branches": 0.0, "useful_gods": 2.0})
+    expected = plain["day_master"] + 2.0 * plain["useful_gods"]
+    assert np.allclose(weighted["total"], expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("k", [1, 3, 11, 20])
+def test_top_partners_match_sorting(k):
+    totals = compatibility_matrix(PROFILES)["total"]
+    indices, scores = top_partners(totals, k)
+    assert indices.shape == (len(PROFILES), min(k, len(PROFILES) - 1))
+    for i, (row_indices, row_scores) in enumerate(zip(indices, scores)):
+        others = sorted((totals[i, j] for j in range(len(PROFILES)) if j != i), reverse=True)
+        assert row_scores.tolist() == others[:indices.shape[1]]
+        assert i not in row_indices
+        assert [totals[i, j] for j in row_indices] == row_scores.tolist()
+
+
+def test_find_partners():
+    partners = find_partners(PROFILES, k=2)
+    totals = compatibility_matrix(PROFILES)["total"]
+    assert all(len(row) == 2 for row in partners)
+    assert all(score == totals[i, j] for i, row in enumerate(partners) for j, score in row)
+    assert find_partners(PROFILES[:1]) == [[]]
@@ -0,0 +1,75 @@
+"""
+Reverse pillar search tests
+Pins find_datetimes() against a brute-force scan of every hour with the
+forward engines.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils.bazi_calculator import PILLAR_KEYS, calculate_bazi, calculate_bazi_batch, find_datetimes
+
+PILLARS = ("year_pillar", "month_pillar", "day_pillar", "hour_pillar")
+
+
+def pillars_at(moment: datetime) -> tuple:
+    bazi = calculate_bazi(moment, moment.hour)
+    return tuple(bazi[pillar].display for pillar in PILLARS)
+
+
+def scan(start: datetime, end: datetime, wanted: tuple) -> list:
+    """Every whole hour in [start, end) whose pillars start with wanted (scalar engine)"""
+    found = []
+    moment = start
+    while moment < end:
+        if pillars_at(moment)[:len(wanted)] == wanted:
+            found.append(moment)
+        moment += timedelta(hours=1)
+    return found
+
+
+def batch_scan(start: datetime, end: datetime, moment: datetime) -> list:
+    """Every whole hour in [start, end) with the same Four Pillars as moment (batch engine)"""
+    hours = np.arange(np.datetime64(start, "h"), np.datetime64(end, "h"))
+    days = hours.astype("datetime64[D]")
+    batch = calculate_bazi_batch(days, (hours - days).astype(int))
+    target = calculate_bazi_batch(np.array([np.datetime64(moment.date())]), moment.hour)
+    match = np.all([batch[key] == target[key][0] for key in PILLAR_KEYS], axis=0)
+    return hours[match].astype(datetime).tolist()
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+@pytest.mark.parametrize("moment", [
+    datetime(1985, 2, 4, 6),   # the hour after 立春
+    datetime(1985, 1, 1, 23),  # late 子 hour
+    datetime(1985, 7, 15, 0),  # early 子 hour
+])
+def test_matches_hourly_scan(moment):
+    start, end = datetime(1984, 1, 1), datetime(1987, 1, 1)
+    wanted = pillars_at(moment)
+    expected = scan(start, end, wanted)
+    assert moment in expected
+    assert list(find_datetimes(*wanted, start=start, end=end)) == expected
+
+
+def test_without_hour_pillar_returns_every_hour_of_matching_days():
+    start, end = datetime(1984, 1, 1), datetime(1987, 1, 1)
+    wanted = pillars_at(datetime(1985, 6, 1, 12))[:3]
+    assert list(find_datetimes(*wanted, start=start, end=end)) == scan(start, end, wanted)
+
+
+def test_matches_batch_scan_over_several_cycles():
+    moment = datetime(2000, 1, 1, 12)
+    start, end = datetime(1940, 1, 1), datetime(2065, 1, 1)  # two 60-year cycles and more
+    assert list(find_datetimes(*pillars_at(moment), start=start, end=end)) == batch_scan(start, end, moment)
+
+
+def test_impossible_pillars_find_nothing():
+    # 甲 years start with 丙寅, so 甲寅 is never a month of a 甲 year; 甲子 days start with 甲子, not 丙子
+    assert list(find_datetimes("甲子", "甲寅", "甲子")) == []
+    assert list(find_datetimes("甲子", "丙寅", "甲子", "丙子")) == []
@@ -0,0 +1,60 @@
+"""
+Formation index tests
+Pins the compiled FormationIndex against FORMATION_RULES checked one rule
+at a time, over every (stem, door, star, deity) code combination.
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from utils.formations import NO_FORMATION, FormationIndex, get_formation_index, match_formations
+from utils.mappings import (
+    DEITY_ORDER, DOOR_ORDER, FORMATIONS, FORMATION_RULES, STAR_ORDER, STEM_ORDER, UNKNOWN_CODE
+)
+
+# Names by component in FormationIndex.cell order; UNKNOWN_CODE has no name
+COMPONENT_NAMES = (
+    ("heaven_stem", STEM_ORDER), ("door", DOOR_ORDER), ("star", STAR_ORDER), ("deity", DEITY_ORDER)
+)
+ALL_CODES = [list(range(len(names))) + [UNKNOWN_CODE] for _, names in COMPONENT_NAMES]
+
+
+def scalar_match(codes) -> list:
+    """Formations whose rule accepts every component, in rule order, without repeats"""
+    matched = []
+    for rule in FORMATION_RULES:
+        accepted = all(
+            rule.get(component) is None or (code != UNKNOWN_CODE and names[code] in rule[component])
+            for (component, names), code in zip(COMPONENT_NAMES, codes)
+        )
+        if accepted and FORMATIONS[rule["formation"]] not in matched:
+            matched.append(FORMATIONS[rule["formation"]])
+    return matched
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+def test_index_matches_scalar_rules_everywhere():
+    mismatches = [codes for codes in itertools.product(*ALL_CODES) if match_formations(*codes) != scalar_match(codes)]
+    assert mismatches == []
+
+
+def test_primary_ids_match_first_match():
+    index = get_formation_index()
+    grid = np.array(list(itertools.product(*ALL_CODES)), dtype=np.int64).T
+    expected = [
+        index.formations.index(matches[0]) if matches else NO_FORMATION
+        for matches in (index.match(*codes) for codes in grid.T.tolist())
+    ]
+    assert index.primary_ids(*grid).tolist() == expected
+
+
+def test_unknown_names_in_rules_are_rejected():
+    with pytest.raises(ValueError):
+        FormationIndex([{"formation": "dragon_return", "door": ["Nowhere"]}], FORMATIONS)
+    with pytest.raises(ValueError):
+        FormationIndex([{"formation": "no_such_formation"}], FORMATIONS)
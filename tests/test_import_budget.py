@@ -0,0 +1,67 @@
+"""
+Import budget tests
+The utils modules the pages import must stay cheap to import: NumPy, the
+SQLite stores and process pools are loaded only by the functions that need
+them. Checked by what a fresh interpreter has loaded, not by wall time.
+"""
+
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Modules imported by the pages, and heavier ones charts and profiles are built with
+PAGE_MODULES = ["utils", "utils.elements", "utils.bazi_calculator"]
+CHART_MODULES = ["utils.calculations", "utils.formations", "utils.bazi_profile"]
+
+DEFERRED_MODULES = ["numpy", "concurrent.futures.process"]
+# utils.calculations imports sqlite3 for its chart cache; the pages must not
+PAGE_DEFERRED_MODULES = DEFERRED_MODULES + ["sqlite3"]
+
+# Sanity ceiling (ms) for a page module; an order of magnitude above the
+# usual cold start, so it only trips when a heavy dependency creeps back in
+PAGE_IMPORT_CEILING_MS = 1000.0
+
+
+def _run(code: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def _loaded_after_import(module: str, names) -> list:
+    output = _run(f"import sys, {module}; print(','.join(n for n in {list(names)!r} if n in sys.modules))")
+    return [name for name in output.strip().split(",") if name]
+
+
+def measure_import_time(module: str, runs: int = 5) -> float:
+    """Median wall time (ms) to import a module in a fresh interpreter"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print((time.perf_counter() - start) * 1000)"
+    )
+    return statistics.median(float(_run(code)) for _ in range(runs))
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+@pytest.mark.parametrize("module", PAGE_MODULES)
+def test_page_modules_defer_heavy_imports(module):
+    assert _loaded_after_import(module, PAGE_DEFERRED_MODULES) == []
+
+
+@pytest.mark.parametrize("module", CHART_MODULES)
+def test_chart_modules_defer_heavy_imports(module):
+    assert _loaded_after_import(module, DEFERRED_MODULES) == []
+
+
+@pytest.mark.parametrize("module", PAGE_MODULES)
+def test_page_module_import_ceiling(module):
+    assert measure_import_time(module, runs=3) <= PAGE_IMPORT_CEILING_MS
@@ -0,0 +1,82 @@
+"""
+Profile compiler tests
+Pins compile_profile() caching, the scalar alignment path against the
+batch one, and the batch top-k over chart objects and columnar charts.
+"""
+
+import copy
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.bazi_profile import DEFAULT_PROFILE, calculate_bazi_alignment, calculate_bazi_alignment_batch
+from utils.calculations import QMDJChart, generate_charts
+from utils.profile_compiler import compile_profile
+from utils.profile_schema import migrate_profile
+
+FLAT_PROFILE = {
+    "day_master": "甲 Jia", "element": "Wood 木", "polarity": "Yang", "strength": "Strong",
+    "useful_gods": ["Fire", "Earth"], "unfavorable": ["Water", "Wood"],
+    "profile": "Creator 🎨 (Eating God 食神)",
+}
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+def test_equal_profiles_share_one_compiled_profile():
+    compiled = compile_profile(DEFAULT_PROFILE)
+    assert compile_profile(copy.deepcopy(DEFAULT_PROFILE)) is compiled
+    assert compile_profile(compiled) is compiled
+    assert compile_profile(FLAT_PROFILE) is compile_profile(migrate_profile(FLAT_PROFILE))
+
+
+def test_changed_profile_is_recompiled():
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    before = compile_profile(profile)
+    profile["useful_gods"]["primary"] = "Water"
+    after = compile_profile(profile)
+    assert after is not before
+    assert (before.useful_primary, after.useful_primary) == ("Earth", "Water")
+
+
+def test_special_structures_lists_are_kept():
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    profile["special_structures"]["other_structures"] = ["Traveling Horse"]
+    assert list(compile_profile(profile).special_structures["other_structures"]) == ["Traveling Horse"]
+
+
+@pytest.mark.parametrize("profile", [DEFAULT_PROFILE, FLAT_PROFILE])
+def test_scalar_alignment_matches_batch(profile):
+    charts = [QMDJChart(datetime(2024, 3, 5) + timedelta(hours=2 * i)) for i in range(12)]
+    batch = calculate_bazi_alignment_batch(profile, charts, top=3)
+    scores = [
+        [calculate_bazi_alignment(profile, chart.palaces[num])["score"] for num in range(1, 10)]
+        for chart in charts
+    ]
+    assert batch["score"].tolist() == scores
+    best = batch["top"][0]
+    assert best["score"] == max(max(row) for row in scores)
+    assert best["datetime"] == charts[best["chart"]].datetime
+
+
+def test_batch_alignment_accepts_columnar_charts():
+    start = datetime(2024, 3, 5)
+    columns = generate_charts(start, start + timedelta(days=1), "2h")
+    charts = [QMDJChart(start + timedelta(hours=2 * i)) for i in range(12)]
+    from_columns = calculate_bazi_alignment_batch(DEFAULT_PROFILE, columns, top=5)
+    from_charts = calculate_bazi_alignment_batch(DEFAULT_PROFILE, charts, top=5)
+    assert from_columns["score"].tolist() == from_charts["score"].tolist()
+    assert from_columns["top"] == from_charts["top"]
+
+
+@pytest.mark.parametrize("top", [0, 1, 10, 200])
+def test_batch_top_is_best_first_with_earliest_ties(top):
+    charts = [QMDJChart(datetime(2024, 3, 5) + timedelta(hours=2 * i)) for i in range(12)]
+    result = calculate_bazi_alignment_batch(FLAT_PROFILE, charts, top=top)
+    cells = sorted(
+        ((-score, i, palace) for i, row in enumerate(result["score"].tolist()) for palace, score in enumerate(row, 1))
+    )
+    expected = [(i, palace, -score) for score, i, palace in cells[:top]]
+    assert [(entry["chart"], entry["palace"], entry["score"]) for entry in result["top"]] == expected
@@ -0,0 +1,92 @@
+"""
+Profile import tests
+Pins the CSV importer: parsed rows land in the client repository, bad and
+repeated rows are reported, and fallback ids stay unique across files.
+"""
+
+import csv
+import io
+
+import pytest
+
+from utils.profile_import import import_profiles, parse_birth_row
+from utils.profile_repository import ProfileRepository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = ProfileRepository(tmp_path / "clients.sqlite3")
+    yield repository
+    repository.close()
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    return path
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+@pytest.mark.parametrize("row, expected", [
+    ({"birth_date": "1985-02-04", "birth_hour": "6"}, (1985, 2, 4, 6)),
+    ({"birth_date": "04/02/1985", "birth_time": "06:30"}, (1985, 2, 4, 6)),
+    ({"birth_date": "1985/02/04"}, (1985, 2, 4, 12)),
+])
+def test_parse_birth_row(row, expected):
+    birth_date, hour = parse_birth_row(row)
+    assert (birth_date.year, birth_date.month, birth_date.day, hour) == expected
+
+
+@pytest.mark.parametrize("row", [
+    {"birth_date": ""},
+    {"birth_date": "1985-13-01"},
+    {"birth_date": "1985-02-04", "birth_hour": "24"},
+    {"birth_date": "1985-02-04", "birth_time": "noon"},
+    {"birth_date": "1850-01-01"},
+])
+def test_parse_birth_row_rejects(row):
+    with pytest.raises(ValueError):
+        parse_birth_row(row)
+
+
+def test_import_reports_bad_and_duplicate_rows(tmp_path, repository):
+    source = write_csv(tmp_path / "clients.csv", [
+        ["client_id", "birth_date", "birth_hour"],
+        ["a", "1985-02-04", "6"],
+        ["b", "not a date", "6"],
+        ["a", "2000-01-01", "12"],
+        ["c", "2000-01-01", "12"],
+    ])
+    bad_rows = tmp_path / "bad.csv"
+    report = import_profiles(source, repository, chunk_size=2, bad_rows_file=bad_rows)
+
+    assert (report.rows, report.imported, report.bad) == (4, 2, 2)
+    assert [line for line, reason in report.bad_rows] == [3, 4]
+    assert "duplicate client_id 'a' (first on line 2)" in report.bad_rows[1][1]
+    assert repository.count() == 2
+    assert repository.get("a")["birth_date"] == "1985-02-04"
+    with open(bad_rows, newline="", encoding="utf-8") as f:
+        assert [row[0] for row in csv.reader(f)] == ["line", "3", "4"]
+
+
+def test_fallback_ids_are_unique_across_files(tmp_path, repository):
+    rows = [["birth_date", "birth_hour"], ["1985-02-04", "6"]]
+    import_profiles(write_csv(tmp_path / "first.csv", rows), repository)
+    import_profiles(write_csv(tmp_path / "second.csv", rows), repository)
+    assert repository.count() == 2
+    assert repository.get("first.csv:2")["client_id"] == "first.csv:2"
+    assert repository.get("second.csv:2") is not None
+
+
+def test_import_from_stream_into_repository_file(tmp_path):
+    path = tmp_path / "clients.sqlite3"
+    report = import_profiles(io.StringIO("id,birth_date\nx,2000-01-01\n"), path)
+    assert report.imported == 1
+    repository = ProfileRepository(path)
+    try:
+        assert repository.get("x")["birth_time"] == "12:00"
+    finally:
+        repository.close()
@@ -0,0 +1,119 @@
+"""
+Profile repository tests
+Pins ProfileRepository writes (put, update, batch) and the bazi_profile
+helpers' fallback to the default profile when the repository fails.
+"""
+
+import pytest
+
+from utils import bazi_profile
+from utils.bazi_profile import (
+    DEFAULT_PROFILE, get_default_profile, load_profile, save_settings_profile, update_strength
+)
+from utils.profile_repository import ProfileRepository
+from utils.profile_schema import PROFILE_SCHEMA_VERSION, SCHEMA_KEY
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = ProfileRepository(tmp_path / "profiles.sqlite3", max_entries=2)
+    yield repository
+    repository.close()
+
+
+@pytest.fixture
+def broken_repository(tmp_path, monkeypatch):
+    # A database path under a regular file can never be opened
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    monkeypatch.setattr(bazi_profile, "_repository", ProfileRepository(blocker / "profiles.sqlite3"))
+    monkeypatch.setattr(bazi_profile, "PROFILE_FILE", tmp_path / "missing.json")
+
+
+# ==============================================================================
+# REPOSITORY
+# ==============================================================================
+
+def test_put_migrates_and_get_returns_copies(repository):
+    repository.put({"day_master": "Jia", "useful_gods": ["Water", "Wood"], "strength": "Weak"}, "a")
+    profile = repository.get("a")
+    assert profile[SCHEMA_KEY] == PROFILE_SCHEMA_VERSION
+    assert profile["day_master"]["chinese"] == "甲"
+    assert profile["useful_gods"]["primary"] == "Water"
+    profile["strength"] = "changed"
+    assert repository.get("a")["strength"] == "Weak"
+    assert repository.get("missing") is None
+
+
+def test_profiles_survive_the_lru(repository):
+    for user_id in "abc":
+        repository.put(get_default_profile(), user_id)
+    assert repository.stats()["size"] == 2
+    assert repository.get("a") == DEFAULT_PROFILE
+    assert repository.count() == 3
+
+
+def test_update_starts_from_default(repository):
+    profile = repository.update({"strength": "Strong"}, "a", default=get_default_profile)
+    assert profile["strength"] == "Strong"
+    assert profile["day_master"] == DEFAULT_PROFILE["day_master"]
+    assert repository.get("a") == profile
+
+
+def test_batch_rolls_back_on_error(repository):
+    repository.put(get_default_profile(), "a")
+    with pytest.raises(RuntimeError):
+        with repository.batch():
+            repository.update({"strength": "Strong"}, "a")
+            repository.put(get_default_profile(), "b")
+            raise RuntimeError
+    assert repository.get("a")["strength"] == DEFAULT_PROFILE["strength"]
+    assert repository.get("b") is None
+
+
+def test_find_by_indexed_fields(repository):
+    repository.put(get_default_profile(), "a")
+    repository.put({"day_master": "Jia", "strength": "Strong"}, "b")
+    assert [row["user_id"] for row in repository.find(day_master="Geng")] == ["a"]
+    assert [row["user_id"] for row in repository.find(element="Wood", strength="Strong")] == ["b"]
+
+
+# ==============================================================================
+# HELPERS
+# ==============================================================================
+
+def test_default_profile_is_current_schema():
+    profile = get_default_profile()
+    assert profile == DEFAULT_PROFILE
+    assert set(profile["special_structures"]) == {"wealth_vault", "nobleman_present", "other_structures"}
+    profile["special_structures"]["other_structures"].append("changed")
+    assert get_default_profile()["special_structures"]["other_structures"] == []
+
+
+def test_helpers_fall_back_to_default_when_repository_fails(broken_repository):
+    assert load_profile() == DEFAULT_PROFILE
+    profile = update_strength("Strong", 8)
+    assert (profile["strength"], profile["strength_score"]) == ("Strong", 8)
+    assert profile["day_master"] == DEFAULT_PROFILE["day_master"]
+
+
+def test_settings_save_is_one_write(tmp_path, monkeypatch):
+    repository = ProfileRepository(tmp_path / "profiles.sqlite3")
+    monkeypatch.setattr(bazi_profile, "_repository", repository)
+    monkeypatch.setattr(bazi_profile, "PROFILE_FILE", tmp_path / "missing.json")
+    writes = []
+    write = repository._write
+    monkeypatch.setattr(repository, "_write", lambda *args: writes.append(args) or write(*args))
+
+    profile = save_settings_profile({
+        "day_master": "甲 Jia", "element": "Wood 木", "polarity": "Yang", "strength": "Strong",
+        "useful_gods": ["Fire", "Earth"], "unfavorable": ["Water", "Wood"],
+        "profile": "Creator 🎨 (Eating God 食神)", "birth_date": "1985-02-04", "birth_time": "06:00",
+    })
+    assert len(writes) == 1
+    assert profile["day_master"]["pinyin"] == "Jia"
+    assert profile["ten_god_profile"]["dominant_god"] == "Eating God"
+    assert profile["settings"] == DEFAULT_PROFILE["settings"]
+    assert profile["special_structures"] == DEFAULT_PROFILE["special_structures"]
+    assert repository.get() == profile
+    repository.close()
@@ -0,0 +1,126 @@
+"""
+Profile schema tests
+Pins load-time migration of every older profile shape and the packed
+binary form's exact round trip.
+"""
+
+import copy
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+
+from utils.bazi_calculator import calculate_full_profile
+from utils.bazi_profile import DEFAULT_PROFILE
+from utils.profile_repository import ProfileRepository
+from utils.profile_schema import (
+    PROFILE_SCHEMA_VERSION, SCHEMA_KEY, migrate_profile, pack_profile, try_unpack_profile, unpack_profile
+)
+
+SETTINGS_PAGE_PROFILE = {
+    "day_master": "庚 Geng", "element": "Metal 金", "polarity": "Yang", "strength": "Weak",
+    "useful_gods": ["Earth", "Metal"], "unfavorable": ["Fire", "Wood"],
+    "profile": "Pioneer 🎯 (Indirect Wealth 偏财)",
+}
+UNVERSIONED_DEFAULT = {key: value for key, value in DEFAULT_PROFILE.items() if key != SCHEMA_KEY}
+
+
+# ==============================================================================
+# MIGRATIONS
+# ==============================================================================
+
+def test_settings_page_strings_migrate():
+    profile = migrate_profile(SETTINGS_PAGE_PROFILE)
+    assert profile[SCHEMA_KEY] == PROFILE_SCHEMA_VERSION
+    assert profile["day_master"] == {"chinese": "庚", "pinyin": "Geng", "element": "Metal", "polarity": "Yang"}
+    assert profile["useful_gods"] == {"primary": "Earth", "secondary": "Metal", "reasoning": ""}
+    assert profile["unfavorable_elements"]["secondary"] == "Wood"
+    assert profile["ten_god_profile"]["dominant_god"] == "Indirect Wealth"
+    assert profile["ten_god_profile"]["profile_name"] == "Pioneer"
+
+
+def test_engine_profile_migrates():
+    settings = calculate_full_profile(date(1985, 2, 4), 6)["settings_profile"]
+    profile = migrate_profile(settings)
+    assert profile["day_master"]["chinese"] == settings["chinese"]
+    assert profile["ten_god_profile"]["dominant_god"] == settings["dominant_god"]
+    assert set(profile["special_structures"]) >= {"wealth_vault", "nobleman_present", "other_structures"}
+    assert "nobleman" not in profile["special_structures"]
+    assert profile["four_pillars"] == settings["four_pillars"]
+
+
+def test_nested_unversioned_profile_migrates_unchanged():
+    assert migrate_profile(UNVERSIONED_DEFAULT) == DEFAULT_PROFILE
+
+
+def test_migration_leaves_the_input_alone_and_is_idempotent():
+    original = copy.deepcopy(SETTINGS_PAGE_PROFILE)
+    migrated = migrate_profile(SETTINGS_PAGE_PROFILE)
+    assert SETTINGS_PAGE_PROFILE == original
+    assert migrate_profile(migrated) is migrated
+
+
+@pytest.mark.parametrize("version", [PROFILE_SCHEMA_VERSION + 1, 0, "2"])
+def test_unknown_versions_are_rejected(version):
+    with pytest.raises(ValueError):
+        migrate_profile({SCHEMA_KEY: version})
+
+
+# ==============================================================================
+# BINARY FORM
+# ==============================================================================
+
+@pytest.mark.parametrize("profile", [
+    DEFAULT_PROFILE,
+    migrate_profile(SETTINGS_PAGE_PROFILE),
+    migrate_profile(calculate_full_profile(date(2000, 1, 1), 12)["settings_profile"]),
+])
+def test_pack_round_trip(profile):
+    data = pack_profile(profile)
+    assert unpack_profile(data) == profile
+    assert len(data) < len(json.dumps(profile, ensure_ascii=False).encode("utf-8"))
+
+
+def test_pack_keeps_values_outside_the_tables():
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    profile["strength"] = "Moderate"
+    profile["strength_score"] = 7.5
+    profile["ten_god_profile"]["profile_name"] = "Custom"
+    profile["special_structures"]["wealth_vault"] = 1
+    unpacked = unpack_profile(pack_profile(profile))
+    assert unpacked == profile
+    assert type(unpacked["special_structures"]["wealth_vault"]) is int
+
+
+def test_pack_migrates_first():
+    assert unpack_profile(pack_profile(SETTINGS_PAGE_PROFILE)) == migrate_profile(SETTINGS_PAGE_PROFILE)
+
+
+def test_unreadable_packed_bytes():
+    data = pack_profile(DEFAULT_PROFILE)
+    for bad in (b"", b"XX" + data[2:], data[:2] + bytes([PROFILE_SCHEMA_VERSION + 1]) + data[3:], data[:10]):
+        assert try_unpack_profile(bad) is None
+    with pytest.raises(ValueError):
+        unpack_profile(b"XX" + data[2:])
+
+
+def test_repository_migrates_rows_saved_before_the_schema(tmp_path):
+    path = tmp_path / "profiles.sqlite3"
+    repository = ProfileRepository(path)
+    repository.count()  # creates the table
+    repository.close()
+    db = sqlite3.connect(str(path))
+    db.execute("INSERT INTO profiles (user_id, data) VALUES (?, ?)",
+               ("old", json.dumps(SETTINGS_PAGE_PROFILE, ensure_ascii=False)))
+    db.commit()
+    db.close()
+
+    repository = ProfileRepository(path)
+    assert repository.get("old") == migrate_profile(SETTINGS_PAGE_PROFILE)
+    repository.close()
+    db = sqlite3.connect(str(path))
+    packed, day_master = db.execute("SELECT packed, day_master FROM profiles WHERE user_id = 'old'").fetchone()
+    db.close()
+    assert try_unpack_profile(packed) == migrate_profile(SETTINGS_PAGE_PROFILE)
+    assert day_master == "庚"
@@ -0,0 +1,34 @@
+"""
+Ten Gods tests
+Pins the indexed label_ten_gods() pass against calculate_ten_gods() on
+the same charts.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from utils.bazi_calculator import TEN_GODS, calculate_bazi, calculate_ten_gods
+from utils.ten_gods import NO_GOD, ten_gods_for_births
+
+DATES = [date(1950, 1, 1) + timedelta(days=37 * i) for i in range(120)]
+HOURS = [(7 * i) % 24 for i in range(120)]
+PILLAR_NAMES = ("year", "month", "day", "hour")
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+def test_batch_matches_scalar_labels():
+    result = ten_gods_for_births(np.array(DATES, dtype="datetime64[D]"), np.array(HOURS))
+    for i, (birth_date, hour) in enumerate(zip(DATES, HOURS)):
+        scalar = calculate_ten_gods(calculate_bazi(birth_date, hour))
+        for position, name in enumerate(PILLAR_NAMES):
+            code = result["stems"][i, position]
+            assert (TEN_GODS[code] if code != NO_GOD else None) == scalar["stems"].get(name)
+            hidden = [TEN_GODS[code] for code in result["hidden_stems"][i, position] if code != NO_GOD]
+            assert hidden == scalar["hidden_stems"][name]
+        scores = {god: round(float(score), 2) for god, score in zip(TEN_GODS, result["scores"][i])}
+        assert scores == scalar["scores"]
+        assert TEN_GODS[result["dominant"][i]] == scalar["dominant_god"]
@@ -0,0 +1,85 @@
+"""
+Timeline tests
+Pins luck-pillar direction and start age against the solar-term table,
+and the annual and monthly pillars against the forward engine.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import solar_terms
+from utils.bazi_calculator import calculate_bazi
+from utils.timeline import DAYS_PER_LUCK_YEAR, Timeline, get_profile_timeline, get_timeline
+
+# 乙丑 (yin) year, 戊寅 month: the hour after 立春 1985 (05:11 CST)
+YIN_BIRTH = datetime(1985, 2, 4, 6)
+# 甲辰 (yang) year, 丙寅 month: the hour after 立春 2024 (16:26 CST)
+YANG_BIRTH = datetime(2024, 2, 4, 17)
+
+
+def luck_years(start: datetime, end: datetime) -> float:
+    return round(abs((end - start).total_seconds()) / 86400 / DAYS_PER_LUCK_YEAR, 1)
+
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+@pytest.mark.parametrize("birth, gender, forward, pillars", [
+    (YIN_BIRTH, "male", False, ["丁丑", "丙子", "乙亥"]),
+    (YIN_BIRTH, "female", True, ["己卯", "庚辰", "辛巳"]),
+    (YANG_BIRTH, "male", True, ["丁卯", "戊辰", "己巳"]),
+    (YANG_BIRTH, "female", False, ["乙丑", "甲子", "癸亥"]),
+])
+def test_luck_direction(birth, gender, forward, pillars):
+    timeline = Timeline(birth, gender)
+    assert timeline.forward == forward
+    assert [luck["pillar"] for luck in timeline.luck_pillars()[:3]] == pillars
+
+
+@pytest.mark.parametrize("birth, gender, year, term", [
+    (YIN_BIRTH, "male", 1985, solar_terms.LICHUN),         # backward to 立春
+    (YIN_BIRTH, "female", 1985, solar_terms.LICHUN + 2),   # forward to 惊蛰
+    (YANG_BIRTH, "male", 2024, solar_terms.LICHUN + 2),
+    (YANG_BIRTH, "female", 2024, solar_terms.LICHUN),
+])
+def test_start_age_counts_days_to_the_governing_term(birth, gender, year, term):
+    timeline = Timeline(birth, gender)
+    start_age = luck_years(birth, solar_terms.term_start(year, term))
+    assert timeline.start_age == start_age
+    assert timeline.luck_start_age.tolist() == pytest.approx([start_age + 10 * k for k in range(10)])
+
+
+def test_years_before_the_first_luck_pillar():
+    timeline = Timeline(YIN_BIRTH, "female")  # starts about 10 years old
+    first_year = timeline.luck_start_year[0]
+    assert all(luck == -1 for year, luck in zip(timeline.year, timeline.year_luck) if year < first_year)
+    assert timeline.row(int(first_year - timeline.birth_year))["luck_pillar"] == timeline.luck_pillars()[0]["pillar"]
+
+
+def test_annual_and_monthly_pillars_match_the_engine():
+    timeline = Timeline(datetime(1990, 8, 1, 12), "male", years=30)
+    for row in timeline.page(1) + timeline.page(2):
+        for month in row["months"]:
+            moment = month["start"] + timedelta(hours=1)
+            bazi = calculate_bazi(moment, moment.hour)
+            assert month["pillar"] == bazi["month_pillar"].display
+            assert row["pillar"] == bazi["year_pillar"].display
+
+
+def test_pages():
+    timeline = Timeline(YIN_BIRTH, "male", years=25)
+    pages = list(timeline.iter_pages(page_size=10))
+    assert timeline.page_count(10) == len(pages) == 3
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [row["age"] for row in pages[0]] == list(range(10))
+
+
+def test_timelines_are_cached_per_hour():
+    assert get_timeline(YIN_BIRTH.replace(minute=40), "Male") is get_timeline(YIN_BIRTH, "male")
+    profile = {"birth_date": "1985-02-04", "birth_time": "06:30", "gender": "male"}
+    assert get_profile_timeline(profile) is get_timeline(YIN_BIRTH, "male")
+    assert get_profile_timeline({"birth_date": "1985-02-04"}) is None
+    with pytest.raises(ValueError):
+        Timeline(YIN_BIRTH, "other")
@@ -1,65 +1,103 @@
 """
 Qi Men Pro Utilities Module
+
+Submodules are imported on first attribute access, so `import utils` stays
+cheap; the chart engine itself loads on the first chart request.
 """
 
-from utils.calculations import QMDJChart, generate_chart
-from utils.mappings import (
-    STAR_MAPPING, DOOR_MAPPING, DEITY_MAPPING,
-    STAR_ELEMENTS, DOOR_ELEMENTS, DEITY_NATURES,
-    STAR_EMOJI, DOOR_EMOJI, DEITY_EMOJI,
-    translate_star, translate_door, translate_deity
-)
-from utils.bazi_profile import (
-    load_profile, save_profile,
-    update_day_master, update_strength,
-    update_useful_gods, update_ten_god_profile,
-    calculate_bazi_alignment, get_default_profile,
-    DAY_MASTERS, TEN_GOD_PROFILES,
-    DAY_MASTER_OPTIONS, TEN_GOD_PROFILE_OPTIONS
-)
-from utils.database import (
-    init_database, add_analysis,
-    get_all_records, get_recent_records,
-    get_pending_records, update_outcome,
-    get_statistics, export_to_csv_string,
-    clear_database
-)
-from utils.export_formatter import (
-    generate_analysis_prompt,
-    generate_json_export,
-    generate_csv_row,
-    format_compact_summary
-)
-from utils.language import (
-    LanguageHelper, get_lang,
-    PALACE_NAMES, DIRECTIONS, ELEMENTS, HEAVEN_STEMS,
-    STARS, DOORS, DEITIES, FORMATIONS, STRENGTHS, VERDICTS,
-    UI_LABELS
-)
+import importlib
+
+# Public names by the submodule that provides them
+_EXPORTS = {
+    "utils.calculations": [
+        'QMDJChart', 'Palace', 'generate_chart', 'generate_charts', 'generate_charts_parallel',
+        'build_chart_table', 'decode_palace', 'cache_stats', 'warm_up_engine',
+        'score_charts', 'chart_element_codes', 'VERDICT_ORDER',
+    ],
+    "utils.mappings": [
+        'STAR_MAPPING', 'DOOR_MAPPING', 'DEITY_MAPPING',
+        'STAR_ELEMENTS', 'DOOR_ELEMENTS', 'DEITY_NATURES',
+        'STAR_EMOJI', 'DOOR_EMOJI', 'DEITY_EMOJI',
+        'translate_star', 'translate_door', 'translate_deity',
+    ],
+    "utils.elements": [
+        'RELATION_MATRIX', 'STRENGTH_MATRIX',
+        'element_relation', 'strength_in_palace', 'strength_scores',
+    ],
+    "utils.solar_terms": [
+        'TERM_NAMES', 'term_at', 'term_start',
+    ],
+    "utils.timeline": [
+        'Timeline', 'get_timeline', 'get_profile_timeline',
+    ],
+    "utils.bazi_strength": [
+        'analyze_strength_batch', 'analyze_weighted_strength', 'analyze_births',
+    ],
+    "utils.ten_gods": [
+        'label_ten_gods', 'ten_gods_for_births', 'rank_by_dominant_god',
+    ],
+    "utils.compatibility": [
+        'compatibility_matrix', 'top_partners', 'find_partners',
+    ],
+    "utils.formations": [
+        'FormationIndex', 'get_formation_index', 'match_formations',
+    ],
+    "utils.bazi_profile": [
+        'load_profile', 'save_profile', 'get_default_profile',
+        'get_profile_repository',
+        'update_profile', 'save_settings_profile',
+        'update_day_master', 'update_strength',
+        'update_useful_gods', 'update_ten_god_profile',
+        'calculate_bazi_alignment', 'calculate_bazi_alignment_batch',
+        'DAY_MASTERS', 'TEN_GOD_PROFILES',
+        'DAY_MASTER_OPTIONS', 'TEN_GOD_PROFILE_OPTIONS',
+    ],
+    "utils.profile_compiler": [
+        'CompiledProfile', 'compile_profile',
+    ],
+    "utils.profile_schema": [
+        'PROFILE_SCHEMA_VERSION', 'migrate_profile', 'pack_profile', 'unpack_profile',
+    ],
+    "utils.profile_repository": [
+        'ProfileRepository', 'profile_index_keys',
+    ],
+    "utils.profile_import": [
+        'import_profiles', 'ImportReport',
+    ],
+    "utils.database": [
+        'init_database', 'add_analysis',
+        'get_all_records', 'get_recent_records',
+        'get_pending_records', 'update_outcome',
+        'get_statistics', 'export_to_csv_string',
+        'clear_database',
+    ],
+    "utils.export_formatter": [
+        'generate_analysis_prompt',
+        'generate_json_export',
+        'generate_csv_row',
+        'format_compact_summary',
+    ],
+    "utils.language": [
+        'LanguageHelper', 'get_lang',
+        'PALACE_NAMES', 'DIRECTIONS', 'ELEMENTS', 'HEAVEN_STEMS',
+        'STARS', 'DOORS', 'DEITIES', 'FORMATIONS', 'STRENGTHS', 'VERDICTS',
+        'UI_LABELS',
+    ],
+}
+
+_SOURCES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_SOURCES)
+
+
+def __getattr__(name: str):
+    module = _SOURCES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = [
-    'QMDJChart', 'generate_chart',
-    'STAR_MAPPING', 'DOOR_MAPPING', 'DEITY_MAPPING',
-    'STAR_ELEMENTS', 'DOOR_ELEMENTS', 'DEITY_NATURES',
-    'STAR_EMOJI', 'DOOR_EMOJI', 'DEITY_EMOJI',
-    'translate_star', 'translate_door', 'translate_deity',
-    'load_profile', 'save_profile', 'get_default_profile',
-    'update_day_master', 'update_strength',
-    'update_useful_gods', 'update_ten_god_profile',
-    'calculate_bazi_alignment',
-    'DAY_MASTERS', 'TEN_GOD_PROFILES',
-    'DAY_MASTER_OPTIONS', 'TEN_GOD_PROFILE_OPTIONS',
-    'init_database', 'add_analysis',
-    'get_all_records', 'get_recent_records',
-    'get_pending_records', 'update_outcome',
-    'get_statistics', 'export_to_csv_string',
-    'clear_database',
-    'generate_analysis_prompt',
-    'generate_json_export',
-    'generate_csv_row',
-    'format_compact_summary',
-    'LanguageHelper', 'get_lang',
-    'PALACE_NAMES', 'DIRECTIONS', 'ELEMENTS', 'HEAVEN_STEMS',
-    'STARS', 'DOORS', 'DEITIES', 'FORMATIONS', 'STRENGTHS', 'VERDICTS',
-    'UI_LABELS',
-]
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -6,8 +6,12 @@ Calculates Four Pillars (Year, Month, Day, Hour) from birth date/time
 Uses the Hsia Calendar (夏历) sexagenary cycle method
 """
 
-from datetime import datetime, timedelta
-from typing import Dict, Tuple, Optional
+import copy
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Tuple, Optional, Iterator, Union
+
+from utils import solar_terms
 
 # ==============================================================================
 # CONSTANTS
@@ -67,7 +71,9 @@ REFERENCE_YEAR_STEM = 6   # 庚 (Geng)
 REFERENCE_YEAR_BRANCH = 0  # 子 (Zi)
 
 # Solar terms for month calculation (approximate dates)
-# Month stems depend on year stem, month branches are fixed by solar terms
+# Month stems depend on year stem, month branches are fixed by solar terms.
+# Exact term instants come from utils.solar_terms; these dates are only the
+# fallback outside its 1900-2100 range.
 SOLAR_TERMS = [
     (2, 4),   # 立春 Start of Spring - Month 1 (寅)
     (3, 6),   # 惊蛰 Awakening - Month 2 (卯)
@@ -83,11 +89,248 @@ SOLAR_TERMS = [
     (1, 6),   # 小寒 Minor Cold - Month 12 (丑)
 ]
 
+# Approximate Chinese month (0 = 寅 ... 11 = 丑) by [month][day], from SOLAR_TERMS.
+# Days before 小寒 in January still belong to month 11 (子) from 大雪.
+CHINESE_MONTH_BY_DAY = [[0] * 32 for _ in range(13)]
+for _month in range(1, 13):
+    for _day in range(1, 32):
+        _current = 10
+        for _i, (_term_month, _term_day) in sorted(enumerate(SOLAR_TERMS), key=lambda t: t[1]):
+            if (_month, _day) >= (_term_month, _term_day):
+                _current = _i
+        CHINESE_MONTH_BY_DAY[_month][_day] = _current
+del _month, _day, _current, _i, _term_month, _term_day
+
+# Pillar index arrays returned by calculate_bazi_batch
+PILLAR_KEYS = [
+    "year_stem", "year_branch", "month_stem", "month_branch",
+    "day_stem", "day_branch", "hour_stem", "hour_branch",
+]
+
+# Julian Day Number of 1970-01-01 (NumPy datetime64 epoch)
+EPOCH_JDN = 2440588
+
+# Index lookups for pillar strings like "甲子"
+STEM_INDEX = {stem["chinese"]: i for i, stem in enumerate(HEAVENLY_STEMS)}
+BRANCH_INDEX = {branch["chinese"]: i for i, branch in enumerate(EARTHLY_BRANCHES)}
+
+# Related elements of each element, precomputed for analyze_strength
+ELEMENT_CYCLE = ["Wood", "Fire", "Earth", "Metal", "Water"]
+ELEMENT_RELATIONS = {
+    element: {
+        "produces_dm": ELEMENT_CYCLE[(i - 1) % 5],
+        "dm_produces": ELEMENT_CYCLE[(i + 1) % 5],
+        "controls_dm": ELEMENT_CYCLE[(i - 2) % 5],
+        "dm_controls": ELEMENT_CYCLE[(i + 2) % 5],
+    }
+    for i, element in enumerate(ELEMENT_CYCLE)
+}
+
+# A pillar as "甲子" or (stem_index, branch_index)
+PillarSpec = Union[str, Tuple[int, int]]
+
+# Hidden stems (藏干) of each branch with their weights, by branch index
+HIDDEN_STEMS = [
+    [("癸", 1.0)],                            # 子
+    [("己", 0.6), ("癸", 0.3), ("辛", 0.1)],  # 丑
+    [("甲", 0.6), ("丙", 0.3), ("戊", 0.1)],  # 寅
+    [("乙", 1.0)],                            # 卯
+    [("戊", 0.6), ("乙", 0.3), ("癸", 0.1)],  # 辰
+    [("丙", 0.6), ("戊", 0.3), ("庚", 0.1)],  # 巳
+    [("丁", 0.7), ("己", 0.3)],               # 午
+    [("己", 0.6), ("丁", 0.3), ("乙", 0.1)],  # 未
+    [("庚", 0.6), ("壬", 0.3), ("戊", 0.1)],  # 申
+    [("辛", 1.0)],                            # 酉
+    [("戊", 0.6), ("辛", 0.3), ("丁", 0.1)],  # 戌
+    [("壬", 0.7), ("甲", 0.3)],               # 亥
+]
+
+# Ten Gods (十神) by code: 2 x (element step from the Day Master) + 1 if
+# the polarity differs
+TEN_GODS = [
+    "Friend", "Rob Wealth",                    # 比肩 劫财 - same element
+    "Eating God", "Hurting Officer",           # 食神 伤官 - DM produces
+    "Indirect Wealth", "Direct Wealth",        # 偏财 正财 - DM controls
+    "7 Killings", "Direct Officer",            # 七杀 正官 - controls DM
+    "Indirect Resource", "Direct Resource",    # 偏印 正印 - produces DM
+]
+TEN_GOD_CODES = {god: i for i, god in enumerate(TEN_GODS)}
+TEN_GOD_CHINESE = dict(zip(TEN_GODS, ["比肩", "劫财", "食神", "伤官", "偏财", "正财", "七杀", "正官", "偏印", "正印"]))
+
+# Ten God code of a stem (column) relative to a Day Master stem (row)
+TEN_GOD_TABLE = [
+    [2 * ((other // 2 - dm // 2) % 5) + (other % 2 != dm % 2) for other in range(10)]
+    for dm in range(10)
+]
+
+# Weights of each position when finding the dominant god: year, month,
+# day, hour (the day stem is the Day Master itself; the month branch
+# commands the season)
+TEN_GOD_STEM_WEIGHTS = (1.0, 1.0, 0.0, 1.0)
+TEN_GOD_BRANCH_WEIGHTS = (1.0, 1.5, 1.0, 1.0)
+
+# Profile suggestion for each dominant god
+TEN_GOD_SUGGESTIONS = {
+    "Friend": {"profile": "Connector (Friend)", "emoji": "🌐"},
+    "Rob Wealth": {"profile": "Competitor (Rob Wealth)", "emoji": "🏆"},
+    "Eating God": {"profile": "Artist (Eating God)", "emoji": "🎨"},
+    "Hurting Officer": {"profile": "Philosopher (Hurting Officer)", "emoji": "🎭"},
+    "Indirect Wealth": {"profile": "Pioneer (Indirect Wealth)", "emoji": "🎯"},
+    "Direct Wealth": {"profile": "Strategist (Direct Wealth)", "emoji": "📊"},
+    "7 Killings": {"profile": "Warrior (7 Killings)", "emoji": "⚔️"},
+    "Direct Officer": {"profile": "Director (Direct Officer)", "emoji": "👔"},
+    "Indirect Resource": {"profile": "Analyzer (Indirect Resource)", "emoji": "🔍"},
+    "Direct Resource": {"profile": "Diplomat (Direct Resource)", "emoji": "🤝"},
+}
+
+PILLAR_NAMES = ("year", "month", "day", "hour")
+
+
+# ==============================================================================
+# STEM, BRANCH AND PILLAR OBJECTS
+# ==============================================================================
+
+class _Interned:
+    """
+    Immutable value object with one shared instance per value.
+    Read-only dict-style access (obj["chinese"], obj.get(), dict(obj))
+    keeps code written for the old per-call dicts working.
+    """
+    __slots__ = ()
+    _KEYS: Dict[str, str] = {}  # dict key -> attribute
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+    
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+    
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, self._KEYS[key])
+        except KeyError:
+            raise KeyError(key) from None
+    
+    def get(self, key: str, default=None):
+        attribute = self._KEYS.get(key)
+        return default if attribute is None else getattr(self, attribute)
+    
+    def keys(self):
+        return self._KEYS.keys()
+    
+    def __iter__(self):
+        return iter(self._KEYS)
+    
+    def __len__(self) -> int:
+        return len(self._KEYS)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._KEYS
+    
+    def to_dict(self) -> Dict:
+        """Plain dict (nested stems and branches too), e.g. for json.dumps"""
+        return {key: to_plain(self[key]) for key in self._KEYS}
+    
+    def __reduce__(self):
+        # Unpickle to the shared instance
+        return type(self)._lookup, (self.index,)
+    
+    def __copy__(self):
+        return self
+    
+    def __deepcopy__(self, memo):
+        return self
+    
+    def __str__(self) -> str:
+        return self.display
+
+
+class Stem(_Interned):
+    """A Heavenly Stem; use STEMS[i], never construct"""
+    __slots__ = ("index", "chinese", "pinyin", "element", "polarity", "display")
+    _KEYS = {"stem_index": "index", "chinese": "chinese", "pinyin": "pinyin",
+             "element": "element", "polarity": "polarity"}
+    
+    def __init__(self, index: int, chinese: str, pinyin: str, element: str, polarity: str):
+        for name, value in zip(self.__slots__, (index, chinese, pinyin, element, polarity,
+                                                f"{chinese} {pinyin}")):
+            object.__setattr__(self, name, value)
+    
+    @staticmethod
+    def _lookup(index: int) -> "Stem":
+        return STEMS[index]
+    
+    def __repr__(self) -> str:
+        return f"Stem({self.chinese} {self.pinyin})"
+
+
+class Branch(_Interned):
+    """An Earthly Branch; use BRANCHES[i], never construct"""
+    __slots__ = ("index", "chinese", "pinyin", "animal", "element", "polarity", "display")
+    _KEYS = {"chinese": "chinese", "pinyin": "pinyin", "animal": "animal",
+             "element": "element", "polarity": "polarity"}
+    
+    def __init__(self, index: int, chinese: str, pinyin: str, animal: str, element: str, polarity: str):
+        for name, value in zip(self.__slots__, (index, chinese, pinyin, animal, element, polarity,
+                                                f"{chinese} {pinyin}")):
+            object.__setattr__(self, name, value)
+    
+    @staticmethod
+    def _lookup(index: int) -> "Branch":
+        return BRANCHES[index]
+    
+    def __repr__(self) -> str:
+        return f"Branch({self.chinese} {self.pinyin})"
+
+
+class Pillar(_Interned):
+    """A stem/branch pair of the 60 Jia Zi cycle; use PILLARS[sexagenary_index(s, b)]"""
+    __slots__ = ("index", "stem", "branch", "display")
+    _KEYS = {"stem": "stem", "branch": "branch", "display": "display"}
+    
+    def __init__(self, index: int, stem: Stem, branch: Branch):
+        for name, value in zip(self.__slots__, (index, stem, branch, stem.chinese + branch.chinese)):
+            object.__setattr__(self, name, value)
+    
+    @staticmethod
+    def _lookup(index: int) -> "Pillar":
+        return PILLARS[index]
+    
+    def __repr__(self) -> str:
+        return f"Pillar({self.display})"
+
+
+STEMS = tuple(Stem(i, **stem) for i, stem in enumerate(HEAVENLY_STEMS))
+BRANCHES = tuple(Branch(i, **branch) for i, branch in enumerate(EARTHLY_BRANCHES))
+# By 60 Jia Zi position: 甲子, 乙丑, ... 癸亥
+PILLARS = tuple(Pillar(i, STEMS[i % 10], BRANCHES[i % 12]) for i in range(60))
+
+
+
+def to_plain(value):
+    """
+    A calculate_bazi() / calculate_full_profile() result (or any part of
+    one) with its shared Stem, Branch and Pillar objects as plain dicts,
+    ready to store or json.dumps
+    """
+    if isinstance(value, _Interned):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    return value
+
 
 # ==============================================================================
 # CALCULATION FUNCTIONS
 # ==============================================================================
 
+def sexagenary_index(stem: int, branch: int) -> int:
+    """Position (0-59) of a stem/branch pair in the 60 Jia Zi cycle"""
+    return (6 * stem - 5 * branch) % 60
+
+
 def get_day_stem_branch(date: datetime) -> Tuple[int, int]:
     """
     Calculate the Heavenly Stem and Earthly Branch for a given day.
@@ -119,18 +362,18 @@ def get_day_stem_branch(date: datetime) -> Tuple[int, int]:
 def get_year_stem_branch(date: datetime) -> Tuple[int, int]:
     """
     Calculate Year Pillar based on Chinese lunar year.
-    Chinese year starts at 立春 (Start of Spring, ~Feb 4).
+    Chinese year starts at the exact instant of 立春 (Start of Spring, ~Feb 4).
     
     Returns: (stem_index, branch_index)
     """
-    year = date.year
-    month = date.month
-    day = date.day
-    
-    # Check if before Start of Spring (approximately Feb 4)
-    # If before, use previous year
-    if month < 2 or (month == 2 and day < 4):
-        year -= 1
+    term = solar_terms.term_at(date)
+    if term is not None:
+        year = solar_terms.bazi_year_and_month(*term)[0]
+    else:
+        # Outside the term table: approximate Start of Spring as Feb 4
+        year = date.year
+        if date.month < 2 or (date.month == 2 and date.day < 4):
+            year -= 1
     
     # 1984 is 甲子 (Jia Zi) year - stem=0, branch=0
     # Use this as reference
@@ -157,16 +400,13 @@ def get_month_stem_branch(date: datetime, year_stem: int) -> Tuple[int, int]:
     
     Returns: (stem_index, branch_index)
     """
-    month = date.month
-    day = date.day
-    
     # Determine which Chinese month based on solar terms
     # Each month starts at specific solar term
-    chinese_month = 0
-    
-    for i, (term_month, term_day) in enumerate(SOLAR_TERMS):
-        if month > term_month or (month == term_month and day >= term_day):
-            chinese_month = i
+    term = solar_terms.term_at(date)
+    if term is not None:
+        chinese_month = solar_terms.bazi_year_and_month(*term)[1]
+    else:
+        chinese_month = CHINESE_MONTH_BY_DAY[date.month][date.day]
     
     # Month branch: 寅(2) for month 1, 卯(3) for month 2, etc.
     branch_index = (chinese_month + 2) % 12
@@ -218,82 +458,226 @@ def calculate_bazi(birth_date: datetime, birth_hour: int = 12) -> Dict:
         birth_hour: Hour of birth (0-23)
     
     Returns:
-        Dictionary with all four pillars and Day Master info
+        Dictionary with all four pillars and Day Master info. Stems and
+        pillars are the shared STEMS / PILLARS objects; pass the result
+        through to_plain() before storing it or calling json.dumps.
     """
+    # Year and month change at exact solar-term instants, so use the birth hour
+    moment = datetime(birth_date.year, birth_date.month, birth_date.day, birth_hour)
+    
     # Calculate each pillar
-    year_stem, year_branch = get_year_stem_branch(birth_date)
-    month_stem, month_branch = get_month_stem_branch(birth_date, year_stem)
+    year_stem, year_branch = get_year_stem_branch(moment)
+    month_stem, month_branch = get_month_stem_branch(moment, year_stem)
     day_stem, day_branch = get_day_stem_branch(birth_date)
     hour_stem, hour_branch = get_hour_stem_branch(birth_hour, day_stem)
     
-    # Build result
-    day_master = HEAVENLY_STEMS[day_stem]
-    
-    result = {
+    # Build result from the shared stem, branch and pillar objects
+    return {
         "birth_date": birth_date.strftime("%Y-%m-%d"),
         "birth_hour": birth_hour,
         
         # Day Master (most important)
-        "day_master": {
-            "stem_index": day_stem,
-            "pinyin": day_master["pinyin"],
-            "chinese": day_master["chinese"],
-            "element": day_master["element"],
-            "polarity": day_master["polarity"],
-        },
+        "day_master": STEMS[day_stem],
         
         # Four Pillars
-        "year_pillar": {
-            "stem": HEAVENLY_STEMS[year_stem],
-            "branch": EARTHLY_BRANCHES[year_branch],
-            "display": f"{HEAVENLY_STEMS[year_stem]['chinese']}{EARTHLY_BRANCHES[year_branch]['chinese']}",
-        },
-        "month_pillar": {
-            "stem": HEAVENLY_STEMS[month_stem],
-            "branch": EARTHLY_BRANCHES[month_branch],
-            "display": f"{HEAVENLY_STEMS[month_stem]['chinese']}{EARTHLY_BRANCHES[month_branch]['chinese']}",
-        },
-        "day_pillar": {
-            "stem": HEAVENLY_STEMS[day_stem],
-            "branch": EARTHLY_BRANCHES[day_branch],
-            "display": f"{HEAVENLY_STEMS[day_stem]['chinese']}{EARTHLY_BRANCHES[day_branch]['chinese']}",
-        },
-        "hour_pillar": {
-            "stem": HEAVENLY_STEMS[hour_stem],
-            "branch": EARTHLY_BRANCHES[hour_branch],
-            "display": f"{HEAVENLY_STEMS[hour_stem]['chinese']}{EARTHLY_BRANCHES[hour_branch]['chinese']}",
-        },
+        "year_pillar": PILLARS[sexagenary_index(year_stem, year_branch)],
+        "month_pillar": PILLARS[sexagenary_index(month_stem, month_branch)],
+        "day_pillar": PILLARS[sexagenary_index(day_stem, day_branch)],
+        "hour_pillar": PILLARS[sexagenary_index(hour_stem, hour_branch)],
         
         # Animal sign (from year branch)
-        "animal_sign": EARTHLY_BRANCHES[year_branch]["animal"],
+        "animal_sign": BRANCHES[year_branch].animal,
     }
+
+
+def calculate_bazi_batch(birth_dates, birth_hours=12) -> Dict[str, "np.ndarray"]:
+    """
+    Vectorized Four Pillars for many births at once.
+    
+    Args:
+        birth_dates: Array-like of dates (datetime64, date/datetime objects
+            or ISO strings); any time of day is ignored
+        birth_hours: Hour(s) of birth (0-23), scalar or array broadcastable
+            to birth_dates
+    
+    Returns:
+        Dictionary of int8 index arrays keyed by PILLAR_KEYS, matching
+        calculate_bazi() element-for-element
+    """
+    import numpy as np
+    
+    days = np.asarray(birth_dates, dtype="datetime64[D]")
+    hours = np.broadcast_to(np.asarray(birth_hours, dtype=np.int64), days.shape)
+    
+    months_since_epoch = days.astype("datetime64[M]").astype(np.int64)
+    year = months_since_epoch // 12 + 1970
+    month = months_since_epoch % 12 + 1
+    day = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
+    
+    # Day pillar from the Julian Day Number
+    jdn = days.astype(np.int64) + EPOCH_JDN
+    day_stem = (jdn + 9) % 10
+    day_branch = (jdn + 1) % 12
+    
+    # Year and month from the exact solar-term table, by bisection;
+    # approximate dates outside its range
+    terms = np.asarray(solar_terms.load_table(), dtype=np.int64)
+    minutes = (days - np.datetime64(solar_terms.EPOCH, "D")).astype(np.int64) * 1440 + hours * 60
+    covered = (minutes >= terms[0]) & (minutes < solar_terms.table_end())
+    position = np.searchsorted(terms, minutes, side="right") - 1
+    term = position % solar_terms.TERMS_PER_YEAR
+    
+    before_spring = (month < 2) | ((month == 2) & (day < 4))
+    bazi_year = np.where(
+        covered,
+        solar_terms.FIRST_YEAR + position // solar_terms.TERMS_PER_YEAR - (term < solar_terms.LICHUN),
+        year - before_spring
+    )
+    chinese_month = np.where(
+        covered,
+        (term - solar_terms.LICHUN) // 2 % 12,
+        np.array(CHINESE_MONTH_BY_DAY, dtype=np.int64)[month, day]
+    )
     
-    return result
+    # Year pillar: 1984 is 甲子
+    year_offset = bazi_year - 1984
+    year_stem = year_offset % 10
+    year_branch = year_offset % 12
+    
+    # Month pillar (五虎遁 for the stem)
+    month_branch = (chinese_month + 2) % 12
+    month_stem = ((year_stem % 5) * 2 + 2 + chinese_month) % 10
+    
+    # Hour pillar (五鼠遁 for the stem); 23:00 wraps to 子
+    hour_branch = ((hours + 1) // 2) % 12
+    hour_stem = ((day_stem % 5) * 2 + hour_branch) % 10
+    
+    pillars = (
+        year_stem, year_branch, month_stem, month_branch,
+        day_stem, day_branch, hour_stem, hour_branch,
+    )
+    return {key: values.astype(np.int8) for key, values in zip(PILLAR_KEYS, pillars)}
+
+
+# ==============================================================================
+# REVERSE SEARCH
+# ==============================================================================
+
+def parse_pillar(pillar: PillarSpec) -> Tuple[int, int]:
+    """Parse "甲子" or (stem, branch) into a validated (stem_index, branch_index)"""
+    if isinstance(pillar, str):
+        if len(pillar) != 2 or pillar[0] not in STEM_INDEX or pillar[1] not in BRANCH_INDEX:
+            raise ValueError(f"Invalid pillar: {pillar!r} (expected e.g. '甲子')")
+        stem, branch = STEM_INDEX[pillar[0]], BRANCH_INDEX[pillar[1]]
+    else:
+        stem, branch = pillar
+        if not (0 <= stem < 10 and 0 <= branch < 12):
+            raise ValueError(f"Invalid pillar: {pillar!r}")
+    
+    # Yang stems only pair with yang branches, yin with yin
+    if stem % 2 != branch % 2:
+        raise ValueError(f"Invalid pillar: {pillar!r} is not in the 60 Jia Zi cycle")
+    return stem, branch
+
+
+def get_month_window(bazi_year: int, chinese_month: int) -> Tuple[datetime, datetime]:
+    """Start and end (exclusive) of a Chinese month of a BaZi year"""
+    term = solar_terms.LICHUN + 2 * chinese_month
+    year = bazi_year + term // solar_terms.TERMS_PER_YEAR
+    term %= solar_terms.TERMS_PER_YEAR
+    next_year = year + (term + 2) // solar_terms.TERMS_PER_YEAR
+    next_term = (term + 2) % solar_terms.TERMS_PER_YEAR
+    
+    if solar_terms.FIRST_YEAR <= year and next_year <= solar_terms.LAST_YEAR:
+        return solar_terms.term_start(year, term), solar_terms.term_start(next_year, next_term)
+    
+    # Outside the term table: approximate dates, as in get_month_stem_branch
+    start_month, start_day = SOLAR_TERMS[chinese_month]
+    end_month, end_day = SOLAR_TERMS[(chinese_month + 1) % 12]
+    start_year = bazi_year + (chinese_month == 11)
+    end_year = bazi_year + (chinese_month >= 10)
+    return datetime(start_year, start_month, start_day), datetime(end_year, end_month, end_day)
+
+
+def find_datetimes(
+    year_pillar: PillarSpec,
+    month_pillar: PillarSpec,
+    day_pillar: PillarSpec,
+    hour_pillar: Optional[PillarSpec] = None,
+    start: datetime = datetime(solar_terms.FIRST_YEAR, 1, 1),
+    end: datetime = datetime(solar_terms.LAST_YEAR + 1, 1, 1)
+) -> Iterator[datetime]:
+    """
+    Find every whole-hour birth datetime in [start, end) with the given Four
+    Pillars, in chronological order. Leave hour_pillar as None to get every
+    hour of each matching day.
+    
+    Jumps through the 60-year cycle to the matching years, to the solar
+    month within each year, then to the day in the 60-day cycle, so
+    only matching datetimes are ever generated.
+    """
+    year_stem, year_branch = parse_pillar(year_pillar)
+    month_stem, month_branch = parse_pillar(month_pillar)
+    day_stem, day_branch = parse_pillar(day_pillar)
+    
+    # Month stem must follow the year stem (五虎遁)
+    chinese_month = (month_branch - 2) % 12
+    if month_stem != ((year_stem % 5) * 2 + 2 + chinese_month) % 10:
+        return
+    
+    if hour_pillar is None:
+        hours = list(range(24))
+    else:
+        hour_stem, hour_branch = parse_pillar(hour_pillar)
+        # Hour stem must follow the day stem (五鼠遁)
+        if hour_stem != ((day_stem % 5) * 2 + hour_branch) % 10:
+            return
+        hours = [0, 23] if hour_branch == 0 else [2 * hour_branch - 1, 2 * hour_branch]
+    
+    day_index = sexagenary_index(day_stem, day_branch)
+    
+    # First BaZi year in the 60-year cycle whose month could reach start
+    first_year = start.year - 1
+    bazi_year = first_year + (1984 + sexagenary_index(year_stem, year_branch) - first_year) % 60
+    
+    while bazi_year <= end.year:
+        window_start, window_end = get_month_window(bazi_year, chinese_month)
+        
+        # First day in the window with the matching 60-day cycle position
+        first_day = datetime(window_start.year, window_start.month, window_start.day)
+        day_stem_0, day_branch_0 = get_day_stem_branch(first_day)
+        offset = (day_index - sexagenary_index(day_stem_0, day_branch_0)) % 60
+        match_day = first_day + timedelta(days=offset)
+        
+        for hour in hours:
+            moment = match_day + timedelta(hours=hour)
+            if window_start <= moment < window_end and start <= moment < end:
+                yield moment
+        
+        bazi_year += 60
 
 
 def analyze_strength(bazi: Dict) -> Dict:
     """
     Analyze Day Master strength based on supporting/controlling elements.
     
-    This is a simplified analysis - real BaZi requires deeper consideration
-    of seasonal strength, hidden stems, etc.
+    This is a simplified analysis - see utils.bazi_strength for the
+    hidden-stem and seasonal weighted version.
     
     Returns strength assessment and suggested useful gods.
     """
     dm_element = bazi["day_master"]["element"]
     
-    # Element cycle
-    elements = ["Wood", "Fire", "Earth", "Metal", "Water"]
-    dm_idx = elements.index(dm_element)
+    relations = ELEMENT_RELATIONS[dm_element]
     
     # What produces DM (parent)
-    producing = elements[(dm_idx - 1) % 5]
-    # What DM produces (child)  
-    produced = elements[(dm_idx + 1) % 5]
+    producing = relations["produces_dm"]
+    # What DM produces (child)
+    produced = relations["dm_produces"]
     # What controls DM (克我)
-    controlling = elements[(dm_idx - 2) % 5]
+    controlling = relations["controls_dm"]
     # What DM controls (我克)
-    controlled = elements[(dm_idx + 2) % 5]
+    controlled = relations["dm_controls"]
     # Same element
     same = dm_element
     
@@ -331,75 +715,118 @@ def analyze_strength(bazi: Dict) -> Dict:
         "drain_count": drain_count,
         "useful_gods": useful_gods,
         "unfavorable": unfavorable,
-        "element_analysis": {
-            "produces_dm": producing,
-            "dm_produces": produced,
-            "controls_dm": controlling,
-            "dm_controls": controlled,
-        }
+        "element_analysis": dict(relations)
     }
 
 
 def get_ten_god_profile(dm_element: str, strength: str) -> Dict:
     """
     Suggest Ten God profile based on Day Master element and strength.
-    This is a simplified suggestion - real profiling requires full chart analysis.
+    This is a simplified suggestion for when the full chart is unknown -
+    calculate_ten_gods() derives the dominant god from the chart itself.
     """
-    profiles = {
-        ("Wood", "Weak"): {"profile": "Diplomat (Direct Resource)", "emoji": "🤝"},
-        ("Wood", "Strong"): {"profile": "Philosopher (Hurting Officer)", "emoji": "🎭"},
-        ("Fire", "Weak"): {"profile": "Analyzer (Indirect Resource)", "emoji": "🔍"},
-        ("Fire", "Strong"): {"profile": "Artist (Eating God)", "emoji": "🎨"},
-        ("Earth", "Weak"): {"profile": "Director (Direct Officer)", "emoji": "👔"},
-        ("Earth", "Strong"): {"profile": "Strategist (Direct Wealth)", "emoji": "📊"},
-        ("Metal", "Weak"): {"profile": "Pioneer (Indirect Wealth)", "emoji": "🎯"},
-        ("Metal", "Strong"): {"profile": "Warrior (7 Killings)", "emoji": "⚔️"},
-        ("Water", "Weak"): {"profile": "Connector (Friend)", "emoji": "🌐"},
-        ("Water", "Strong"): {"profile": "Competitor (Rob Wealth)", "emoji": "🏆"},
+    gods = {
+        ("Wood", "Weak"): "Direct Resource",
+        ("Wood", "Strong"): "Hurting Officer",
+        ("Fire", "Weak"): "Indirect Resource",
+        ("Fire", "Strong"): "Eating God",
+        ("Earth", "Weak"): "Direct Officer",
+        ("Earth", "Strong"): "Direct Wealth",
+        ("Metal", "Weak"): "Indirect Wealth",
+        ("Metal", "Strong"): "7 Killings",
+        ("Water", "Weak"): "Friend",
+        ("Water", "Strong"): "Rob Wealth",
     }
     
     key = (dm_element, strength if strength in ["Weak", "Strong"] else "Weak")
-    return profiles.get(key, {"profile": "Pioneer (Indirect Wealth)", "emoji": "🎯"})
+    return TEN_GOD_SUGGESTIONS[gods.get(key, "Indirect Wealth")]
 
 
-def calculate_full_profile(birth_date: datetime, birth_hour: int = 12) -> Dict:
+def calculate_ten_gods(bazi: Dict) -> Dict:
+    """
+    Ten God of every stem and hidden stem relative to the Day Master.
+    
+    Returns "stems" and "hidden_stems" by pillar name ("year", ...; the
+    day stem is the Day Master and is left out), weighted "scores" for
+    every god, and the "dominant_god" with the highest score.
+    utils.ten_gods labels arrays of charts the same way.
+    """
+    dm_gods = TEN_GOD_TABLE[bazi["day_master"].index]
+    scores = [0.0] * 10
+    stems = {}
+    hidden_stems = {}
+    
+    for position, name in enumerate(PILLAR_NAMES):
+        pillar = bazi[f"{name}_pillar"]
+        if TEN_GOD_STEM_WEIGHTS[position]:
+            god = dm_gods[pillar.stem.index]
+            stems[name] = TEN_GODS[god]
+            scores[god] += TEN_GOD_STEM_WEIGHTS[position]
+        hidden_stems[name] = []
+        for stem, weight in HIDDEN_STEMS[pillar.branch.index]:
+            god = dm_gods[STEM_INDEX[stem]]
+            hidden_stems[name].append(TEN_GODS[god])
+            scores[god] += TEN_GOD_BRANCH_WEIGHTS[position] * weight
+    
+    return {
+        "stems": stems,
+        "hidden_stems": hidden_stems,
+        "scores": {TEN_GODS[god]: round(score, 2) for god, score in enumerate(scores)},
+        "dominant_god": TEN_GODS[scores.index(max(scores))],
+    }
+
+
+# Memoized profiles kept by calculate_full_profile
+PROFILE_CACHE_SIZE = 1024
+
+
+def calculate_full_profile(birth_date: Union[date, datetime], birth_hour: int = 12) -> Dict:
     """
     Calculate complete BaZi profile with strength analysis and suggestions.
+    Results are memoized per (birth date, hour); each call returns its own
+    copy (stems, branches and pillars are immutable and stay shared).
     
     Args:
-        birth_date: Date of birth
+        birth_date: Date of birth (any time of day is ignored)
         birth_hour: Hour of birth (0-23)
     
     Returns:
         Complete profile ready for Settings page
     """
+    return copy.deepcopy(_cached_full_profile(birth_date.year, birth_date.month, birth_date.day, birth_hour))
+
+
+@lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def _cached_full_profile(year: int, month: int, day: int, birth_hour: int) -> Dict:
     # Calculate BaZi
-    bazi = calculate_bazi(birth_date, birth_hour)
+    bazi = calculate_bazi(datetime(year, month, day), birth_hour)
     
     # Analyze strength
     analysis = analyze_strength(bazi)
     
-    # Get profile suggestion
-    profile_suggestion = get_ten_god_profile(
-        bazi["day_master"]["element"],
-        analysis["strength"]
-    )
+    # Profile suggestion from the chart's dominant Ten God
+    ten_gods = calculate_ten_gods(bazi)
+    profile_suggestion = TEN_GOD_SUGGESTIONS[ten_gods["dominant_god"]]
+    
+    day_master = bazi["day_master"]
     
     # Build complete profile
     return {
         "bazi": bazi,
         "analysis": analysis,
+        "ten_gods": ten_gods,
         "profile_suggestion": profile_suggestion,
         
         # Ready for Settings page
         "settings_profile": {
-            "day_master": bazi["day_master"]["pinyin"],
-            "chinese": bazi["day_master"]["chinese"],
-            "element": bazi["day_master"]["element"],
-            "polarity": bazi["day_master"]["polarity"],
+            "day_master": day_master.pinyin,
+            "chinese": day_master.chinese,
+            "element": day_master.element,
+            "polarity": day_master.polarity,
             "strength": analysis["strength"],
             "useful_gods": analysis["useful_gods"],
             "unfavorable": analysis["unfavorable"],
+            "dominant_god": ten_gods["dominant_god"],
             "profile": profile_suggestion["profile"],
             "profile_emoji": profile_suggestion["emoji"],
             "special_structures": {
@@ -409,10 +836,10 @@ def calculate_full_profile(birth_date: datetime, birth_hour: int = 12) -> Dict:
                 "other": []
             },
             "four_pillars": {
-                "year": bazi["year_pillar"]["display"],
-                "month": bazi["month_pillar"]["display"],
-                "day": bazi["day_pillar"]["display"],
-                "hour": bazi["hour_pillar"]["display"],
+                "year": bazi["year_pillar"].display,
+                "month": bazi["month_pillar"].display,
+                "day": bazi["day_pillar"].display,
+                "hour": bazi["hour_pillar"].display,
             },
             "animal_sign": bazi["animal_sign"],
         }
@@ -423,6 +850,11 @@ def calculate_full_profile(birth_date: datetime, birth_hour: int = 12) -> Dict:
 # UTILITY FUNCTIONS
 # ==============================================================================
 
+def clear_profile_cache():
+    """Drop all memoized profiles"""
+    _cached_full_profile.cache_clear()
+
+
 def format_four_pillars(bazi: Dict) -> str:
     """Format four pillars for display."""
     return (
@@ -472,4 +904,5 @@ if __name__ == "__main__":
     print(f"Useful Gods: {', '.join(result['analysis']['useful_gods'])}")
     print(f"Unfavorable: {', '.join(result['analysis']['unfavorable'])}")
     print()
+    print(f"Dominant God: {result['ten_gods']['dominant_god']}")
     print(f"Suggested Profile: {result['profile_suggestion']['emoji']} {result['profile_suggestion']['profile']}")
@@ -3,16 +3,24 @@ BaZi Profile Management
 Handles user BaZi profile storage and calculations
 """
 
+import copy
 import json
 import os
-from typing import Dict, Any, Optional, List
+import sqlite3
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Union
 from pathlib import Path
 
+from utils.profile_compiler import CompiledProfile, compile_profile, palace_components
+from utils.profile_schema import PROFILE_SCHEMA_VERSION, migrate_profile
+from utils.profile_repository import ProfileRepository, REPOSITORY_FILE, DEFAULT_USER_ID, merge_profile
+
 # Get the project root directory (parent of utils folder)
 PROJECT_ROOT = Path(__file__).parent.parent
 
 # Default profile path - absolute path
 PROFILE_DIR = PROJECT_ROOT / "data"
+# Single-user profile file from before the repository; read once to seed the default user
 PROFILE_FILE = PROFILE_DIR / "user_profile.json"
 
 # Day Master Information (Chinese key)
@@ -162,6 +170,7 @@ ELEMENT_COLORS = {
 
 # Default BaZi profile (as specified by user)
 DEFAULT_PROFILE = {
+    "schema_version": PROFILE_SCHEMA_VERSION,
     "day_master": {
         "chinese": "庚",
         "pinyin": "Geng",
@@ -200,179 +209,176 @@ DEFAULT_PROFILE = {
 }
 
 
-def ensure_data_dir():
-    """Ensure the data directory exists"""
-    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+_repository: Optional[ProfileRepository] = None
 
+# Profile fields a Settings page save replaces; settings and special structures are kept
+SETTINGS_PAGE_FIELDS = (
+    "day_master", "strength", "useful_gods", "unfavorable_elements", "ten_god_profile",
+    "birth_date", "birth_time", "four_pillars",
+)
 
-def load_profile() -> Dict[str, Any]:
-    """Load user profile from file, or return default"""
-    ensure_data_dir()
-    
-    if PROFILE_FILE.exists():
-        try:
-            with open(PROFILE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return DEFAULT_PROFILE.copy()
-    
-    # Save default profile if none exists
-    save_profile(DEFAULT_PROFILE)
-    return DEFAULT_PROFILE.copy()
 
+def get_profile_repository() -> ProfileRepository:
+    """The process-wide multi-user profile repository, created on first use"""
+    global _repository
+    if _repository is None:
+        _repository = ProfileRepository(REPOSITORY_FILE)
+    return _repository
 
-def save_profile(profile: Dict[str, Any]) -> bool:
-    """Save user profile to file"""
-    ensure_data_dir()
-    
+
+def _read_legacy_profile() -> Optional[Dict[str, Any]]:
+    """The single-user PROFILE_FILE (migrated), or None if it is missing or unreadable"""
     try:
-        with open(PROFILE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(profile, f, indent=2, ensure_ascii=False)
+        with open(PROFILE_FILE, 'r', encoding='utf-8') as f:
+            return migrate_profile(json.load(f))
+    except (OSError, json.JSONDecodeError, ValueError, AttributeError):
+        return None
+
+
+def _initial_profile(user_id: str) -> Dict[str, Any]:
+    """Profile for a user with none saved: the legacy PROFILE_FILE for the default user, else the default"""
+    if user_id == DEFAULT_USER_ID:
+        profile = _read_legacy_profile()
+        if profile is not None:
+            return profile
+    return copy.deepcopy(DEFAULT_PROFILE)
+
+
+def load_profile(user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
+    """Load a user's profile, or save and return the default (unsaved if the repository fails)"""
+    try:
+        profile = get_profile_repository().get(user_id)
+    except (sqlite3.Error, OSError):
+        return _initial_profile(user_id)
+    if profile is None:
+        profile = _initial_profile(user_id)
+        save_profile(profile, user_id)
+    return profile
+
+
+def save_profile(profile: Dict[str, Any], user_id: str = DEFAULT_USER_ID) -> bool:
+    """Save a user's profile"""
+    try:
+        get_profile_repository().put(profile, user_id)
         return True
-    except IOError:
+    except (sqlite3.Error, OSError):
         return False
 
 
-def update_day_master(chinese_stem: str) -> Dict[str, Any]:
+def update_profile(changes: Dict[str, Any], user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
+    """
+    Apply several top-level field changes in one repository update (one
+    read and one write); if the repository fails, to the default (unsaved)
+    """
+    try:
+        return get_profile_repository().update(changes, user_id, default=lambda: _initial_profile(user_id))
+    except (sqlite3.Error, OSError):
+        return merge_profile(_initial_profile(user_id), changes)
+
+
+def save_settings_profile(page_profile: Dict[str, Any], user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
+    """Save the fields the Settings page sets (labels like "庚 Geng") in one update"""
+    migrated = migrate_profile(page_profile)
+    return update_profile({key: migrated[key] for key in SETTINGS_PAGE_FIELDS if key in migrated}, user_id)
+
+
+def update_day_master(chinese_stem: str, user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
     """Update profile with new day master"""
-    profile = load_profile()
+    if chinese_stem not in DAY_MASTERS:
+        return load_profile(user_id)
     
-    if chinese_stem in DAY_MASTERS:
-        dm_info = DAY_MASTERS[chinese_stem]
-        profile["day_master"] = {
+    dm_info = DAY_MASTERS[chinese_stem]
+    return update_profile({
+        "day_master": {
             "chinese": chinese_stem,
             "pinyin": dm_info["pinyin"],
             "element": dm_info["element"],
             "polarity": dm_info["polarity"],
         }
-        save_profile(profile)
-    
-    return profile
+    }, user_id)
 
 
-def update_strength(strength: str, score: int = 5) -> Dict[str, Any]:
+def update_strength(strength: str, score: int = 5, user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
     """Update profile strength assessment"""
-    profile = load_profile()
-    profile["strength"] = strength
-    profile["strength_score"] = score
-    save_profile(profile)
-    return profile
+    return update_profile({"strength": strength, "strength_score": score}, user_id)
 
 
-def update_useful_gods(primary: str, secondary: str, reasoning: str = "") -> Dict[str, Any]:
+def update_useful_gods(primary: str, secondary: str, reasoning: str = "",
+                       user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
     """Update useful gods"""
-    profile = load_profile()
-    profile["useful_gods"] = {
-        "primary": primary,
-        "secondary": secondary,
-        "reasoning": reasoning
-    }
-    save_profile(profile)
-    return profile
+    return update_profile({
+        "useful_gods": {
+            "primary": primary,
+            "secondary": secondary,
+            "reasoning": reasoning
+        }
+    }, user_id)
 
 
-def update_ten_god_profile(dominant_god: str) -> Dict[str, Any]:
+def update_ten_god_profile(dominant_god: str, user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
     """Update ten god profile"""
-    profile = load_profile()
+    if dominant_god not in TEN_GOD_PROFILES:
+        return load_profile(user_id)
     
-    if dominant_god in TEN_GOD_PROFILES:
-        god_info = TEN_GOD_PROFILES[dominant_god]
-        profile["ten_god_profile"] = {
+    god_info = TEN_GOD_PROFILES[dominant_god]
+    return update_profile({
+        "ten_god_profile": {
             "dominant_god": dominant_god,
             "profile_name": god_info["name"],
             "behavioral_traits": god_info["traits"]
         }
-        save_profile(profile)
-    
-    return profile
+    }, user_id)
 
 
-def calculate_bazi_alignment(profile: Dict[str, Any], palace_data: Dict[str, Any]) -> Dict[str, Any]:
+def calculate_bazi_alignment(profile: Union[Dict[str, Any], CompiledProfile], palace_data: Any) -> Dict[str, Any]:
     """
     Calculate how well a QMDJ palace aligns with user's BaZi profile
-    Returns alignment score and detailed breakdown
+    Returns alignment score and detailed breakdown.
+    Dict profiles are compiled once per distinct profile (compile_profile
+    caches them), so scoring many palaces does not rebuild the weights.
     """
-    # Handle both old (dict) and new (list/string) formats
-    useful_gods = profile.get("useful_gods", [])
-    if isinstance(useful_gods, dict):
-        useful_primary = useful_gods.get("primary", "")
-        useful_secondary = useful_gods.get("secondary", "")
-    elif isinstance(useful_gods, list):
-        useful_primary = useful_gods[0] if len(useful_gods) > 0 else ""
-        useful_secondary = useful_gods[1] if len(useful_gods) > 1 else ""
-    else:
-        useful_primary = ""
-        useful_secondary = ""
-    
-    unfavorable_list = profile.get("unfavorable", profile.get("unfavorable_elements", []))
-    if isinstance(unfavorable_list, dict):
-        unfavorable = unfavorable_list.get("primary", "")
-    elif isinstance(unfavorable_list, list):
-        unfavorable = unfavorable_list[0] if len(unfavorable_list) > 0 else ""
-    else:
-        unfavorable = ""
-    
-    dm = profile.get("day_master", "Geng")
-    if isinstance(dm, dict):
-        dm_element = dm.get("element", "Metal")
-    else:
-        # day_master is a string like "Ji", get element from profile or lookup
-        dm_element = profile.get("element", "Metal")
+    components, codes = palace_components(palace_data)
+    return compile_profile(profile).align(components, codes)
+
+
+def calculate_bazi_alignment_batch(
+    profile: Union[Dict[str, Any], CompiledProfile],
+    charts: Union[List["QMDJChart"], Dict[str, Any]],
+    top: int = 5
+) -> Dict[str, Any]:
+    """
+    Alignment score of every palace of a block of charts in one pass, e.g.
+    a day of 12 double-hours x 9 palaces. charts are chart objects or
+    generate_charts() arrays. No detail or warning strings are built.
     
-    alignment = {
-        "score": 5,  # Base score
-        "useful_god_activation": 0,
-        "dm_support": 0,
-        "clash_penalty": 0,
-        "details": [],
-        "warnings": []
-    }
+    Returns "score" (n_charts, 9; column j is palace j + 1) and "top":
+    the best top (chart index, palace) pairs as
+    [{"chart", "palace", "datetime", "score"}, ...], best first
+    (earlier charts and lower palace numbers win ties).
+    """
+    import numpy as np
     
-    # Check components for useful gods
-    components = []
-    if "heaven_stem" in palace_data:
-        components.append(("Heaven Stem", palace_data["heaven_stem"].get("element", "")))
-    if "earth_stem" in palace_data:
-        components.append(("Earth Stem", palace_data["earth_stem"].get("element", "")))
-    if "door" in palace_data:
-        components.append(("Door", palace_data["door"].get("element", "")))
-    if "star" in palace_data:
-        components.append(("Star", palace_data["star"].get("element", "")))
+    from utils.calculations import chart_element_codes
     
-    for name, element in components:
-        if element == useful_primary:
-            alignment["useful_god_activation"] += 2
-            alignment["details"].append(f"✅ {element} ({name}) = Primary useful god active")
-        elif element == useful_secondary:
-            alignment["useful_god_activation"] += 1
-            alignment["details"].append(f"✅ {element} ({name}) = Secondary useful god active")
-        elif element == unfavorable:
-            alignment["clash_penalty"] -= 2
-            alignment["warnings"].append(f"⚠️ {element} ({name}) = Unfavorable element present")
-        elif element == dm_element:
-            alignment["dm_support"] += 1
-            alignment["details"].append(f"👤 {element} ({name}) = Same as Day Master")
+    scores = compile_profile(profile).score_elements(chart_element_codes(charts))
+    if isinstance(charts, dict):
+        datetimes = [dt.astype(datetime) for dt in charts["datetimes"]]
+    else:
+        datetimes = [chart.datetime for chart in charts]
     
-    # Check for resource support (element that produces DM)
-    element_producers = {
-        "Wood": "Water",
-        "Fire": "Wood",
-        "Earth": "Fire",
-        "Metal": "Earth",
-        "Water": "Metal"
+    order = np.argsort(-scores, axis=None, kind="stable")[:max(top, 0)]
+    return {
+        "score": scores,
+        "top": [
+            {
+                "chart": int(i // 9),
+                "palace": int(i % 9) + 1,
+                "datetime": datetimes[i // 9],
+                "score": float(scores.flat[i]),
+            }
+            for i in order
+        ],
     }
-    resource_element = element_producers.get(dm_element, "")
-    
-    for name, element in components:
-        if element == resource_element and element not in [useful_primary, useful_secondary]:
-            alignment["dm_support"] += 0.5
-            alignment["details"].append(f"🔋 {element} ({name}) = Resource for Day Master")
-    
-    # Calculate final score
-    total = 5 + alignment["useful_god_activation"] + alignment["dm_support"] + alignment["clash_penalty"]
-    alignment["score"] = max(1, min(10, round(total, 1)))
-    
-    return alignment
 
 
 def get_profile_display_text(profile: Dict[str, Any]) -> str:
@@ -401,21 +407,5 @@ def get_profile_options() -> List[tuple]:
 
 
 def get_default_profile() -> Dict[str, Any]:
-    """Return the default BaZi profile for a Weak Geng Metal Pioneer"""
-    return {
-        "day_master": "Geng",
-        "chinese": "庚",
-        "element": "Metal",
-        "polarity": "Yang",
-        "strength": "Weak",
-        "useful_gods": ["Earth", "Metal"],
-        "unfavorable": ["Fire"],
-        "profile": "Pioneer (Indirect Wealth)",
-        "profile_emoji": "🎯",
-        "special_structures": {
-            "wealth_vault": True,
-            "nobleman": False,
-            "traveling_horse": False,
-            "other": []
-        }
-    }
+    """Return the default BaZi profile for a Weak Geng Metal Pioneer (current schema)"""
+    return copy.deepcopy(DEFAULT_PROFILE)
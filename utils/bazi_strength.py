@@ -0,0 +1,162 @@
+"""
+BaZi Strength Module
+Day Master strength from hidden-stem weighted element scores with
+seasonal multipliers, for one chart or a batch of charts
+"""
+
+from typing import Dict, Any, Sequence
+
+import numpy as np
+
+from utils.bazi_calculator import (
+    HEAVENLY_STEMS, HIDDEN_STEMS, PILLAR_KEYS, STEM_INDEX,
+    calculate_bazi_batch
+)
+from utils.elements import RELATION_MATRIX, SAME, PRODUCED_BY, CONTROLLED_BY, CONTROLS, PRODUCES
+from utils.mappings import ELEMENT_ORDER, ELEMENT_CODES
+
+# Element weight rows (10 x 5 and 12 x 5), columns in ELEMENT_ORDER
+STEM_ELEMENT_WEIGHTS = np.zeros((10, 5))
+for _i, _stem in enumerate(HEAVENLY_STEMS):
+    STEM_ELEMENT_WEIGHTS[_i, ELEMENT_CODES[_stem["element"]]] = 1.0
+
+BRANCH_ELEMENT_WEIGHTS = np.zeros((12, 5))
+for _i, _hidden in enumerate(HIDDEN_STEMS):
+    for _stem, _weight in _hidden:
+        BRANCH_ELEMENT_WEIGHTS[_i] += _weight * STEM_ELEMENT_WEIGHTS[STEM_INDEX[_stem]]
+
+# Season (旺相休囚死) multiplier by relationship of an element to the
+# month branch's season element
+SEASON_ELEMENTS = ["Water", "Earth", "Wood", "Wood", "Earth", "Fire",
+                   "Fire", "Earth", "Metal", "Metal", "Earth", "Water"]
+SEASONAL_WEIGHTS = {
+    SAME: 1.5,           # 旺 prosperous
+    PRODUCED_BY: 1.2,    # 相 supported by the season
+    PRODUCES: 1.0,       # 休 resting
+    CONTROLS: 0.8,       # 囚 confined
+    CONTROLLED_BY: 0.6,  # 死 dead
+}
+_SEASON_CODES = np.array([ELEMENT_CODES[e] for e in SEASON_ELEMENTS])
+_RELATION_WEIGHTS = np.array([SEASONAL_WEIGHTS[r] for r in range(5)])
+# By [month branch][element]
+SEASONAL_MULTIPLIERS = _RELATION_WEIGHTS[RELATION_MATRIX[:, _SEASON_CODES].T]
+
+# Position weights: year, month, day, hour (month branch commands the season)
+STEM_POSITION_WEIGHTS = (1.0, 1.0, 1.0, 1.0)
+BRANCH_POSITION_WEIGHTS = (1.0, 1.5, 1.0, 1.0)
+
+# Support share of the total at or above which the Day Master is strong,
+# and at or below which it is weak
+STRONG_RATIO = 0.55
+WEAK_RATIO = 0.45
+STRENGTH_LEVELS = ["Weak", "Balanced", "Strong"]
+
+# Elements relative to each Day Master element code
+_PRODUCING = (np.arange(5) - 1) % 5
+_PRODUCED = (np.arange(5) + 1) % 5
+_CONTROLLING = (np.arange(5) - 2) % 5
+_CONTROLLED = (np.arange(5) + 2) % 5
+_SAME = np.arange(5)
+_NONE = -1
+
+del _i, _stem, _hidden, _weight
+
+
+def pillars_from_bazi(bazi: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Index arrays (batch of one, keyed by PILLAR_KEYS) from a calculate_bazi() result"""
+    values = []
+    for pillar in ("year_pillar", "month_pillar", "day_pillar", "hour_pillar"):
+        values.append(bazi[pillar].stem.index)
+        values.append(bazi[pillar].branch.index)
+    return {key: np.array([value], dtype=np.int8) for key, value in zip(PILLAR_KEYS, values)}
+
+
+def element_scores(
+    pillars: Dict[str, np.ndarray],
+    stem_weights: Sequence[float] = STEM_POSITION_WEIGHTS,
+    branch_weights: Sequence[float] = BRANCH_POSITION_WEIGHTS,
+    seasonal_multipliers: np.ndarray = SEASONAL_MULTIPLIERS
+) -> np.ndarray:
+    """
+    Weighted element scores (n_charts, 5), columns in ELEMENT_ORDER.
+    Stems count fully, branches through their hidden stems, and each
+    element is then scaled by its season in the month branch.
+    """
+    scores = 0
+    for position, name in enumerate(("year", "month", "day", "hour")):
+        scores = scores + stem_weights[position] * STEM_ELEMENT_WEIGHTS[pillars[f"{name}_stem"]]
+        scores = scores + branch_weights[position] * BRANCH_ELEMENT_WEIGHTS[pillars[f"{name}_branch"]]
+    return scores * seasonal_multipliers[pillars["month_branch"]]
+
+
+def analyze_strength_batch(
+    pillars: Dict[str, np.ndarray],
+    strong_ratio: float = STRONG_RATIO,
+    weak_ratio: float = WEAK_RATIO,
+    **weights
+) -> Dict[str, np.ndarray]:
+    """
+    Day Master strength for a batch of charts (calculate_bazi_batch() output).
+
+    Returns "element_scores" (n, 5), "support" and "drain" totals, "ratio"
+    (support share), "strength" (codes into STRENGTH_LEVELS), and
+    "useful_gods" / "unfavorable" as (n, 2) element codes padded with -1.
+    weights are passed on to element_scores().
+    """
+    scores = element_scores(pillars, **weights)
+    dm = STEM_ELEMENT_WEIGHTS[pillars["day_stem"]].argmax(axis=1)
+    rows = np.arange(len(dm))
+
+    support = scores[rows, _SAME[dm]] + scores[rows, _PRODUCING[dm]]
+    total = scores.sum(axis=1)
+    ratio = np.divide(support, total, out=np.zeros_like(support), where=total > 0)
+
+    strength = np.where(ratio >= strong_ratio, 2, np.where(ratio <= weak_ratio, 0, 1)).astype(np.int8)
+
+    # Strong: drain with what DM controls and produces; weak: support;
+    # balanced: resource only
+    none = np.full_like(dm, _NONE)
+    strong, weak = (strength == 2)[:, None], (strength == 0)[:, None]
+    useful = np.select(
+        [strong, weak],
+        [np.stack([_CONTROLLED[dm], _PRODUCED[dm]], axis=1), np.stack([_PRODUCING[dm], _SAME[dm]], axis=1)],
+        np.stack([_PRODUCING[dm], none], axis=1)
+    )
+    unfavorable = np.select(
+        [strong, weak],
+        [np.stack([_PRODUCING[dm], _SAME[dm]], axis=1), np.stack([_CONTROLLING[dm], _CONTROLLED[dm]], axis=1)],
+        np.stack([_CONTROLLING[dm], none], axis=1)
+    )
+
+    return {
+        "element_scores": scores,
+        "support": support,
+        "drain": total - support,
+        "ratio": ratio,
+        "strength": strength,
+        "useful_gods": useful.astype(np.int8),
+        "unfavorable": unfavorable.astype(np.int8),
+    }
+
+
+def analyze_weighted_strength(bazi: Dict[str, Any], **options) -> Dict[str, Any]:
+    """
+    Weighted strength for one calculate_bazi() result, shaped like
+    analyze_strength() plus "element_scores" by element name and "ratio"
+    """
+    result = analyze_strength_batch(pillars_from_bazi(bazi), **options)
+    scores = result["element_scores"][0]
+    return {
+        "strength": STRENGTH_LEVELS[result["strength"][0]],
+        "support_score": round(float(result["support"][0]), 2),
+        "drain_score": round(float(result["drain"][0]), 2),
+        "ratio": round(float(result["ratio"][0]), 3),
+        "element_scores": {ELEMENT_ORDER[e]: round(float(scores[e]), 2) for e in range(5)},
+        "useful_gods": [ELEMENT_ORDER[e] for e in result["useful_gods"][0] if e >= 0],
+        "unfavorable": [ELEMENT_ORDER[e] for e in result["unfavorable"][0] if e >= 0],
+    }
+
+
+def analyze_births(birth_dates, birth_hours=12, **options) -> Dict[str, np.ndarray]:
+    """Weighted strength straight from arrays of birth dates and hours"""
+    return analyze_strength_batch(calculate_bazi_batch(birth_dates, birth_hours), **options)
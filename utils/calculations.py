@@ -3,23 +3,83 @@ QMDJ Calculations Module
 Handles chart generation using kinqimen library or fallback calculations
 """
 
-from datetime import datetime
-from typing import Dict, Any, Optional, List
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple, Union
+from array import array
+import json
+import logging
+import os
 import random
-
-# Try to import kinqimen, fall back to simulation if not available
-try:
-    from kinqimen import QiMen
-    KINQIMEN_AVAILABLE = True
-except ImportError:
-    KINQIMEN_AVAILABLE = False
+import re
+import sys
+import threading
 
 from utils.mappings import (
     STAR_MAPPING, DOOR_MAPPING, DEITY_MAPPING,
     STAR_ELEMENTS, DOOR_ELEMENTS, DEITY_NATURES,
     STAR_CATEGORIES, DOOR_CATEGORIES,
+    STEM_ORDER, STAR_ORDER, DOOR_ORDER, DEITY_ORDER, ELEMENT_ORDER,
+    STEM_CODES, STAR_CODES, DOOR_CODES, DEITY_CODES, ELEMENT_CODES,
+    UNKNOWN_CODE, STAR_MAPPING_REVERSE, DOOR_MAPPING_REVERSE, DEITY_MAPPING_REVERSE,
     translate_star, translate_door, translate_deity
 )
+from utils.bazi_calculator import parse_pillar, sexagenary_index
+from utils.chart_table import (
+    TABLE_SIZE, get_layout_index, get_layout, get_solar_term, layout_index, resolve_layout,
+    store_layout, table_fill_count
+)
+from utils.chart_cache import ChartCache
+from utils.elements import strength_in_palace
+from utils.formations import get_formation_index, match_formations
+
+logger = logging.getLogger(__name__)
+
+# kinqimen is imported on the first chart request (or by warm_up_engine),
+# falling back to simulation if it is not available
+QiMen = None
+_engine_loaded = False
+_engine_lock = threading.Lock()
+
+
+def load_engine() -> bool:
+    """Import kinqimen if not done yet; returns whether it is available"""
+    global QiMen, _engine_loaded
+    if not _engine_loaded:
+        with _engine_lock:
+            if not _engine_loaded:
+                try:
+                    from kinqimen import QiMen
+                except ImportError:
+                    QiMen = None
+                _engine_loaded = True
+    return QiMen is not None
+
+
+def warm_up_engine(background: bool = True, build_table: bool = False) -> Optional[threading.Thread]:
+    """
+    Load the chart engine ahead of the first chart request.
+    With build_table=True the kinqimen layout table is pre-resolved as well.
+    Runs in a daemon thread unless background=False; returns the thread.
+    """
+    def warm_up():
+        if load_engine() and build_table:
+            build_chart_table()
+    
+    if not background:
+        warm_up()
+        return None
+    
+    thread = threading.Thread(target=warm_up, name="qmdj-engine-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name: str):
+    # KINQIMEN_AVAILABLE is resolved lazily so importing this module stays cheap
+    if name == "KINQIMEN_AVAILABLE":
+        return load_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Element relationships for strength calculation
 ELEMENT_CYCLE = {
@@ -49,18 +109,7 @@ def calculate_strength(component_element: str, palace_element: str) -> tuple:
     Calculate the strength of a component based on its element and the palace element.
     Returns (strength_name, strength_score)
     """
-    if component_element == palace_element:
-        return ("Timely", 2)
-    elif ELEMENT_CYCLE[palace_element]["produces"] == component_element:
-        return ("Prosperous", 3)
-    elif ELEMENT_CYCLE[palace_element]["produced_by"] == component_element:
-        return ("Resting", 0)
-    elif ELEMENT_CYCLE[palace_element]["controls"] == component_element:
-        return ("Confined", -2)
-    elif ELEMENT_CYCLE[palace_element]["controlled_by"] == component_element:
-        return ("Dead", -3)
-    else:
-        return ("Neutral", 0)
+    return strength_in_palace(component_element, palace_element)
 
 
 def get_stem_element(stem: str) -> str:
@@ -86,6 +135,217 @@ def get_stem_polarity(stem: str) -> str:
     return "Yang" if stem in yang_stems else "Yin"
 
 
+# Per-code lookups for compact palaces. Each list carries one trailing slot,
+# so UNKNOWN_CODE (-1) indexes the same default the dict builders used.
+_ELEMENT_NAMES = ELEMENT_ORDER + ["Unknown"]
+_STEM_ELEMENTS = [ELEMENT_CODES[get_stem_element(s)] for s in STEM_ORDER] + [UNKNOWN_CODE]
+_DOOR_ELEMENTS = [ELEMENT_CODES[DOOR_ELEMENTS[d]] for d in DOOR_ORDER] + [ELEMENT_CODES["Earth"]]
+_STAR_ELEMENTS = [ELEMENT_CODES[STAR_ELEMENTS[s]] for s in STAR_ORDER] + [ELEMENT_CODES["Metal"]]
+_STEM_NAMES = STEM_ORDER + [""]
+_DOOR_NAMES = DOOR_ORDER + ["Unknown"]
+_STAR_NAMES = STAR_ORDER + ["Unknown"]
+_DEITY_NAMES = DEITY_ORDER + ["Unknown"]
+_DOOR_CATEGORY_NAMES = [DOOR_CATEGORIES[d] for d in DOOR_ORDER] + ["Neutral"]
+_STAR_CATEGORY_NAMES = [STAR_CATEGORIES[s] for s in STAR_ORDER] + ["Neutral"]
+_DEITY_NATURE_NAMES = [DEITY_NATURES[d] for d in DEITY_ORDER] + ["Neutral"]
+_DEITY_BONUSES = [{"Auspicious": 2, "Inauspicious": -1}.get(n, 0) for n in _DEITY_NATURE_NAMES]
+_DOOR_BONUSES = [{"Auspicious": 1, "Inauspicious": -1}.get(c, 0) for c in _DOOR_CATEGORY_NAMES]
+
+# (strength_name, score) by [component element code][palace element code]
+_STRENGTHS = [
+    [calculate_strength(component, palace) for palace in ELEMENT_ORDER]
+    for component in ELEMENT_ORDER
+] + [[("Neutral", 0)] * len(ELEMENT_ORDER)]
+
+
+# Bytes of a compact chart without raw names: structure, ju and 9 x 5 codes
+COMPACT_SIZE = 2 + 9 * 5
+
+
+def chart_hour(dt: datetime) -> datetime:
+    """The chart hour a datetime falls in; charts are generated per hour"""
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _raw_tuple(raw: Optional[list]) -> Optional[tuple]:
+    """Palace.raw from its JSON form ([name, chinese] pairs or nulls)"""
+    if not raw:
+        return None
+    return tuple(tuple(pair) if pair is not None else None for pair in raw)
+
+
+# Engine names already reported as unmapped
+_unmapped_names = set()
+
+
+def _log_unmapped(raw: tuple):
+    """Log each engine name outside the code tables once"""
+    for component, pair in zip(CODE_COMPONENTS, raw):
+        if pair is not None and (component, pair) not in _unmapped_names:
+            _unmapped_names.add((component, pair))
+            logger.warning("Unmapped %s name %r (%s); keeping the raw name", component, pair[0], pair[1])
+
+
+class Palace:
+    """
+    Compact, read-only palace: small-int codes for stems, door, star and deity.
+    Elements, strengths and scores are derived from the codes on demand;
+    to_dict() decodes to the nested dict shape for presentation and export.
+    
+    raw keeps the engine's (name, chinese) pair for each component whose
+    name is outside the code tables (None if all were mapped); the compact
+    form carries it as a JSON trailer.
+    """
+    
+    __slots__ = ("number", "heaven_stem", "earth_stem", "door", "star", "deity", "raw")
+    
+    def __init__(self, number: int, heaven_stem: int, earth_stem: int,
+                 door: int, star: int, deity: int,
+                 raw: Optional[Tuple[Optional[Tuple[str, str]], ...]] = None):
+        for name, value in zip(self.__slots__, (number, heaven_stem, earth_stem, door, star, deity, raw)):
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Palace is read-only")
+    
+    def __eq__(self, other):
+        return (isinstance(other, Palace) and self.codes == other.codes
+                and self.number == other.number and self.raw == other.raw)
+    
+    def __hash__(self):
+        return hash((self.number,) + self.codes)
+    
+    def __repr__(self):
+        return f"Palace({self.number}, {', '.join(str(c) for c in self.codes)})"
+    
+    def __reduce__(self):
+        return (Palace, (self.number,) + self.codes + (self.raw,))
+    
+    @classmethod
+    def from_names(cls, number: int, heaven_stem: str, earth_stem: str,
+                   door: str, star: str, deity: str,
+                   chinese: Tuple[str, str, str] = ("", "", "")) -> "Palace":
+        """
+        Build a palace from a Chinese stem pair and English door/star/deity
+        names (chinese: the engine's door/star/deity text, kept if unmapped)
+        """
+        codes = (
+            STEM_CODES.get(heaven_stem, UNKNOWN_CODE),
+            STEM_CODES.get(earth_stem, UNKNOWN_CODE),
+            DOOR_CODES.get(door, UNKNOWN_CODE),
+            STAR_CODES.get(star, UNKNOWN_CODE),
+            DEITY_CODES.get(deity, UNKNOWN_CODE),
+        )
+        raw = None
+        if UNKNOWN_CODE in codes:
+            names = ((heaven_stem, heaven_stem), (earth_stem, earth_stem),
+                     (door, chinese[0]), (star, chinese[1]), (deity, chinese[2]))
+            raw = tuple(name if code == UNKNOWN_CODE else None for code, name in zip(codes, names))
+            _log_unmapped(raw)
+        return cls(number, *codes, raw)
+    
+    def _raw(self, component: int) -> Optional[Tuple[str, str]]:
+        """Engine (name, chinese) of an unmapped component, or None"""
+        return self.raw[component] if self.raw else None
+    
+    @property
+    def codes(self) -> tuple:
+        """(heaven_stem, earth_stem, door, star, deity) codes"""
+        return (self.heaven_stem, self.earth_stem, self.door, self.star, self.deity)
+    
+    @property
+    def element(self) -> int:
+        """Palace element code"""
+        return ELEMENT_CODES[PALACE_ELEMENTS[self.number]]
+    
+    @property
+    def component_elements(self) -> tuple:
+        """Element codes of (heaven_stem, earth_stem, door, star)"""
+        return (
+            _STEM_ELEMENTS[self.heaven_stem],
+            _STEM_ELEMENTS[self.earth_stem],
+            _DOOR_ELEMENTS[self.door],
+            _STAR_ELEMENTS[self.star],
+        )
+    
+    @property
+    def scores(self) -> tuple:
+        """Strength scores of (heaven_stem, earth_stem, door, star)"""
+        palace_element = self.element
+        return tuple(_STRENGTHS[e][palace_element][1] for e in self.component_elements)
+    
+    @property
+    def deity_nature(self) -> str:
+        return _DEITY_NATURE_NAMES[self.deity]
+    
+    @property
+    def door_category(self) -> str:
+        return _DOOR_CATEGORY_NAMES[self.door]
+    
+    def raw_score(self) -> int:
+        """Component total plus deity and door category bonuses"""
+        return sum(self.scores) + _DEITY_BONUSES[self.deity] + _DOOR_BONUSES[self.door]
+    
+    def _decode_stem(self, code: int, palace_element: int, raw: Optional[Tuple[str, str]] = None) -> Dict[str, Any]:
+        element = _STEM_ELEMENTS[code]
+        strength = _STRENGTHS[element][palace_element]
+        chinese = raw[1] if raw else _STEM_NAMES[code]
+        return {
+            "chinese": chinese,
+            "element": _ELEMENT_NAMES[element],
+            "polarity": get_stem_polarity(chinese),
+            "strength": strength[0],
+            "score": strength[1],
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Decode to the nested palace dict used by pages and exports"""
+        palace_element = self.element
+        door_raw, star_raw, deity_raw = self._raw(2), self._raw(3), self._raw(4)
+        door_name = door_raw[0] if door_raw else _DOOR_NAMES[self.door]
+        star_name = star_raw[0] if star_raw else _STAR_NAMES[self.star]
+        deity_name = deity_raw[0] if deity_raw else _DEITY_NAMES[self.deity]
+        door_element = _DOOR_ELEMENTS[self.door]
+        star_element = _STAR_ELEMENTS[self.star]
+        door_strength = _STRENGTHS[door_element][palace_element]
+        star_strength = _STRENGTHS[star_element][palace_element]
+        
+        return {
+            "palace_number": self.number,
+            "palace_element": PALACE_ELEMENTS[self.number],
+            "heaven_stem": self._decode_stem(self.heaven_stem, palace_element, self._raw(0)),
+            "earth_stem": self._decode_stem(self.earth_stem, palace_element, self._raw(1)),
+            "door": {
+                "name": door_name,
+                "chinese": door_raw[1] if door_raw else DOOR_MAPPING_REVERSE.get(door_name, ""),
+                "element": _ELEMENT_NAMES[door_element],
+                "category": _DOOR_CATEGORY_NAMES[self.door],
+                "strength": door_strength[0],
+                "score": door_strength[1],
+            },
+            "star": {
+                "name": star_name,
+                "chinese": star_raw[1] if star_raw else STAR_MAPPING_REVERSE.get(star_name, ""),
+                "element": _ELEMENT_NAMES[star_element],
+                "category": _STAR_CATEGORY_NAMES[self.star],
+                "strength": star_strength[0],
+                "score": star_strength[1],
+            },
+            "deity": {
+                "name": deity_name,
+                "chinese": deity_raw[1] if deity_raw else DEITY_MAPPING_REVERSE.get(deity_name, ""),
+                "nature": _DEITY_NATURE_NAMES[self.deity],
+            },
+        }
+
+
+def decode_palace(palace) -> Dict[str, Any]:
+    """Decode a compact palace to its dict shape (dicts pass through unchanged)"""
+    if isinstance(palace, Palace):
+        return palace.to_dict()
+    return palace
+
+
 class QMDJChart:
     """QMDJ Chart data container"""
     
@@ -94,43 +354,106 @@ class QMDJChart:
         self.timezone = timezone
         self.structure = None  # Yang Dun or Yin Dun
         self.ju_number = None
+        self.engine = None  # kinqimen or simulated
         self.palaces = {}
+        self._scored = None  # score_all() result, filled on first use
         self._generate_chart()
     
+    def to_compact(self) -> bytes:
+        """
+        Serialize structure, ju number and palace codes (47 bytes), followed
+        by the raw engine names of unmapped components as JSON if there are any
+        """
+        values = [0 if self.structure == "Yang Dun" else 1, self.ju_number]
+        for palace_num in range(1, 10):
+            values.extend(self.palaces[palace_num].codes)
+        data = array("b", values).tobytes()
+        raw = {num: palace.raw for num, palace in self.palaces.items() if palace.raw}
+        if raw:
+            data += json.dumps(raw, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return data
+    
+    @classmethod
+    def from_compact(cls, dt: datetime, timezone: str, data: bytes,
+                     engine: Optional[str] = None) -> "QMDJChart":
+        """Rebuild a chart from to_compact() bytes without regenerating it"""
+        values = array("b", data[:COMPACT_SIZE])
+        raw = json.loads(bytes(data[COMPACT_SIZE:])) if len(data) > COMPACT_SIZE else {}
+        chart = cls.__new__(cls)
+        chart.datetime = dt
+        chart.timezone = timezone
+        chart.structure = "Yang Dun" if values[0] == 0 else "Yin Dun"
+        chart.ju_number = values[1]
+        chart.engine = engine
+        chart._scored = None
+        chart.palaces = {
+            palace_num: Palace(
+                palace_num, *values[2 + 5 * (palace_num - 1):2 + 5 * palace_num],
+                _raw_tuple(raw.get(str(palace_num)))
+            )
+            for palace_num in range(1, 10)
+        }
+        return chart
+    
+    def __reduce__(self):
+        # Pickle via the compact form; table-backed palaces are read-only proxies
+        return (_load_compact_chart, (self.datetime, self.timezone, self.to_compact(), self.engine))
+    
     def _generate_chart(self):
         """Generate the QMDJ chart"""
-        if KINQIMEN_AVAILABLE:
+        if load_engine():
             self._generate_with_kinqimen()
         else:
             self._generate_simulated()
     
     def _generate_with_kinqimen(self):
-        """Generate chart using kinqimen library"""
-        try:
-            qm = QiMen(
-                year=self.datetime.year,
-                month=self.datetime.month,
-                day=self.datetime.day,
-                hour=self.datetime.hour
-            )
-            
-            # Determine structure (Yang/Yin Dun)
-            self.structure = "Yang Dun" if qm.ju > 0 else "Yin Dun"
-            self.ju_number = abs(qm.ju)
-            
-            # Extract palace data
-            for palace_num in range(1, 10):
-                palace_data = self._extract_palace_data(qm, palace_num)
-                self.palaces[palace_num] = palace_data
+        """Generate chart from the shared layout table, resolving via kinqimen on first use"""
+        expected = resolve_layout(self.datetime, self.timezone)
+        index = layout_index(*expected)
+        layout = get_layout(index)
+        
+        if layout is None:
+            try:
+                qm = QiMen(
+                    year=self.datetime.year,
+                    month=self.datetime.month,
+                    day=self.datetime.day,
+                    hour=self.datetime.hour
+                )
                 
-        except Exception as e:
-            print(f"Error with kinqimen: {e}")
-            self._generate_simulated()
+                # Determine structure (Yang/Yin Dun)
+                structure = "Yang Dun" if qm.ju > 0 else "Yin Dun"
+                
+                # Extract palace data
+                palaces = {
+                    palace_num: self._extract_palace_data(qm, palace_num)
+                    for palace_num in range(1, 10)
+                }
+            except Exception:
+                logger.warning("kinqimen failed for %s; using a simulated chart",
+                               self.datetime, exc_info=True)
+                self._generate_simulated()
+                return
+            
+            # Only share the layout if kinqimen agrees with the table index;
+            # otherwise this chart keeps its own palaces
+            resolved = (structure, abs(qm.ju), _engine_hour_pillar(qm, self.datetime, expected[2]))
+            if resolved == expected:
+                layout = store_layout(index, structure, abs(qm.ju), palaces)
+            else:
+                logger.warning("kinqimen layout %s for %s does not match table index %s; not sharing it",
+                               resolved, self.datetime, expected)
+                if resolved[2] is not None:
+                    store_layout(layout_index(*resolved), structure, abs(qm.ju), palaces)
+                layout = {"structure": structure, "ju_number": abs(qm.ju), "palaces": palaces}
+        
+        self.structure = layout["structure"]
+        self.ju_number = layout["ju_number"]
+        self.engine = "kinqimen"
+        self.palaces = layout["palaces"]
     
-    def _extract_palace_data(self, qm, palace_num: int) -> Dict[str, Any]:
+    def _extract_palace_data(self, qm, palace_num: int) -> Palace:
         """Extract data for a specific palace from kinqimen"""
-        palace_element = PALACE_ELEMENTS[palace_num]
-        
         try:
             # Get components from kinqimen
             heaven_stem = qm.tian_pan[palace_num - 1] if hasattr(qm, 'tian_pan') else "戊"
@@ -148,236 +471,98 @@ class QMDJChart:
             # Fallback to simulated data
             return self._generate_simulated_palace(palace_num)
         
-        # Get elements
-        heaven_element = get_stem_element(heaven_stem)
-        earth_element = get_stem_element(earth_stem)
-        door_element = DOOR_ELEMENTS.get(door_en, "Earth")
-        star_element = STAR_ELEMENTS.get(star_en, "Metal")
-        
-        # Calculate strengths
-        heaven_strength = calculate_strength(heaven_element, palace_element)
-        earth_strength = calculate_strength(earth_element, palace_element)
-        door_strength = calculate_strength(door_element, palace_element)
-        star_strength = calculate_strength(star_element, palace_element)
-        
-        return {
-            "palace_number": palace_num,
-            "palace_element": palace_element,
-            "heaven_stem": {
-                "chinese": heaven_stem,
-                "element": heaven_element,
-                "polarity": get_stem_polarity(heaven_stem),
-                "strength": heaven_strength[0],
-                "score": heaven_strength[1],
-            },
-            "earth_stem": {
-                "chinese": earth_stem,
-                "element": earth_element,
-                "polarity": get_stem_polarity(earth_stem),
-                "strength": earth_strength[0],
-                "score": earth_strength[1],
-            },
-            "door": {
-                "name": door_en,
-                "chinese": door if door else DOOR_MAPPING.get(door_en, ""),
-                "element": door_element,
-                "category": DOOR_CATEGORIES.get(door_en, "Neutral"),
-                "strength": door_strength[0],
-                "score": door_strength[1],
-            },
-            "star": {
-                "name": star_en,
-                "chinese": star if star else STAR_MAPPING.get(star_en, ""),
-                "element": star_element,
-                "category": STAR_CATEGORIES.get(star_en, "Neutral"),
-                "strength": star_strength[0],
-                "score": star_strength[1],
-            },
-            "deity": {
-                "name": deity_en,
-                "chinese": deity if deity else DEITY_MAPPING.get(deity_en, ""),
-                "nature": DEITY_NATURES.get(deity_en, "Neutral"),
-            },
-        }
+        return Palace.from_names(palace_num, heaven_stem, earth_stem, door_en, star_en, deity_en,
+                                 (door, star, deity))
     
     def _generate_simulated(self):
         """Generate simulated chart data for demo/testing"""
-        # Determine structure based on solar term (simplified)
-        month = self.datetime.month
-        self.structure = "Yang Dun" if month in [12, 1, 2, 3, 4, 5] else "Yin Dun"
+        self.engine = "simulated"
+        
+        # Yang Dun from 冬至 to 夏至, Yin Dun from 夏至 to 冬至
+        self.structure = get_solar_term(self.datetime, self.timezone)[1]
         
         # Calculate ju number (simplified - real calculation is complex)
         day = self.datetime.day
         hour = self.datetime.hour
         self.ju_number = ((day + hour) % 9) + 1
         
-        # Generate palace data with realistic distributions
-        stems = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
-        doors = list(DOOR_MAPPING.keys())
-        stars = list(STAR_MAPPING.keys())
-        deities = list(DEITY_MAPPING.keys())
-        
-        # Seed random with datetime for consistent results
-        random.seed(self.datetime.timestamp())
-        
+        rng = self._chart_rng()
         for palace_num in range(1, 10):
-            self.palaces[palace_num] = self._generate_simulated_palace(
-                palace_num, stems, doors, stars, deities
-            )
+            self.palaces[palace_num] = self._generate_simulated_palace(palace_num, rng)
+    
+    def _chart_rng(self) -> random.Random:
+        """Isolated generator seeded with the chart hour, for consistent, thread-safe results"""
+        return random.Random(chart_hour(self.datetime).timestamp())
     
-    def _generate_simulated_palace(
-        self, 
-        palace_num: int,
-        stems: Optional[List[str]] = None,
-        doors: Optional[List[str]] = None,
-        stars: Optional[List[str]] = None,
-        deities: Optional[List[str]] = None
-    ) -> Dict[str, Any]:
+    def _generate_simulated_palace(self, palace_num: int, rng: Optional[random.Random] = None) -> Palace:
         """Generate simulated data for a single palace"""
-        if stems is None:
-            stems = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
-        if doors is None:
-            doors = list(DOOR_MAPPING.keys())
-        if stars is None:
-            stars = list(STAR_MAPPING.keys())
-        if deities is None:
-            deities = list(DEITY_MAPPING.keys())
-        
-        palace_element = PALACE_ELEMENTS[palace_num]
-        
-        # Select components
-        heaven_stem = random.choice(stems)
-        earth_stem = random.choice(stems)
-        door = random.choice(doors)
-        star = random.choice(stars)
-        deity = random.choice(deities)
-        
-        # Translate
-        door_en = translate_door(door)
-        star_en = translate_star(star)
-        deity_en = translate_deity(deity)
-        
-        # Get elements
-        heaven_element = get_stem_element(heaven_stem)
-        earth_element = get_stem_element(earth_stem)
-        door_element = DOOR_ELEMENTS.get(door_en, "Earth")
-        star_element = STAR_ELEMENTS.get(star_en, "Metal")
-        
-        # Calculate strengths
-        heaven_strength = calculate_strength(heaven_element, palace_element)
-        earth_strength = calculate_strength(earth_element, palace_element)
-        door_strength = calculate_strength(door_element, palace_element)
-        star_strength = calculate_strength(star_element, palace_element)
-        
-        return {
-            "palace_number": palace_num,
-            "palace_element": palace_element,
-            "heaven_stem": {
-                "chinese": heaven_stem,
-                "element": heaven_element,
-                "polarity": get_stem_polarity(heaven_stem),
-                "strength": heaven_strength[0],
-                "score": heaven_strength[1],
-            },
-            "earth_stem": {
-                "chinese": earth_stem,
-                "element": earth_element,
-                "polarity": get_stem_polarity(earth_stem),
-                "strength": earth_strength[0],
-                "score": earth_strength[1],
-            },
-            "door": {
-                "name": door_en,
-                "chinese": door,
-                "element": door_element,
-                "category": DOOR_CATEGORIES.get(door_en, "Neutral"),
-                "strength": door_strength[0],
-                "score": door_strength[1],
-            },
-            "star": {
-                "name": star_en,
-                "chinese": star,
-                "element": star_element,
-                "category": STAR_CATEGORIES.get(star_en, "Neutral"),
-                "strength": star_strength[0],
-                "score": star_strength[1],
-            },
-            "deity": {
-                "name": deity_en,
-                "chinese": deity,
-                "nature": DEITY_NATURES.get(deity_en, "Neutral"),
-            },
-        }
+        if rng is None:
+            rng = self._chart_rng()
+        return Palace(
+            palace_num,
+            rng.randrange(len(STEM_ORDER)),
+            rng.randrange(len(STEM_ORDER)),
+            rng.randrange(len(DOOR_ORDER)),
+            rng.randrange(len(STAR_ORDER)),
+            rng.randrange(len(DEITY_ORDER)),
+        )
     
     def calculate_palace_score(self, palace_num: int) -> float:
         """Calculate overall score for a palace"""
-        palace = self.palaces.get(palace_num, {})
-        if not palace:
+        palace = self.palaces.get(palace_num)
+        if palace is None:
             return 5.0
         
-        total = 0
-        total += palace.get("heaven_stem", {}).get("score", 0)
-        total += palace.get("earth_stem", {}).get("score", 0)
-        total += palace.get("door", {}).get("score", 0)
-        total += palace.get("star", {}).get("score", 0)
-        
-        # Add deity bonus
-        deity_nature = palace.get("deity", {}).get("nature", "Neutral")
-        if deity_nature == "Auspicious":
-            total += 2
-        elif deity_nature == "Inauspicious":
-            total -= 1
-        
-        # Add door category bonus
-        door_cat = palace.get("door", {}).get("category", "Neutral")
-        if door_cat == "Auspicious":
-            total += 1
-        elif door_cat == "Inauspicious":
-            total -= 1
+        total = palace.raw_score()
         
         # Normalize to 1-10 scale (raw range is approximately -12 to +12)
         normalized = ((total + 12) / 24) * 9 + 1
         return round(max(1, min(10, normalized)), 1)
     
+    def detect_formations(self, palace_num: int) -> List[Dict[str, Any]]:
+        """Detect every special formation in a palace, in priority order"""
+        palace = self.palaces.get(palace_num)
+        if palace is None:
+            return []
+        return match_formations(palace.heaven_stem, palace.door, palace.star, palace.deity)
+    
     def detect_formation(self, palace_num: int) -> Optional[Dict[str, Any]]:
-        """Detect any special formations in a palace"""
-        palace = self.palaces.get(palace_num, {})
-        if not palace:
-            return None
-        
-        heaven = palace.get("heaven_stem", {}).get("chinese", "")
-        door = palace.get("door", {}).get("name", "")
-        star = palace.get("star", {}).get("name", "")
-        deity = palace.get("deity", {}).get("name", "")
-        
-        # Simple formation detection rules
-        from utils.mappings import FORMATIONS
-        
-        # Dragon Returns - Jia at palace with Open door
-        if heaven == "甲" and door == "Open":
-            return FORMATIONS["dragon_return"]
-        
-        # Bird Falls - Hero star with Life door
-        if star == "Hero" and door == "Life":
-            return FORMATIONS["bird_falls"]
-        
-        # Ghost Entry - Grass star with Death door
-        if star == "Grass" and door == "Death":
-            return FORMATIONS["ghost_entry"]
-        
-        # Tiger Escapes - Tiger deity with Harm door
-        if deity == "Tiger" and door in ["Harm", "Fear"]:
-            return FORMATIONS["tiger_escapes"]
-        
-        # Jade Maiden - Moon deity with Rest door
-        if deity == "Moon" and door == "Rest":
-            return FORMATIONS["jade_maiden"]
-        
-        # Sky Horse - Nine Heaven with Open door
-        if deity == "Nine Heaven" and door == "Open":
-            return FORMATIONS["sky_horse"]
-        
-        return None
+        """Detect the primary (highest priority) formation in a palace"""
+        formations = self.detect_formations(palace_num)
+        return formations[0] if formations else None
+    
+    def score_all(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Score, verdict and formations for all nine palaces in one vectorized
+        pass. The result is cached on the chart.
+        Returns {palace_num: {"palace_number", "score", "verdict",
+        "formation", "formations"}}
+        """
+        if self._scored is None:
+            batch = score_charts([self])
+            formation_index = get_formation_index()
+            scores = batch["palace_score"][0].tolist()
+            verdicts = batch["verdict"][0].tolist()
+            cells = batch["formation_cell"][0].tolist()
+            scored = {}
+            for col in range(9):
+                palace_num = col + 1
+                formations = [formation_index.formations[i] for i in formation_index.matches[cells[col]]]
+                scored[palace_num] = {
+                    "palace_number": palace_num,
+                    "score": scores[col],
+                    "verdict": VERDICT_ORDER[verdicts[col]],
+                    "formation": formations[0] if formations else None,
+                    "formations": formations,
+                }
+            self._scored = scored
+        return self._scored
+    
+    def rank_palaces(self, top: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Palaces from best to worst score (ties keep palace order), as score_all() entries"""
+        scored = self.score_all()
+        ranked = sorted(scored.values(), key=lambda entry: -entry["score"])
+        return ranked if top is None else ranked[:top]
     
     def get_verdict(self, score: float) -> str:
         """Get verdict based on score"""
@@ -393,6 +578,407 @@ class QMDJChart:
             return "HIGHLY INAUSPICIOUS"
 
 
-def generate_chart(dt: datetime, timezone: str = "UTC+8") -> QMDJChart:
-    """Generate a QMDJ chart for the given datetime"""
-    return QMDJChart(dt, timezone)
+def _engine_hour_pillar(qm, dt: datetime, expected: int) -> Optional[int]:
+    """
+    Hour pillar (0-59) kinqimen used for a chart: read from its gangzhi()
+    when available, otherwise the expected one - except at 23:00, where
+    the 子 hour's day is ambiguous and None (unverified) is returned
+    """
+    gangzhi = getattr(qm, "gangzhi", None)
+    try:
+        pillars = gangzhi() if callable(gangzhi) else gangzhi
+        return sexagenary_index(*parse_pillar(pillars[3]))
+    except (TypeError, IndexError, KeyError, ValueError):
+        pass
+    return None if dt.hour == 23 else expected
+
+
+def _load_compact_chart(dt: datetime, timezone: str, data: bytes, engine: Optional[str]) -> QMDJChart:
+    return QMDJChart.from_compact(dt, timezone, data, engine)
+
+
+def current_engine() -> str:
+    """Name of the engine new charts are generated with"""
+    return "kinqimen" if load_engine() else "simulated"
+
+
+# Bump when chart generation or the compact format changes, so that charts
+# cached on disk by older code are rebuilt
+CHART_FORMAT_VERSION = 3
+
+
+def chart_cache_version() -> str:
+    """Version tag of disk-cached charts: compact format plus kinqimen release"""
+    engine_version = "none"
+    if load_engine():
+        try:
+            from importlib.metadata import version
+            engine_version = version("kinqimen")
+        except Exception:
+            engine_version = str(getattr(sys.modules.get("kinqimen"), "__version__", "unknown"))
+    return f"{CHART_FORMAT_VERSION}/kinqimen-{engine_version}"
+
+
+def _load_cached_chart(key: tuple, data: bytes) -> QMDJChart:
+    hour, timezone, engine = key
+    return QMDJChart.from_compact(datetime.fromisoformat(hour), timezone, data, engine)
+
+
+# Shared chart cache: one computation per chart hour, timezone and engine
+chart_cache = ChartCache(encode=QMDJChart.to_compact, decode=_load_cached_chart, version=chart_cache_version)
+
+
+def generate_chart(dt: datetime, timezone: str = "UTC+8", use_cache: bool = True) -> QMDJChart:
+    """
+    Generate a QMDJ chart for the given datetime.
+    Charts are cached per chart hour and keep the caller's datetime; palaces
+    are shared between charts of the same hour, so treat them as read-only.
+    """
+    if not use_cache:
+        return QMDJChart(dt, timezone)
+    
+    hour = chart_hour(dt)
+    key = (hour.isoformat(), timezone, current_engine())
+    chart = chart_cache.get(key, lambda: QMDJChart(hour, timezone))
+    if dt == hour:
+        return chart
+    view = QMDJChart.__new__(QMDJChart)
+    view.__dict__.update(chart.__dict__)
+    view.datetime = dt
+    return view
+
+
+def _compact_chunk(datetimes: List[datetime], timezone: str) -> List[tuple]:
+    """Process-pool worker: build charts and return them as (compact bytes, engine)"""
+    results = []
+    for dt in datetimes:
+        chart = QMDJChart(dt, timezone)
+        results.append((chart.to_compact(), chart.engine))
+    return results
+
+
+def generate_charts_parallel(
+    datetimes: List[datetime],
+    workers: Optional[int] = None,
+    timezone: str = "UTC+8",
+    chunk_size: Optional[int] = None,
+    compact: bool = False
+) -> List[Union[QMDJChart, bytes]]:
+    """
+    Build charts for many datetimes across a process pool, in input order.
+    
+    Workers receive chunks of datetimes and send back compact charts (47 bytes)
+    instead of pickled palace data. With compact=True the bytes are returned
+    as-is (see QMDJChart.from_compact); otherwise they are rebuilt as charts.
+    """
+    datetimes = list(datetimes)
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(datetimes) // (workers * 4)))
+    
+    chunks = [datetimes[i:i + chunk_size] for i in range(0, len(datetimes), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        results = [_compact_chunk(chunk, timezone) for chunk in chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_compact_chunk, chunks, [timezone] * len(chunks)))
+    
+    charts = []
+    for chunk, chunk_results in zip(chunks, results):
+        for dt, (data, engine) in zip(chunk, chunk_results):
+            charts.append(data if compact else QMDJChart.from_compact(dt, timezone, data, engine))
+    return charts
+
+
+def cache_stats() -> Dict[str, int]:
+    """Hit/miss/eviction counters of the shared chart cache"""
+    return chart_cache.stats()
+
+
+def build_chart_table(start: Optional[datetime] = None, days: int = 730, timezone: str = "UTC+8") -> int:
+    """
+    Pre-resolve every layout in the chart table by walking hourly charts.
+    Stops as soon as all 1080 layouts are filled.
+    Returns the number of layouts resolved.
+    """
+    if not load_engine():
+        return table_fill_count()
+    
+    dt = start or datetime(2024, 1, 1)
+    for _ in range(days * 24):
+        if table_fill_count() == TABLE_SIZE:
+            break
+        if get_layout(get_layout_index(dt, timezone)) is None:
+            QMDJChart(dt, timezone)
+        dt += timedelta(hours=1)
+    
+    return table_fill_count()
+
+
+
+# ==============================================================================
+# COLUMNAR RANGE GENERATION
+# ==============================================================================
+
+# Component rows in a columnar code block
+CODE_COMPONENTS = ["heaven_stem", "earth_stem", "door", "star", "deity"]
+SCORED_COMPONENTS = ["heaven_stem", "earth_stem", "door", "star"]
+
+class _ColumnarTables:
+    """
+    Array forms of the compact-palace lookups (trailing slot keeps
+    UNKNOWN_CODE safe) and a columnar mirror of the layout table: codes
+    (5 x 9), scores (4 x 9) and (structure, ju_number) per layout
+    """
+    
+    def __init__(self):
+        import numpy as np
+        from utils.elements import STRENGTH_MATRIX
+        
+        self.palace_element_codes = np.array([ELEMENT_CODES[PALACE_ELEMENTS[p]] for p in range(1, 10)])
+        self.stem_element_codes = np.array(_STEM_ELEMENTS)
+        self.door_element_codes = np.array(_DOOR_ELEMENTS)
+        self.star_element_codes = np.array(_STAR_ELEMENTS)
+        self.deity_bonus = np.array(_DEITY_BONUSES)
+        self.door_bonus = np.array(_DOOR_BONUSES)
+        self.strength_scores = np.vstack([STRENGTH_MATRIX, np.zeros(len(ELEMENT_ORDER), dtype=np.int8)])
+        self.verdict_thresholds = np.array(_VERDICT_THRESHOLDS)
+        
+        self.table_codes = np.full((TABLE_SIZE, 5, 9), UNKNOWN_CODE, dtype=np.int8)
+        self.table_scores = np.zeros((TABLE_SIZE, 4, 9), dtype=np.int8)
+        self.table_meta = np.zeros((TABLE_SIZE, 2), dtype=np.int8)
+        self.table_encoded = np.zeros(TABLE_SIZE, dtype=bool)
+
+
+_columnar_tables: Optional[_ColumnarTables] = None
+_columnar_lock = threading.Lock()
+
+
+def _columnar() -> _ColumnarTables:
+    """The columnar lookup tables, built (importing NumPy) on first use"""
+    global _columnar_tables
+    if _columnar_tables is None:
+        with _columnar_lock:
+            if _columnar_tables is None:
+                _columnar_tables = _ColumnarTables()
+    return _columnar_tables
+
+# Verdicts by code, worst to best, and the score each one starts at
+VERDICT_ORDER = ["HIGHLY INAUSPICIOUS", "INAUSPICIOUS", "NEUTRAL", "AUSPICIOUS", "HIGHLY AUSPICIOUS"]
+_VERDICT_THRESHOLDS = (3.0, 4.5, 7.0, 8.5)
+_MISSING_CODES = (UNKNOWN_CODE,) * len(CODE_COMPONENTS)
+
+_STEP_PATTERN = re.compile(r"^\s*(\d+)\s*(min|m|h|d)\s*$")
+_STEP_UNITS = {"min": "minutes", "m": "minutes", "h": "hours", "d": "days"}
+
+
+def _parse_step(step: Union[str, timedelta]) -> timedelta:
+    """Parse a step like "2h", "30min" or "1d" into a timedelta"""
+    if isinstance(step, timedelta):
+        return step
+    match = _STEP_PATTERN.match(step)
+    if not match:
+        raise ValueError(f"Invalid step: {step!r} (expected e.g. '2h', '30min', '1d')")
+    return timedelta(**{_STEP_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def _encode_palaces(palaces) -> tuple:
+    """Encode nine compact palaces into (codes, scores) arrays"""
+    import numpy as np
+    
+    codes = np.full((5, 9), UNKNOWN_CODE, dtype=np.int8)
+    scores = np.zeros((4, 9), dtype=np.int8)
+    for col in range(9):
+        palace = palaces.get(col + 1)
+        if palace is not None:
+            codes[:, col] = palace.codes
+            scores[:, col] = palace.scores
+    return codes, scores
+
+
+def _simulated_codes(dt: datetime) -> "np.ndarray":
+    """Draw the simulated engine's components for a chart as codes, without building palaces"""
+    import numpy as np
+    
+    rng = random.Random(chart_hour(dt).timestamp())
+    sizes = (len(STEM_ORDER), len(STEM_ORDER), len(DOOR_ORDER), len(STAR_ORDER), len(DEITY_ORDER))
+    draws = [[rng.randrange(size) for size in sizes] for _ in range(9)]
+    return np.array(draws, dtype=np.int8).T
+
+
+def _component_scores(codes: "np.ndarray") -> "np.ndarray":
+    """Strength scores (..., 4, 9) of stems, door and star from (..., 5, 9) codes"""
+    import numpy as np
+    
+    tables = _columnar()
+    strength, palace_elements = tables.strength_scores, tables.palace_element_codes
+    return np.stack([
+        strength[tables.stem_element_codes[codes[..., 0, :]], palace_elements],
+        strength[tables.stem_element_codes[codes[..., 1, :]], palace_elements],
+        strength[tables.door_element_codes[codes[..., 2, :]], palace_elements],
+        strength[tables.star_element_codes[codes[..., 3, :]], palace_elements],
+    ], axis=-2).astype(np.int8)
+
+
+def _palace_scores(codes: "np.ndarray", scores: "np.ndarray") -> "np.ndarray":
+    """Vectorized calculate_palace_score over (..., 5, 9) codes and (..., 4, 9) scores"""
+    import numpy as np
+    
+    tables = _columnar()
+    total = scores.sum(axis=-2, dtype=np.int16)
+    total = total + tables.deity_bonus[codes[..., 4, :]] + tables.door_bonus[codes[..., 2, :]]
+    normalized = ((total + 12) / 24) * 9 + 1
+    return np.round(np.clip(normalized, 1, 10), 1)
+
+
+def generate_charts(
+    start: datetime,
+    end: datetime,
+    step: Union[str, timedelta] = "2h",
+    timezone: str = "UTC+8"
+) -> Dict[str, "np.ndarray"]:
+    """
+    Generate charts for every step in [start, end) as columnar arrays.
+    
+    Component arrays have shape (n_charts, 9); column j is palace j + 1.
+    Codes index into STEM_ORDER / DOOR_ORDER / STAR_ORDER / DEITY_ORDER
+    (UNKNOWN_CODE for names outside those tables).
+    
+    Returns a dict with "datetimes", "structure" (0 = Yang Dun, 1 = Yin Dun),
+    "ju_number", the five component code arrays, "<component>_score" strength
+    arrays for stems, door and star, and "palace_score".
+    """
+    import numpy as np
+    
+    delta = _parse_step(step)
+    if delta <= timedelta(0):
+        raise ValueError("step must be positive")
+    
+    datetimes = []
+    dt = start
+    while dt < end:
+        datetimes.append(dt)
+        dt += delta
+    n = len(datetimes)
+    
+    structure = np.zeros(n, dtype=np.int8)
+    ju_number = np.zeros(n, dtype=np.int8)
+    
+    if load_engine():
+        tables = _columnar()
+        indices = np.array([get_layout_index(dt, timezone) for dt in datetimes], dtype=np.int16)
+        unshared = {}  # row -> chart whose layout kinqimen did not share with the table
+        for i, index in enumerate(indices):
+            if tables.table_encoded[index]:
+                continue
+            layout = get_layout(index)
+            if layout is None:
+                chart = QMDJChart(datetimes[i], timezone)
+                layout = get_layout(index)
+                if layout is None:
+                    unshared[i] = chart
+                    continue
+            tables.table_codes[index], tables.table_scores[index] = _encode_palaces(layout["palaces"])
+            tables.table_meta[index] = (layout["structure"] != "Yang Dun", layout["ju_number"])
+            tables.table_encoded[index] = True
+        if n:
+            codes = tables.table_codes[indices]
+            scores = tables.table_scores[indices]
+            structure[:] = tables.table_meta[indices, 0]
+            ju_number[:] = tables.table_meta[indices, 1]
+            for i, chart in unshared.items():
+                codes[i], scores[i] = _encode_palaces(chart.palaces)
+                structure[i] = chart.structure != "Yang Dun"
+                ju_number[i] = chart.ju_number
+        else:
+            codes = np.zeros((0, 5, 9), dtype=np.int8)
+            scores = np.zeros((0, 4, 9), dtype=np.int8)
+    else:
+        codes = np.zeros((n, 5, 9), dtype=np.int8)
+        for i, dt in enumerate(datetimes):
+            codes[i] = _simulated_codes(dt)
+            structure[i] = get_solar_term(dt, timezone)[1] != "Yang Dun"
+            ju_number[i] = ((dt.day + dt.hour) % 9) + 1
+        scores = _component_scores(codes)
+    
+    result = {
+        "datetimes": np.array([dt.replace(tzinfo=None) for dt in datetimes], dtype="datetime64[m]"),
+        "structure": structure,
+        "ju_number": ju_number,
+    }
+    for row, component in enumerate(CODE_COMPONENTS):
+        result[component] = codes[:, row, :]
+    for row, component in enumerate(SCORED_COMPONENTS):
+        result[f"{component}_score"] = scores[:, row, :]
+    result["palace_score"] = _palace_scores(codes, scores)
+    
+    return result
+
+
+def _chart_codes(charts: List[QMDJChart]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Component codes (n_charts, 5, 9) of chart objects, and a (n_charts, 9) missing-palace mask"""
+    import numpy as np
+    
+    rows = [[chart.palaces.get(palace_num) for palace_num in range(1, 10)] for chart in charts]
+    missing = np.array([[palace is None for palace in row] for row in rows], dtype=bool).reshape(-1, 9)
+    codes = np.array(
+        [[_MISSING_CODES if palace is None else palace.codes for palace in row] for row in rows],
+        dtype=np.int8
+    ).reshape(-1, 9, 5).transpose(0, 2, 1)
+    return codes, missing
+
+
+def chart_element_codes(charts: Union[List[QMDJChart], Dict[str, "np.ndarray"]]) -> "np.ndarray":
+    """
+    Element codes (n_charts, 4, 9) of the heaven stem, earth stem, door and
+    star in every palace, from chart objects or generate_charts() arrays.
+    Missing palaces and unknown stems are UNKNOWN_CODE.
+    """
+    import numpy as np
+    
+    tables = _columnar()
+    if isinstance(charts, dict):
+        codes = np.stack([charts[component] for component in CODE_COMPONENTS], axis=1)
+    else:
+        codes, missing = _chart_codes(charts)
+    elements = np.stack([
+        tables.stem_element_codes[codes[:, 0]],
+        tables.stem_element_codes[codes[:, 1]],
+        tables.door_element_codes[codes[:, 2]],
+        tables.star_element_codes[codes[:, 3]],
+    ], axis=1).astype(np.int8)
+    if not isinstance(charts, dict):
+        elements[np.broadcast_to(missing[:, None, :], elements.shape)] = UNKNOWN_CODE
+    return elements
+
+
+def score_charts(charts: List[QMDJChart]) -> Dict[str, "np.ndarray"]:
+    """
+    Score every palace of a batch of charts in one vectorized pass.
+    
+    Arrays have shape (n_charts, 9); column j is palace j + 1.
+    Returns "palace_score", "verdict" (codes into VERDICT_ORDER),
+    "formation" (primary formation ids into get_formation_index().keys,
+    NO_FORMATION if none), "formation_cell" (index into
+    get_formation_index().matches for every match) and "rank"
+    (palace numbers, best score first).
+    """
+    import numpy as np
+    
+    codes, missing = _chart_codes(charts)
+    
+    # Missing palaces score a flat 5.0, as in calculate_palace_score
+    palace_score = np.where(missing, 5.0, _palace_scores(codes, _component_scores(codes)))
+    formation_index = get_formation_index()
+    heaven, door, star, deity = (codes[:, row, :].astype(np.intp) for row in (0, 2, 3, 4))
+    cells = formation_index.cell(heaven, door, star, deity)
+    
+    return {
+        "palace_score": palace_score,
+        "verdict": np.searchsorted(_columnar().verdict_thresholds, palace_score, side="right").astype(np.int8),
+        "formation": formation_index.primary[cells],
+        "formation_cell": cells,
+        "rank": np.argsort(-palace_score, axis=1, kind="stable").astype(np.int8) + 1,
+    }
@@ -0,0 +1,200 @@
+"""
+Chart Cache Module
+Two-tier cache for generated charts: a bounded in-process LRU in front of
+a persistent SQLite store under data/
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Get the project root directory (parent of utils folder)
+PROJECT_ROOT = Path(__file__).parent.parent
+
+CACHE_DIR = PROJECT_ROOT / "data"
+CACHE_FILE = CACHE_DIR / "chart_cache.sqlite3"
+
+DEFAULT_MAX_ENTRIES = 512
+
+ChartKey = Tuple[str, str, str]  # (chart hour ISO, timezone, engine)
+
+
+class _InFlight:
+    """A chart being built by one thread, awaited by the others asking for it"""
+
+    __slots__ = ("done", "chart", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.chart = None
+        self.error: Optional[BaseException] = None
+
+
+class ChartCache:
+    """
+    LRU of live chart objects backed by an on-disk store of compact bytes.
+
+    encode(chart) -> bytes and decode(key, bytes) -> chart convert between
+    the two tiers. If the disk store cannot be opened or written, the cache
+    keeps working in memory only.
+
+    version() names the engine and compact format; disk entries stored under
+    another version are dropped when the store is opened. Each chart is built
+    once: other threads asking for it wait without holding the cache lock.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[Any], bytes],
+        decode: Callable[[ChartKey, bytes], Any],
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        path: Optional[Path] = CACHE_FILE,
+        version: Callable[[], str] = lambda: ""
+    ):
+        self.encode = encode
+        self.decode = decode
+        self.max_entries = max_entries
+        self.path = path
+        self.version = version
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._pending: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_version = ""
+        self._db_failed = path is None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the disk store on first use (call with _db_lock held)"""
+        if self._db is None and not self._db_failed:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(str(self.path), check_same_thread=False)
+                columns = [row[1] for row in db.execute("PRAGMA table_info(charts)")]
+                if columns and "version" not in columns:
+                    # Store from before versioned keys: nothing in it can be trusted
+                    db.execute("DROP TABLE charts")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS charts ("
+                    "chart_hour TEXT, timezone TEXT, engine TEXT, version TEXT, data BLOB, "
+                    "PRIMARY KEY (chart_hour, timezone, engine, version))"
+                )
+                self._db_version = self.version()
+                db.execute("DELETE FROM charts WHERE version != ?", (self._db_version,))
+                db.commit()
+                self._db = db
+            except (sqlite3.Error, OSError):
+                self._db = None
+                self._db_failed = True
+        return self._db
+
+    def _disk_get(self, key: ChartKey) -> Optional[bytes]:
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return None
+            try:
+                row = db.execute(
+                    "SELECT data FROM charts WHERE chart_hour = ? AND timezone = ? AND engine = ? AND version = ?",
+                    key + (self._db_version,)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        return row[0] if row else None
+
+    def _disk_put(self, key: ChartKey, data: bytes):
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                db.execute("INSERT OR REPLACE INTO charts VALUES (?, ?, ?, ?, ?)", key + (self._db_version, data))
+                db.commit()
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key: ChartKey, chart: Any):
+        """Insert into the LRU, evicting the least recently used entry if full"""
+        self._entries[key] = chart
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: ChartKey, build: Callable[[], Any]) -> Any:
+        """Return the cached chart for key, building and storing it on a miss"""
+        with self._lock:
+            chart = self._entries.get(key)
+            if chart is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return chart
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _InFlight()
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            with self._lock:
+                self.hits += 1
+            return pending.chart
+
+        try:
+            data = self._disk_get(key)
+            if data is not None:
+                chart = self.decode(key, data)
+            else:
+                chart = build()
+                self._disk_put(key, self.encode(chart))
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            pending.error = e
+            pending.done.set()
+            raise
+
+        with self._lock:
+            if data is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            self._remember(key, chart)
+            del self._pending[key]
+        pending.chart = chart
+        pending.done.set()
+        return chart
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters and current LRU size"""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+    def clear(self, disk: bool = False):
+        """Empty the LRU (and the disk store if disk=True) and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if disk:
+            with self._db_lock:
+                db = self._connect()
+                if db is not None:
+                    try:
+                        db.execute("DELETE FROM charts")
+                        db.commit()
+                    except sqlite3.Error:
+                        pass
@@ -0,0 +1,166 @@
+"""
+QMDJ Chart Layout Table
+Chai Bu hour charts can only take one of 18 ju x 60 hour-pillar layouts.
+This module resolves a datetime to its layout index and holds the shared,
+read-only table of resolved layouts.
+"""
+
+import re
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone, tzinfo
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Tuple, List
+
+from utils import solar_terms
+from utils.bazi_calculator import get_day_stem_branch, get_hour_stem_branch, sexagenary_index
+
+# Table dimensions: 2 structures x 9 ju x 60 hour pillars
+JU_COUNT = 9
+HOUR_PILLAR_COUNT = 60
+TABLE_SIZE = 2 * JU_COUNT * HOUR_PILLAR_COUNT  # 1080
+
+# 24 solar terms (approximate start dates) with Chai Bu ju numbers, in the
+# same order as utils.solar_terms.TERM_NAMES
+# (month, day, name, structure, (upper, middle, lower yuan ju))
+SOLAR_TERM_JU = [
+    (1, 6, "小寒", "Yang Dun", (2, 8, 5)),
+    (1, 20, "大寒", "Yang Dun", (3, 9, 6)),
+    (2, 4, "立春", "Yang Dun", (8, 5, 2)),
+    (2, 19, "雨水", "Yang Dun", (9, 6, 3)),
+    (3, 6, "惊蛰", "Yang Dun", (1, 7, 4)),
+    (3, 21, "春分", "Yang Dun", (3, 9, 6)),
+    (4, 5, "清明", "Yang Dun", (4, 1, 7)),
+    (4, 20, "谷雨", "Yang Dun", (5, 2, 8)),
+    (5, 6, "立夏", "Yang Dun", (4, 1, 7)),
+    (5, 21, "小满", "Yang Dun", (5, 2, 8)),
+    (6, 6, "芒种", "Yang Dun", (6, 3, 9)),
+    (6, 21, "夏至", "Yin Dun", (9, 3, 6)),
+    (7, 7, "小暑", "Yin Dun", (8, 2, 5)),
+    (7, 23, "大暑", "Yin Dun", (7, 1, 4)),
+    (8, 8, "立秋", "Yin Dun", (2, 5, 8)),
+    (8, 23, "处暑", "Yin Dun", (1, 4, 7)),
+    (9, 8, "白露", "Yin Dun", (9, 3, 6)),
+    (9, 23, "秋分", "Yin Dun", (7, 1, 4)),
+    (10, 8, "寒露", "Yin Dun", (6, 9, 3)),
+    (10, 23, "霜降", "Yin Dun", (5, 8, 2)),
+    (11, 7, "立冬", "Yin Dun", (6, 9, 3)),
+    (11, 22, "小雪", "Yin Dun", (5, 8, 2)),
+    (12, 7, "大雪", "Yin Dun", (4, 7, 1)),
+    (12, 22, "冬至", "Yang Dun", (1, 7, 4)),
+]
+
+# Yuan (upper/middle/lower) by Fu Tou branch modulo 3
+# 子午卯酉 -> upper, 辰戌丑未 -> lower, 寅申巳亥 -> middle
+YUAN_BY_FUTOU = {0: 0, 1: 2, 2: 1}
+
+# "UTC+8", "UTC-5:30", "SGT (UTC+8)", "UTC"
+_UTC_OFFSET_PATTERN = re.compile(r"(?:UTC|GMT)\s*(?:([+-])\s*(\d{1,2})(?::?(\d{2}))?)?", re.IGNORECASE)
+
+# Shared layout table - filled on first use of each layout
+_CHART_TABLE: List[Optional[MappingProxyType]] = [None] * TABLE_SIZE
+_filled = 0
+_table_lock = threading.Lock()
+
+
+def parse_timezone(timezone: Optional[str]) -> Optional[tzinfo]:
+    """Fixed-offset tzinfo for a chart timezone like "UTC+8", or None if it has no UTC offset"""
+    match = _UTC_OFFSET_PATTERN.search(timezone or "")
+    if match is None:
+        return None
+    sign, hours, minutes = match.groups()
+    offset = timedelta(hours=int(hours or 0), minutes=int(minutes or 0))
+    return dt_timezone(-offset if sign == "-" else offset)
+
+
+def get_solar_term(dt: datetime, timezone: Optional[str] = None) -> Tuple[str, str, Tuple[int, int, int]]:
+    """
+    Get the (name, structure, ju numbers) of the solar term in effect.
+    Naive datetimes are local time in timezone (China Standard Time if None).
+    """
+    zone = parse_timezone(timezone)
+    term = solar_terms.term_at(dt.replace(tzinfo=zone) if zone is not None and dt.tzinfo is None else dt)
+    if term is not None:
+        current = SOLAR_TERM_JU[term[1]]
+        return current[2], current[3], current[4]
+    
+    # Outside the exact term table: approximate start dates
+    current = SOLAR_TERM_JU[-1]  # 冬至 of the previous year
+    for term in SOLAR_TERM_JU:
+        if (dt.month, dt.day) >= (term[0], term[1]):
+            current = term
+        else:
+            break
+    return current[2], current[3], current[4]
+
+
+def resolve_layout(dt: datetime, timezone: Optional[str] = None) -> Tuple[str, int, int]:
+    """
+    Resolve a datetime (local time in timezone) to its Chai Bu layout.
+    Returns (structure, ju_number, hour_pillar_index)
+    """
+    day_stem, day_branch = get_day_stem_branch(dt)
+    hour_stem, hour_branch = get_hour_stem_branch(dt.hour, day_stem)
+
+    # Fu Tou is the most recent Jia or Ji day; its branch picks the yuan
+    futou_branch = (day_branch - day_stem % 5) % 12
+    yuan = YUAN_BY_FUTOU[futou_branch % 3]
+
+    _, structure, ju_numbers = get_solar_term(dt, timezone)
+    return structure, ju_numbers[yuan], sexagenary_index(hour_stem, hour_branch)
+
+
+def layout_index(structure: str, ju_number: int, hour_pillar: int) -> int:
+    """Flatten a (structure, ju, hour pillar) layout into a table index"""
+    dun = 0 if structure == "Yang Dun" else 1
+    return (dun * JU_COUNT + ju_number - 1) * HOUR_PILLAR_COUNT + hour_pillar
+
+
+def get_layout_index(dt: datetime, timezone: Optional[str] = None) -> int:
+    """Get the table index for a datetime"""
+    return layout_index(*resolve_layout(dt, timezone))
+
+
+def freeze(value: Any) -> Any:
+    """Recursively wrap dicts in read-only mapping proxies"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    return value
+
+
+def get_layout(index: int) -> Optional[MappingProxyType]:
+    """Get a resolved layout from the table, or None if not built yet"""
+    return _CHART_TABLE[index]
+
+
+def store_layout(index: int, structure: str, ju_number: int,
+                 palaces: Dict[int, Dict[str, Any]]) -> MappingProxyType:
+    """
+    Store a resolved layout in the table and return the shared entry.
+    If another thread stored this layout first, its entry is kept and returned.
+    """
+    global _filled
+    entry = freeze({
+        "structure": structure,
+        "ju_number": ju_number,
+        "palaces": palaces,
+    })
+    with _table_lock:
+        if _CHART_TABLE[index] is not None:
+            return _CHART_TABLE[index]
+        _CHART_TABLE[index] = entry
+        _filled += 1
+    return entry
+
+
+def table_fill_count() -> int:
+    """Number of layouts resolved so far"""
+    return _filled
+
+
+def clear_table():
+    """Drop all resolved layouts"""
+    global _filled
+    with _table_lock:
+        _filled = 0
+        for i in range(TABLE_SIZE):
+            _CHART_TABLE[i] = None
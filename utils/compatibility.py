@@ -0,0 +1,146 @@
+"""
+BaZi Compatibility Module
+Pairwise compatibility of many calculate_full_profile() results in one
+vectorized N x N pass, with top-k partner queries
+"""
+
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.bazi_calculator import HEAVENLY_STEMS
+from utils.elements import RELATION_MATRIX, SAME, PRODUCED_BY, CONTROLLED_BY, CONTROLS, PRODUCES
+from utils.mappings import ELEMENT_CODES
+
+PILLARS = ("year_pillar", "month_pillar", "day_pillar", "hour_pillar")
+
+# Day Master pair scores by element relationship (symmetric pairs add both ways)
+DM_RELATION_SCORES = {
+    SAME: 1.0,           # peers
+    PRODUCED_BY: 1.0,    # the other supports this Day Master
+    PRODUCES: 1.0,       # this Day Master nurtures the other
+    CONTROLLED_BY: -1.0,
+    CONTROLS: -0.5,
+}
+STEM_COMBINATION_SCORE = 3.0  # 天干五合: 甲己 乙庚 丙辛 丁壬 戊癸
+
+# Branch interactions between any pillars of the two charts
+BRANCH_COMBINATION_SCORE = 1.0  # 六合
+BRANCH_CLASH_SCORE = -1.0       # 六冲
+BRANCH_COMBINATIONS = [(0, 1), (2, 11), (3, 10), (4, 9), (5, 8), (6, 7)]  # 子丑 寅亥 卯戌 辰酉 巳申 午未
+
+# Useful-god overlap: the other's Day Master element is one of my useful
+# gods (or unfavorable elements)
+USEFUL_GOD_SCORE = 2.0
+UNFAVORABLE_SCORE = -1.0
+
+DEFAULT_WEIGHTS = {"day_master": 1.0, "branches": 1.0, "useful_gods": 1.0}
+
+# By [stem][stem]
+_STEM_ELEMENTS = np.array([ELEMENT_CODES[stem["element"]] for stem in HEAVENLY_STEMS])
+_DM_RELATION_WEIGHTS = np.array([DM_RELATION_SCORES[r] for r in range(5)])
+_DM_RELATION = RELATION_MATRIX[_STEM_ELEMENTS[:, None], _STEM_ELEMENTS[None, :]]
+DAY_MASTER_SCORES = (
+    _DM_RELATION_WEIGHTS[_DM_RELATION] + _DM_RELATION_WEIGHTS[_DM_RELATION.T]
+    + STEM_COMBINATION_SCORE * (np.abs(np.arange(10)[:, None] - np.arange(10)[None, :]) == 5)
+)
+
+# By [branch][branch]
+BRANCH_SCORES = np.zeros((12, 12))
+for _a, _b in BRANCH_COMBINATIONS:
+    BRANCH_SCORES[_a, _b] = BRANCH_SCORES[_b, _a] = BRANCH_COMBINATION_SCORE
+for _a in range(12):
+    BRANCH_SCORES[_a, (_a + 6) % 12] = BRANCH_CLASH_SCORE
+del _a, _b
+
+
+def profile_arrays(profiles: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Compact arrays from calculate_full_profile() results: "day_master"
+    stem index (n,), "branch_counts" (n, 12), "dm_element" one-hot (n, 5),
+    and "useful_gods" / "unfavorable" element masks (n, 5)
+    """
+    n = len(profiles)
+    day_master = np.zeros(n, dtype=np.int8)
+    branch_counts = np.zeros((n, 12))
+    useful = np.zeros((n, 5))
+    unfavorable = np.zeros((n, 5))
+
+    for i, profile in enumerate(profiles):
+        bazi = profile["bazi"]
+        day_master[i] = bazi["day_master"].index
+        for pillar in PILLARS:
+            branch_counts[i, bazi[pillar].branch.index] += 1
+        for element in profile["analysis"]["useful_gods"]:
+            useful[i, ELEMENT_CODES[element]] = 1
+        for element in profile["analysis"]["unfavorable"]:
+            unfavorable[i, ELEMENT_CODES[element]] = 1
+
+    return {
+        "day_master": day_master,
+        "branch_counts": branch_counts,
+        "dm_element": np.eye(5)[_STEM_ELEMENTS[day_master]],
+        "useful_gods": useful,
+        "unfavorable": unfavorable,
+    }
+
+
+def compatibility_matrix(
+    profiles: Sequence[Dict[str, Any]],
+    weights: Optional[Dict[str, float]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Symmetric N x N compatibility scores for calculate_full_profile() results.
+
+    Returns the "day_master", "branches" and "useful_gods" component
+    matrices and their weighted "total". The diagonal (self-pairs) is NaN.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    arrays = profile_arrays(profiles)
+
+    dm = arrays["day_master"]
+    day_master = DAY_MASTER_SCORES[dm[:, None], dm[None, :]]
+
+    counts = arrays["branch_counts"]
+    branches = counts @ BRANCH_SCORES @ counts.T
+
+    # Does j's Day Master element serve i's useful gods, and vice versa
+    element = arrays["dm_element"]
+    served = USEFUL_GOD_SCORE * arrays["useful_gods"] @ element.T + UNFAVORABLE_SCORE * arrays["unfavorable"] @ element.T
+    useful_gods = served + served.T
+
+    total = (weights["day_master"] * day_master + weights["branches"] * branches
+             + weights["useful_gods"] * useful_gods)
+
+    result = {"day_master": day_master, "branches": branches, "useful_gods": useful_gods, "total": total}
+    for matrix in result.values():
+        np.fill_diagonal(matrix, np.nan)
+    return result
+
+
+def top_partners(scores: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best k partners for every profile from an N x N score matrix.
+    Returns (indices, scores), each (n, k), best first.
+    """
+    n = scores.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.intp), np.zeros((n, 0))
+
+    ranked = np.where(np.isnan(scores), -np.inf, scores)
+    candidates = np.argpartition(-ranked, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(ranked, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    indices = np.take_along_axis(candidates, order, axis=1)
+    return indices, np.take_along_axis(candidate_scores, order, axis=1)
+
+
+def find_partners(profiles: Sequence[Dict[str, Any]], k: int = 5,
+                  weights: Optional[Dict[str, float]] = None) -> List[List[Tuple[int, float]]]:
+    """Top-k (profile index, total score) partners for each profile"""
+    indices, scores = top_partners(compatibility_matrix(profiles, weights)["total"], k)
+    return [
+        [(int(j), float(score)) for j, score in zip(row_indices, row_scores)]
+        for row_indices, row_scores in zip(indices, scores)
+    ]
@@ -10,6 +10,8 @@ from typing import Dict, Any, List, Optional
 from pathlib import Path
 import uuid
 
+from utils.calculations import decode_palace
+
 # Database paths
 DATA_DIR = Path("data")
 DB_FILE = DATA_DIR / "qmdj_bazi_patterns.csv"
@@ -75,6 +77,7 @@ def add_analysis(
     Returns the record ID
     """
     init_database()
+    palace_data = decode_palace(palace_data)
     
     record_id = str(uuid.uuid4())[:8]
     
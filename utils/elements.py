@@ -0,0 +1,61 @@
+"""
+Five Elements Module
+Precomputed 5x5 relationship and strength matrices indexed by element codes
+(see ELEMENT_ORDER in utils.mappings: Wood, Fire, Earth, Metal, Water)
+"""
+
+from typing import Tuple
+
+from utils.mappings import ELEMENT_CODES
+
+# Relationship of element A to element B, by [A][B]:
+SAME = 0           # A is B
+PRODUCED_BY = 1    # B produces A
+CONTROLLED_BY = 2  # B controls A
+CONTROLS = 3       # A controls B
+PRODUCES = 4       # A produces B
+
+# Python table for scalar calls; RELATION_MATRIX is its NumPy form for
+# whole-array calls, built (importing NumPy) on first access
+RELATIONS = tuple(tuple((a - b) % 5 for b in range(5)) for a in range(5))
+
+# Component strength in a palace, by relationship of component to palace element
+# (STRENGTH_MATRIX: NumPy strength values by [component][palace] element code)
+STRENGTH_NAMES = ("Timely", "Prosperous", "Confined", "Dead", "Resting")
+STRENGTH_VALUES = (2, 3, -2, -3, 0)
+
+
+def __getattr__(name: str):
+    if name not in ("RELATION_MATRIX", "STRENGTH_MATRIX"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if name not in globals():
+        import numpy as np
+
+        relation_matrix = np.array(RELATIONS, dtype=np.int8)
+        globals().update(
+            RELATION_MATRIX=relation_matrix,
+            STRENGTH_MATRIX=np.array(STRENGTH_VALUES, dtype=np.int8)[relation_matrix],
+        )
+    return globals()[name]
+
+
+def element_relation(element: str, other: str) -> int:
+    """Relationship code of one element to another, or -1 if either is unknown"""
+    a = ELEMENT_CODES.get(element)
+    b = ELEMENT_CODES.get(other)
+    if a is None or b is None:
+        return -1
+    return RELATIONS[a][b]
+
+
+def strength_in_palace(component_element: str, palace_element: str) -> Tuple[str, int]:
+    """(strength_name, strength_score) of a component element in a palace element"""
+    relation = element_relation(component_element, palace_element)
+    if relation < 0:
+        return ("Neutral", 0)
+    return (STRENGTH_NAMES[relation], STRENGTH_VALUES[relation])
+
+
+def strength_scores(component_codes, palace_codes) -> "np.ndarray":
+    """Vectorized strength scores for broadcastable arrays of element codes"""
+    return __getattr__("STRENGTH_MATRIX")[component_codes, palace_codes]
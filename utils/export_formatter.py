@@ -4,10 +4,12 @@ Formats chart data for export to Project 1 (Analyst Engine)
 """
 
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import json
 
 from config import PALACE_INFO, ELEMENT_EMOJI
+from utils.calculations import decode_palace
+from utils.profile_compiler import compile_profile
 
 
 def generate_analysis_prompt(
@@ -24,6 +26,7 @@ def generate_analysis_prompt(
     """
     Generate a pre-formatted prompt for the Analyst Engine (Project 1)
     """
+    palace_data = decode_palace(palace_data)
     palace_num = palace_data.get("palace_number", 0)
     palace_info = PALACE_INFO.get(palace_num, {})
     palace_element = palace_data.get("palace_element", "")
@@ -35,34 +38,8 @@ def generate_analysis_prompt(
     star = palace_data.get("star", {})
     deity = palace_data.get("deity", {})
     
-    # Get BaZi data - handle both old (dict) and new (string/list) formats
-    dm = bazi_profile.get("day_master", "Geng")
-    if isinstance(dm, dict):
-        dm_chinese = dm.get('chinese', '庚')
-        dm_pinyin = dm.get('pinyin', 'Geng')
-        dm_element = dm.get('element', 'Metal')
-        dm_polarity = dm.get('polarity', 'Yang')
-    else:
-        # New format - day_master is a string
-        dm_pinyin = dm
-        dm_chinese = bazi_profile.get('chinese', '庚')
-        dm_element = bazi_profile.get('element', 'Metal')
-        dm_polarity = bazi_profile.get('polarity', 'Yang')
-    
-    useful = bazi_profile.get("useful_gods", [])
-    if isinstance(useful, dict):
-        useful_primary = useful.get('primary', '')
-        useful_secondary = useful.get('secondary', '')
-    elif isinstance(useful, list):
-        useful_primary = useful[0] if len(useful) > 0 else ''
-        useful_secondary = useful[1] if len(useful) > 1 else ''
-    else:
-        useful_primary = ''
-        useful_secondary = ''
-    
-    strength = bazi_profile.get("strength", "Unknown")
-    profile_name = bazi_profile.get("profile", "")
-    ten_god = bazi_profile.get("ten_god_profile", {})
+    # BaZi data, migrated from any saved profile shape
+    compiled = compile_profile(bazi_profile)
     
     prompt = f"""Analyze this QMDJ chart for {purpose.lower()}:
 
@@ -92,9 +69,9 @@ def generate_analysis_prompt(
 """
     
     prompt += f"""**MY BAZI PROFILE**
-- Day Master: {dm_chinese} {dm_pinyin} {dm_element} ({dm_polarity}) - {strength}
-- Useful Gods: {useful_primary} (primary), {useful_secondary} (secondary)
-- Profile: {profile_name}
+- Day Master: {compiled.dm_chinese} {compiled.day_master} {compiled.dm_element} ({compiled.dm_polarity}) - {compiled.strength or "Unknown"}
+- Useful Gods: {compiled.useful_primary} (primary), {compiled.useful_secondary} (secondary)
+- Profile: {compiled.profile_name}
 
 **REQUEST**
 Provide complete analysis with:
@@ -120,11 +97,15 @@ def generate_json_export(
     bazi_profile: Dict[str, Any],
     qmdj_score: float,
     bazi_score: float,
-    purpose: str = "Forecasting"
+    purpose: str = "Forecasting",
+    secondary_formations: Optional[List[Dict[str, Any]]] = None
 ) -> Dict[str, Any]:
     """
     Generate full JSON export following Universal Schema v2.0
+    secondary_formations: formations matched after the primary one
+    (e.g. chart.detect_formations(palace)[1:])
     """
+    palace_data = decode_palace(palace_data)
     palace_num = palace_data.get("palace_number", 0)
     palace_info = PALACE_INFO.get(palace_num, {})
     
@@ -135,38 +116,9 @@ def generate_json_export(
     star = palace_data.get("star", {})
     deity = palace_data.get("deity", {})
     
-    # Get BaZi data - handle both old (dict) and new (string/list) formats
-    dm_raw = bazi_profile.get("day_master", "Geng")
-    if isinstance(dm_raw, dict):
-        dm_pinyin = dm_raw.get('pinyin', 'Geng')
-        dm_element = dm_raw.get('element', 'Metal')
-        dm_polarity = dm_raw.get('polarity', 'Yang')
-    else:
-        dm_pinyin = dm_raw
-        dm_element = bazi_profile.get('element', 'Metal')
-        dm_polarity = bazi_profile.get('polarity', 'Yang')
-    
-    useful_raw = bazi_profile.get("useful_gods", [])
-    if isinstance(useful_raw, dict):
-        useful_primary = useful_raw.get('primary', '')
-        useful_secondary = useful_raw.get('secondary', '')
-    elif isinstance(useful_raw, list):
-        useful_primary = useful_raw[0] if len(useful_raw) > 0 else ''
-        useful_secondary = useful_raw[1] if len(useful_raw) > 1 else ''
-    else:
-        useful_primary = ''
-        useful_secondary = ''
-    
-    unfav_raw = bazi_profile.get("unfavorable", bazi_profile.get("unfavorable_elements", []))
-    if isinstance(unfav_raw, dict):
-        unfav_primary = unfav_raw.get('primary', '')
-    elif isinstance(unfav_raw, list):
-        unfav_primary = unfav_raw[0] if len(unfav_raw) > 0 else ''
-    else:
-        unfav_primary = ''
-    
-    profile_name = bazi_profile.get("profile", "")
-    special = bazi_profile.get("special_structures", {})
+    # BaZi data, migrated from any saved profile shape
+    compiled = compile_profile(bazi_profile)
+    special = compiled.special_structures
     
     # Calculate combined score and verdict
     combined_score = round((qmdj_score + bazi_score) / 2, 1)
@@ -249,7 +201,15 @@ def generate_json_export(
                     "source_book": formation.get("source", "") if formation else "",
                     "outcome_pattern": formation.get("description", "") if formation else ""
                 },
-                "secondary_formations": []
+                "secondary_formations": [
+                    {
+                        "name": f.get("name", ""),
+                        "category": f.get("category", "Neutral"),
+                        "source_book": f.get("source", ""),
+                        "outcome_pattern": f.get("description", "")
+                    }
+                    for f in (secondary_formations or [])
+                ]
             }
         },
         
@@ -257,34 +217,34 @@ def generate_json_export(
             "chart_source": "User Memory",
             
             "day_master": {
-                "stem": dm_pinyin,
-                "element": dm_element,
-                "polarity": dm_polarity,
-                "strength": bazi_profile.get("strength", ""),
-                "strength_score": bazi_profile.get("strength_score", 5)
+                "stem": compiled.day_master,
+                "element": compiled.dm_element,
+                "polarity": compiled.dm_polarity,
+                "strength": compiled.strength,
+                "strength_score": compiled.strength_score
             },
             
             "useful_gods": {
-                "primary": useful_primary,
-                "secondary": useful_secondary,
+                "primary": compiled.useful_primary,
+                "secondary": compiled.useful_secondary,
                 "reasoning": ""
             },
             
             "unfavorable_elements": {
-                "primary": unfav_primary,
+                "primary": compiled.unfavorable,
                 "reasoning": ""
             },
             
             "ten_god_profile": {
-                "dominant_god": "",
-                "profile_name": profile_name,
+                "dominant_god": compiled.dominant_god,
+                "profile_name": compiled.profile_name,
                 "behavioral_traits": []
             },
             
             "special_structures": {
                 "wealth_vault": special.get("wealth_vault", False),
-                "nobleman_present": special.get("nobleman", False),
-                "other_structures": special.get("other", [])
+                "nobleman_present": special.get("nobleman_present", False),
+                "other_structures": list(special.get("other_structures", []))
             }
         },
         
@@ -370,6 +330,7 @@ def format_compact_summary(
     formation: Optional[Dict[str, Any]]
 ) -> str:
     """Generate a compact one-line summary"""
+    palace_data = decode_palace(palace_data)
     formation_str = f" | {formation.get('name', '')}" if formation else ""
     score_emoji = "🌟" if qmdj_score >= 7 else "⚡" if qmdj_score >= 4.5 else "⚠️"
     
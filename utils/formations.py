@@ -0,0 +1,102 @@
+"""
+Formation Rules Engine
+Compiles the declarative FORMATION_RULES into a dense index keyed on
+(heaven stem, door, star, deity) codes, so matching is a single lookup
+"""
+
+import itertools
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.mappings import (
+    FORMATIONS, FORMATION_RULES,
+    STEM_CODES, DOOR_CODES, STAR_CODES, DEITY_CODES
+)
+
+# Code spaces per component; one extra slot holds UNKNOWN_CODE (-1)
+RULE_COMPONENTS = (
+    ("heaven_stem", STEM_CODES),
+    ("door", DOOR_CODES),
+    ("star", STAR_CODES),
+    ("deity", DEITY_CODES),
+)
+_SIZES = tuple(len(codes) + 1 for _, codes in RULE_COMPONENTS)
+
+NO_FORMATION = -1
+
+
+class FormationIndex:
+    """Compiled formation rules: every (stem, door, star, deity) cell -> matching formations"""
+
+    def __init__(self, rules: Sequence[Dict[str, Any]], formations: Dict[str, Dict[str, Any]]):
+        self.keys: List[str] = []
+        key_ids: Dict[str, int] = {}
+        cells: List[List[int]] = [[] for _ in range(math.prod(_SIZES))]
+
+        for rule in rules:
+            key = rule["formation"]
+            if key not in formations:
+                raise ValueError(f"Unknown formation in rule: {key!r}")
+            if key not in key_ids:
+                key_ids[key] = len(self.keys)
+                self.keys.append(key)
+            formation_id = key_ids[key]
+
+            allowed = []
+            for (component, codes), size in zip(RULE_COMPONENTS, _SIZES):
+                names = rule.get(component)
+                if names is None:
+                    allowed.append(range(size))
+                else:
+                    unknown = [n for n in names if n not in codes]
+                    if unknown:
+                        raise ValueError(f"Unknown {component} in rule {key!r}: {unknown}")
+                    allowed.append([codes[n] for n in names])
+
+            for cell in itertools.product(*allowed):
+                matches = cells[self.cell(*cell)]
+                if formation_id not in matches:
+                    matches.append(formation_id)
+
+        import numpy as np
+
+        self.formations = [formations[key] for key in self.keys]
+        self.matches: List[Tuple[int, ...]] = [tuple(m) for m in cells]
+        self.primary = np.array([m[0] if m else NO_FORMATION for m in cells], dtype=np.int16)
+
+    @staticmethod
+    def cell(heaven_stem, door, star, deity):
+        """
+        Flat index of codes (ints or integer arrays wider than int8);
+        UNKNOWN_CODE wraps to each component's last slot
+        """
+        stems, doors, stars, deities = _SIZES
+        return (((heaven_stem % stems) * doors + door % doors) * stars + star % stars) * deities + deity % deities
+
+    def match(self, heaven_stem: int, door: int, star: int, deity: int) -> List[Dict[str, Any]]:
+        """Every formation matching the codes, in rule priority order"""
+        return [self.formations[i] for i in self.matches[self.cell(heaven_stem, door, star, deity)]]
+
+    def primary_ids(self, heaven_stem, door, star, deity) -> "np.ndarray":
+        """Vectorized id of the primary formation (NO_FORMATION if none) for code arrays"""
+        return self.primary[self.cell(heaven_stem, door, star, deity)]
+
+
+_index: Optional[FormationIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_formation_index() -> FormationIndex:
+    """The compiled index for FORMATION_RULES, built on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = FormationIndex(FORMATION_RULES, FORMATIONS)
+    return _index
+
+
+def match_formations(heaven_stem: int, door: int, star: int, deity: int) -> List[Dict[str, Any]]:
+    """Every formation matching the given component codes, in priority order"""
+    return get_formation_index().match(heaven_stem, door, star, deity)
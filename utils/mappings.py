@@ -195,6 +195,36 @@ FORMATIONS = {
 }
 
 
+# Formation rules, in priority order (first match is the primary formation).
+# Each rule lists the allowed heaven stems (Chinese), doors, stars and deities;
+# a component left out matches anything.
+FORMATION_RULES = [
+    {"formation": "dragon_return", "heaven_stem": ["甲"], "door": ["Open"]},
+    {"formation": "bird_falls", "star": ["Hero"], "door": ["Life"]},
+    {"formation": "ghost_entry", "star": ["Grass"], "door": ["Death"]},
+    {"formation": "tiger_escapes", "deity": ["Tiger"], "door": ["Harm", "Fear"]},
+    {"formation": "jade_maiden", "deity": ["Moon"], "door": ["Rest"]},
+    {"formation": "sky_horse", "deity": ["Nine Heaven"], "door": ["Open"]},
+]
+
+
+# Integer codes for compact/columnar charts (code = index in these orders)
+STEM_ORDER = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
+STAR_ORDER = list(STAR_MAPPING.values())
+DOOR_ORDER = list(DOOR_MAPPING.values())
+DEITY_ORDER = list(DEITY_MAPPING.values())
+ELEMENT_ORDER = ["Wood", "Fire", "Earth", "Metal", "Water"]
+
+STEM_CODES = {name: code for code, name in enumerate(STEM_ORDER)}
+STAR_CODES = {name: code for code, name in enumerate(STAR_ORDER)}
+DOOR_CODES = {name: code for code, name in enumerate(DOOR_ORDER)}
+DEITY_CODES = {name: code for code, name in enumerate(DEITY_ORDER)}
+ELEMENT_CODES = {name: code for code, name in enumerate(ELEMENT_ORDER)}
+
+# Code used for names outside the tables above
+UNKNOWN_CODE = -1
+
+
 def translate_star(chinese_name: str) -> str:
     """Translate star from Chinese to English"""
     return STAR_MAPPING.get(chinese_name, chinese_name)
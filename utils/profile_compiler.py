@@ -0,0 +1,267 @@
+"""
+Profile Compiler Module
+Parses a BaZi profile (migrated to the current schema) once into a frozen
+object with element codes and alignment weight vectors, so palace
+alignment is a lookup-and-sum over component element codes
+"""
+
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple
+
+from utils.mappings import ELEMENT_ORDER, ELEMENT_CODES, UNKNOWN_CODE
+from utils.profile_schema import SCHEMA_KEY, PROFILE_SCHEMA_VERSION, migrate_profile
+
+# Alignment weight rows; columns are element codes plus a trailing slot for
+# UNKNOWN_CODE, which never aligns
+ALIGNMENT_PARTS = ("useful_god_activation", "dm_support", "clash_penalty")
+PRIMARY_USEFUL_WEIGHT = 2
+SECONDARY_USEFUL_WEIGHT = 1
+UNFAVORABLE_WEIGHT = -2
+SAME_AS_DM_WEIGHT = 1
+RESOURCE_WEIGHT = 0.5
+
+BASE_ALIGNMENT = 5
+MIN_ALIGNMENT = 1
+MAX_ALIGNMENT = 10
+
+# Palace components checked for alignment, in order
+ALIGNMENT_COMPONENTS = (
+    ("heaven_stem", "Heaven Stem"),
+    ("earth_stem", "Earth Stem"),
+    ("door", "Door"),
+    ("star", "Star"),
+)
+
+# Detail and warning messages by match kind
+_NO_MATCH, _PRIMARY, _SECONDARY, _UNFAVORABLE, _SAME = range(5)
+_MESSAGES = {
+    _PRIMARY: ("details", "✅ {element} ({name}) = Primary useful god active"),
+    _SECONDARY: ("details", "✅ {element} ({name}) = Secondary useful god active"),
+    _UNFAVORABLE: ("warnings", "⚠️ {element} ({name}) = Unfavorable element present"),
+    _SAME: ("details", "👤 {element} ({name}) = Same as Day Master"),
+}
+_RESOURCE_MESSAGE = "🔋 {element} ({name}) = Resource for Day Master"
+
+# Element names by code, UNKNOWN_CODE last (as Palace.to_dict() decodes them)
+ELEMENT_NAMES = ELEMENT_ORDER + ["Unknown"]
+
+
+def _code(element: str) -> int:
+    return ELEMENT_CODES.get(element, UNKNOWN_CODE)
+
+
+def _split_messages(kinds: List[int]) -> Tuple[Optional[Tuple[str, str, str]], ...]:
+    """(bucket, text before the component name, text after) by element code"""
+    split = []
+    for code, kind in enumerate(kinds):
+        if kind not in _MESSAGES:
+            split.append(None)
+            continue
+        bucket, template = _MESSAGES[kind]
+        before, after = template.replace("{element}", ELEMENT_NAMES[code]).split("{name}")
+        split.append((bucket, before, after))
+    return tuple(split)
+
+
+def _split_resource_messages(resource: List[bool]) -> Tuple[Optional[Tuple[str, str]], ...]:
+    return tuple(
+        tuple(_RESOURCE_MESSAGE.replace("{element}", ELEMENT_NAMES[code]).split("{name}")) if flag else None
+        for code, flag in enumerate(resource)
+    )
+
+
+class CompiledProfile:
+    """
+    Frozen, normalized BaZi profile for alignment scoring.
+
+    weights is a read-only (3, 6) array: rows follow ALIGNMENT_PARTS,
+    columns are element codes with UNKNOWN_CODE as the last column.
+    element_weights (6,) is their sum - one component's contribution.
+    Build with compile_profile().
+    """
+
+    __slots__ = (
+        "day_master", "dm_chinese", "dm_element", "dm_polarity", "dm_code", "strength", "strength_score",
+        "useful_primary", "useful_secondary", "unfavorable", "resource_element",
+        "profile_name", "dominant_god", "special_structures", "weights", "element_weights",
+        "_messages", "_resource_messages", "_rows", "_totals",
+    )
+
+    def __init__(self, day_master: str, dm_chinese: str, dm_element: str, dm_polarity: str,
+                 strength: str, strength_score: Any, useful_primary: str, useful_secondary: str,
+                 unfavorable: str, profile_name: str, dominant_god: str,
+                 special_structures: Mapping[str, Any]):
+        import numpy as np
+        
+        dm_code = _code(dm_element)
+        resource_element = ELEMENT_ORDER[(dm_code - 1) % 5] if dm_code != UNKNOWN_CODE else ""
+
+        # Match kind of each element, first match wins (as listed in _MESSAGES)
+        kinds = []
+        for element in ELEMENT_ORDER:
+            if element == useful_primary:
+                kinds.append(_PRIMARY)
+            elif element == useful_secondary:
+                kinds.append(_SECONDARY)
+            elif element == unfavorable:
+                kinds.append(_UNFAVORABLE)
+            elif element == dm_element:
+                kinds.append(_SAME)
+            else:
+                kinds.append(_NO_MATCH)
+        kinds.append(_NO_MATCH)
+
+        # Resource support counts unless the resource is already a useful god
+        resource = [
+            element == resource_element and element not in (useful_primary, useful_secondary)
+            for element in ELEMENT_ORDER
+        ] + [False]
+
+        weights = np.zeros((len(ALIGNMENT_PARTS), len(ELEMENT_ORDER) + 1))
+        for code, kind in enumerate(kinds):
+            if kind == _PRIMARY:
+                weights[0, code] = PRIMARY_USEFUL_WEIGHT
+            elif kind == _SECONDARY:
+                weights[0, code] = SECONDARY_USEFUL_WEIGHT
+            elif kind == _UNFAVORABLE:
+                weights[2, code] = UNFAVORABLE_WEIGHT
+            elif kind == _SAME:
+                weights[1, code] = SAME_AS_DM_WEIGHT
+            if resource[code]:
+                weights[1, code] += RESOURCE_WEIGHT
+        weights.setflags(write=False)
+        element_weights = weights.sum(axis=0)
+        element_weights.setflags(write=False)
+
+        for name, value in (
+            ("day_master", day_master), ("dm_chinese", dm_chinese),
+            ("dm_element", dm_element), ("dm_polarity", dm_polarity), ("dm_code", dm_code), ("strength", strength), ("strength_score", strength_score),
+            ("useful_primary", useful_primary), ("useful_secondary", useful_secondary),
+            ("unfavorable", unfavorable), ("resource_element", resource_element),
+            ("profile_name", profile_name), ("dominant_god", dominant_god),
+            ("special_structures", MappingProxyType(dict(special_structures))),
+            ("weights", weights), ("element_weights", element_weights),
+            ("_messages", _split_messages(kinds)), ("_resource_messages", _split_resource_messages(resource)),
+            # Plain tuples by element code for scalar scoring (cheaper than NumPy indexing)
+            ("_rows", tuple(zip(*weights.tolist()))), ("_totals", tuple(element_weights.tolist())),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledProfile is read-only")
+
+    def __repr__(self) -> str:
+        return (f"CompiledProfile({self.day_master} {self.dm_element}, {self.strength}, "
+                f"useful={self.useful_primary}/{self.useful_secondary}, unfavorable={self.unfavorable})")
+
+    def score_codes(self, element_codes: Sequence[int]) -> float:
+        """Alignment score (1-10) for one palace's component element codes"""
+        totals = self._totals
+        total = BASE_ALIGNMENT + sum(totals[code] for code in element_codes)
+        return max(MIN_ALIGNMENT, min(MAX_ALIGNMENT, round(total, 1)))
+
+    def score_elements(self, element_codes: "np.ndarray", axis: int = -2) -> "np.ndarray":
+        """
+        Alignment scores (1-10) for arrays of component element codes,
+        summing over axis (e.g. (n_charts, 4, 9) codes -> (n_charts, 9) scores)
+        """
+        import numpy as np
+        
+        total = BASE_ALIGNMENT + self.element_weights[element_codes].sum(axis=axis)
+        return np.clip(np.round(total, 1), MIN_ALIGNMENT, MAX_ALIGNMENT)
+
+    def align(self, components: Sequence[Tuple[str, str]], codes: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """
+        Alignment breakdown for (component name, element name) pairs, in
+        the calculate_bazi_alignment() result shape. codes, if given, are
+        the components' element codes (skips the name lookup).
+        """
+        if codes is None:
+            codes = [_code(element) for _, element in components]
+        useful = support = clash = 0
+        for code in codes:
+            code_useful, code_support, code_clash = self._rows[code]
+            useful += code_useful
+            support += code_support
+            clash += code_clash
+        alignment = {"useful_god_activation": useful, "dm_support": support, "clash_penalty": clash}
+        alignment["details"] = []
+        alignment["warnings"] = []
+
+        for (name, _), code in zip(components, codes):
+            message = self._messages[code]
+            if message is not None:
+                alignment[message[0]].append(message[1] + name + message[2])
+        for (name, _), code in zip(components, codes):
+            message = self._resource_messages[code]
+            if message is not None:
+                alignment["details"].append(message[0] + name + message[1])
+
+        total = BASE_ALIGNMENT + useful + support + clash
+        alignment["score"] = max(MIN_ALIGNMENT, min(MAX_ALIGNMENT, round(total, 1)))
+        return alignment
+
+
+# Compiled profiles kept by their fields; a page render compiles the same profile many times
+COMPILED_CACHE_SIZE = 64
+
+
+def _freeze(value: Any) -> Any:
+    """Hashable form of a special-structures value (lists become tuples)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compile_fields(fields: Tuple[Any, ...], special_structures: Tuple[Tuple[str, Any], ...]) -> CompiledProfile:
+    return CompiledProfile(*fields, special_structures=dict(special_structures))
+
+
+def compile_profile(profile: Dict[str, Any]) -> CompiledProfile:
+    """
+    Compile a profile. Profiles in older schema shapes (see
+    utils.profile_schema) are migrated first; a CompiledProfile passes
+    through unchanged. Profiles with the same fields share one
+    CompiledProfile, so calling this per palace is cheap.
+    """
+    if isinstance(profile, CompiledProfile):
+        return profile
+    if profile.get(SCHEMA_KEY) != PROFILE_SCHEMA_VERSION:
+        profile = migrate_profile(profile)
+
+    dm = profile["day_master"]
+    useful = profile["useful_gods"]
+    ten_god = profile["ten_god_profile"]
+    fields = (
+        dm["pinyin"], dm["chinese"], dm["element"], dm["polarity"],
+        profile["strength"], profile["strength_score"],
+        useful["primary"], useful["secondary"], profile["unfavorable_elements"]["primary"],
+        ten_god["profile_name"], ten_god["dominant_god"],
+    )
+    special = tuple((key, _freeze(value)) for key, value in profile["special_structures"].items())
+    try:
+        return _compile_fields(fields, special)
+    except TypeError:  # unhashable field values: compile without caching
+        return CompiledProfile(*fields, special_structures=profile["special_structures"])
+
+
+def palace_components(palace_data) -> Tuple[List[Tuple[str, str]], Optional[Tuple[int, ...]]]:
+    """
+    (component name, element name) pairs of a Palace or palace dict, and
+    the element codes when they are known without a lookup (Palace)
+    """
+    from utils.calculations import Palace
+    
+    if isinstance(palace_data, Palace):
+        codes = palace_data.component_elements
+        return [
+            (name, ELEMENT_NAMES[code])
+            for (_, name), code in zip(ALIGNMENT_COMPONENTS, codes)
+        ], codes
+    return [
+        (name, palace_data[key].get("element", ""))
+        for key, name in ALIGNMENT_COMPONENTS
+        if key in palace_data
+    ], None
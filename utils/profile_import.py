@@ -0,0 +1,222 @@
+"""
+Bulk Profile Import
+Streams a client CSV of birth dates and hours through the BaZi engine in
+chunks and saves the profiles to the profile repository, one transaction
+per chunk.
+
+Usage:
+    python -m utils.profile_import clients.csv [--output clients.sqlite3]
+        [--chunk-size 5000] [--bad-rows bad_rows.csv]
+
+The CSV needs a "birth_date" column (YYYY-MM-DD, or DD/MM/YYYY) and either
+"birth_hour" (0-23) or "birth_time" (HH:MM). An "id" or "client_id" column
+is kept as the profile's client_id and repository user id; otherwise the
+CSV file name and line number are used. Repeated ids and birth dates
+outside the 1900-2100 solar-term table are rejected as bad rows.
+
+Clients go to their own repository file (data/clients.sqlite3), not the
+app's profile repository.
+"""
+
+import argparse
+import csv
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from utils import solar_terms
+from utils.bazi_calculator import calculate_full_profile
+from utils.profile_repository import ProfileRepository, REPOSITORY_DIR
+
+CLIENTS_FILE = REPOSITORY_DIR / "clients.sqlite3"
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Bad rows kept in the report (all are counted, and all go to bad_rows_file)
+MAX_REPORTED_BAD_ROWS = 100
+
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d"]
+ID_COLUMNS = ["client_id", "id"]
+
+
+class ImportReport:
+    """Running totals for an import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.bad = 0
+        self.bad_rows: List[Tuple[int, str]] = []  # (line number, reason)
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add_bad_row(self, line: int, reason: str):
+        self.bad += 1
+        if len(self.bad_rows) < MAX_REPORTED_BAD_ROWS:
+            self.bad_rows.append((line, reason))
+
+    def tick(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        return (f"{self.rows:,} rows: {self.imported:,} imported, {self.bad:,} bad "
+                f"in {self.elapsed:.1f}s ({self.rows_per_second:,.0f} rows/s)")
+
+
+def parse_birth_row(row: Dict[str, str]) -> Tuple[date, int]:
+    """(birth date, birth hour) from a CSV row; raises ValueError if unusable"""
+    raw_date = (row.get("birth_date") or "").strip()
+    if not raw_date:
+        raise ValueError("missing birth_date")
+    for fmt in DATE_FORMATS:
+        try:
+            birth_date = datetime.strptime(raw_date, fmt).date()
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"bad birth_date {raw_date!r}")
+
+    raw_hour = (row.get("birth_hour") or "").strip()
+    raw_time = (row.get("birth_time") or "").strip()
+    try:
+        hour = int(raw_hour) if raw_hour else int(raw_time.split(":")[0]) if raw_time else 12
+    except ValueError:
+        raise ValueError(f"bad birth hour {raw_hour or raw_time!r}")
+    if not 0 <= hour <= 23:
+        raise ValueError(f"birth hour out of range: {hour}")
+    if solar_terms.term_at(datetime(birth_date.year, birth_date.month, birth_date.day, hour)) is None:
+        raise ValueError(f"birth_date {raw_date!r} outside the {solar_terms.FIRST_YEAR}-"
+                         f"{solar_terms.LAST_YEAR} solar-term table")
+
+    return birth_date, hour
+
+
+def build_profile_record(client_id: str, birth_date: date, hour: int) -> Dict[str, Any]:
+    """Store record for one client: identity and birth data plus the settings profile"""
+    profile = calculate_full_profile(birth_date, hour)
+    return {
+        "client_id": client_id,
+        "birth_date": birth_date.isoformat(),
+        "birth_time": f"{hour:02d}:00",
+        **profile["settings_profile"],
+    }
+
+
+def _chunks(reader: csv.DictReader, chunk_size: int) -> Iterator[List[Tuple[int, Dict[str, str]]]]:
+    chunk = []
+    for row in reader:
+        chunk.append((reader.line_num, row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_profiles(
+    source: Union[str, Path, TextIO],
+    output: Union[Path, ProfileRepository] = CLIENTS_FILE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    bad_rows_file: Optional[Path] = None,
+    progress: Optional[Callable[[ImportReport], None]] = None
+) -> ImportReport:
+    """
+    Import a client CSV into a profile repository (or repository file),
+    one chunk and one transaction at a time. Only one chunk of rows and
+    profiles (plus the ids seen so far) is held in memory. Unparseable
+    rows, repeated ids and rows the engine fails on are counted as bad
+    (and written to bad_rows_file with a reason column); progress is
+    called with the running report after every chunk.
+    """
+    report = ImportReport()
+    repository = output if isinstance(output, ProfileRepository) else ProfileRepository(output)
+    handle = open(source, newline="", encoding="utf-8-sig") if isinstance(source, (str, Path)) else source
+    bad_writer = None
+    bad_handle = None
+    # Fallback ids are "<file name>:<line>", unique across imports of different files
+    source_name = Path(getattr(handle, "name", "") or "csv").name
+    seen_ids: Dict[str, int] = {}
+
+    try:
+        reader = csv.DictReader(handle)
+        if bad_rows_file is not None:
+            bad_handle = open(bad_rows_file, "w", newline="", encoding="utf-8")
+            bad_writer = csv.writer(bad_handle)
+            bad_writer.writerow(["line", "reason"] + list(reader.fieldnames or []))
+
+        id_column = next((c for c in ID_COLUMNS if c in (reader.fieldnames or [])), None)
+
+        def add_bad_row(line: int, row: Dict[str, str], reason: str):
+            report.add_bad_row(line, reason)
+            if bad_writer is not None:
+                bad_writer.writerow([line, reason] + [row.get(f, "") for f in reader.fieldnames])
+
+        for chunk in _chunks(reader, chunk_size):
+            records = []
+            for line, row in chunk:
+                report.rows += 1
+                try:
+                    birth_date, hour = parse_birth_row(row)
+                except ValueError as e:
+                    add_bad_row(line, row, str(e))
+                    continue
+                client_id = (row.get(id_column) or "").strip() if id_column else ""
+                client_id = client_id or f"{source_name}:{line}"
+                if client_id in seen_ids:
+                    add_bad_row(line, row, f"duplicate client_id {client_id!r} (first on line {seen_ids[client_id]})")
+                    continue
+                seen_ids[client_id] = line
+                try:
+                    records.append(build_profile_record(client_id, birth_date, hour))
+                except Exception as e:
+                    add_bad_row(line, row, f"engine error: {type(e).__name__}: {e}")
+
+            with repository.batch():
+                for record in records:
+                    repository.put(record, record["client_id"])
+            report.imported += len(records)
+            report.tick()
+            if progress is not None:
+                progress(report)
+    finally:
+        if handle is not source:
+            handle.close()
+        if bad_handle is not None:
+            bad_handle.close()
+        if repository is not output:
+            repository.close()
+
+    report.tick()
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import client BaZi profiles from a CSV")
+    parser.add_argument("csv", type=Path, help="client CSV with birth_date and birth_hour/birth_time")
+    parser.add_argument("--output", type=Path, default=CLIENTS_FILE, help="client profile repository (SQLite)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--bad-rows", type=Path, help="write rejected rows to this CSV")
+    args = parser.parse_args(argv)
+
+    def show_progress(report: ImportReport):
+        print(f"\r{report.summary()}", end="", file=sys.stderr, flush=True)
+
+    report = import_profiles(args.csv, args.output, args.chunk_size, args.bad_rows, show_progress)
+    print(file=sys.stderr)
+    print(report.summary())
+    for line, reason in report.bad_rows:
+        print(f"  line {line}: {reason}")
+    if report.bad > len(report.bad_rows):
+        print(f"  ... and {report.bad - len(report.bad_rows):,} more")
+    return 0 if report.bad == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Profile Repository Module
+Many users' BaZi profiles in one SQLite database, keyed by user id and
+indexed by Day Master, element and strength, with an in-process LRU.
+Profiles are migrated to the current schema when first read and cached
+in packed binary form beside their JSON.
+"""
+
+import copy
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.bazi_calculator import STEMS
+from utils.profile_schema import (
+    PROFILE_SCHEMA_VERSION, SCHEMA_KEY, migrate_profile, pack_profile, try_unpack_profile
+)
+
+# Get the project root directory (parent of utils folder)
+PROJECT_ROOT = Path(__file__).parent.parent
+
+REPOSITORY_DIR = PROJECT_ROOT / "data"
+REPOSITORY_FILE = REPOSITORY_DIR / "profiles.sqlite3"
+
+DEFAULT_USER_ID = "default"
+DEFAULT_MAX_ENTRIES = 256
+
+_STEMS_BY_NAME = {**{s.chinese: s for s in STEMS}, **{s.pinyin: s for s in STEMS}}
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS profiles ("
+    "user_id TEXT PRIMARY KEY, day_master TEXT, element TEXT, strength TEXT, "
+    "data TEXT NOT NULL, updated_at TEXT, packed BLOB)",
+    "CREATE INDEX IF NOT EXISTS profiles_day_master ON profiles (day_master)",
+    "CREATE INDEX IF NOT EXISTS profiles_element ON profiles (element)",
+    "CREATE INDEX IF NOT EXISTS profiles_strength ON profiles (strength)",
+]
+
+
+def profile_index_keys(profile: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """(Day Master stem in Chinese, element, strength) of a profile (migrated first)"""
+    profile = migrate_profile(profile)
+    day_master = profile["day_master"]
+    return day_master["chinese"] or None, day_master["element"] or None, profile["strength"] or None
+
+
+def merge_profile(current: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    current (any schema version) with top-level fields replaced by changes,
+    migrated to the current schema. changes are taken as current-schema
+    fields unless they carry their own schema_version.
+    """
+    merged = copy.deepcopy(migrate_profile(current))
+    merged.update(copy.deepcopy(changes))
+    merged[SCHEMA_KEY] = changes.get(SCHEMA_KEY, PROFILE_SCHEMA_VERSION)
+    return migrate_profile(merged)
+
+
+class ProfileRepository:
+    """
+    User profiles in SQLite with a bounded LRU of parsed profiles in front.
+
+    get() returns a private copy (or None); put() and update() write
+    through to the database, and inside batch() share one transaction.
+    """
+
+    def __init__(self, path: Path = REPOSITORY_FILE, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._batch_depth = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(profiles)")}
+            if "packed" not in columns:  # databases from before the packed cache
+                self._db.execute("ALTER TABLE profiles ADD COLUMN packed BLOB")
+            self._db.commit()
+        return self._db
+
+    def _commit(self):
+        if self._batch_depth == 0:
+            self._connect().commit()
+
+    def _remember(self, user_id: str, profile: Dict[str, Any]):
+        self._entries[user_id] = profile
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        profile = self._entries.get(user_id)
+        if profile is not None:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return profile
+        self.misses += 1
+        row = self._connect().execute("SELECT packed, data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        profile = try_unpack_profile(row[0])
+        if profile is None:
+            # Stored before the current schema: migrate once and save back
+            profile = migrate_profile(json.loads(row[1]))
+            self._write(user_id, profile)
+            self._commit()
+        self._remember(user_id, profile)
+        return profile
+
+    def get(self, user_id: str = DEFAULT_USER_ID) -> Optional[Dict[str, Any]]:
+        """A copy of the user's profile, or None if there is none"""
+        with self._lock:
+            profile = self._get(user_id)
+            return copy.deepcopy(profile) if profile is not None else None
+
+    def _write(self, user_id: str, profile: Dict[str, Any]):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, *profile_index_keys(profile), json.dumps(profile, ensure_ascii=False),
+             datetime.now().isoformat(timespec="seconds"), pack_profile(profile))
+        )
+
+    def put(self, profile: Dict[str, Any], user_id: str = DEFAULT_USER_ID):
+        """Insert or replace the user's profile (migrated to the current schema)"""
+        profile = copy.deepcopy(migrate_profile(profile))
+        with self._lock:
+            self._write(user_id, profile)
+            self._commit()
+            self._remember(user_id, profile)
+
+    def update(self, changes: Dict[str, Any], user_id: str = DEFAULT_USER_ID,
+               default: Optional[Callable[[], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Set top-level fields (starting from default() if the user has no
+        profile); returns a copy. See merge_profile() for the schema of changes.
+        """
+        with self._lock:
+            current = self._get(user_id)
+            if current is None:
+                current = default() if default is not None else {}
+            self.put(merge_profile(current, changes), user_id)
+            return copy.deepcopy(self._entries[user_id])
+
+    def delete(self, user_id: str) -> bool:
+        """Remove the user's profile; returns False if there was none"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            cursor = self._connect().execute("DELETE FROM profiles WHERE user_id = ?", (user_id,))
+            self._commit()
+            return cursor.rowcount > 0
+
+    @contextmanager
+    def batch(self) -> Iterator["ProfileRepository"]:
+        """Run several writes as one transaction (rolled back on error)"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                if self._batch_depth == 1:
+                    self._connect().rollback()
+                    self._entries.clear()
+                raise
+            finally:
+                self._batch_depth -= 1
+            self._commit()
+
+    def find(self, day_master: Optional[str] = None, element: Optional[str] = None,
+             strength: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Users matching the given indexed fields (Day Master as Chinese or
+        pinyin), as [{"user_id", "day_master", "element", "strength"}, ...]
+        """
+        if day_master is not None and day_master in _STEMS_BY_NAME:
+            day_master = _STEMS_BY_NAME[day_master].chinese
+        conditions, params = [], []
+        for column, value in (("day_master", day_master), ("element", element), ("strength", strength)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT user_id, day_master, element, strength FROM profiles"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY user_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [dict(zip(("user_id", "day_master", "element", "strength"), row)) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """LRU hit/miss counters and size"""
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._entries), "max_entries": self.max_entries}
+
+    def clear_cache(self):
+        """Empty the LRU (the database is untouched)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            self._entries.clear()
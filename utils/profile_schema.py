@@ -0,0 +1,279 @@
+"""
+Profile Schema Module
+Versioned BaZi profile schema: migrations that bring any saved profile
+shape up to the current version once, when it is loaded, and a compact
+binary form of migrated profiles for caching
+"""
+
+import copy
+import json
+import struct
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.bazi_calculator import STEMS, TEN_GODS, TEN_GOD_SUGGESTIONS
+from utils.mappings import ELEMENT_ORDER
+
+SCHEMA_KEY = "schema_version"
+
+# Version 1 is every unversioned profile: the nested DEFAULT_PROFILE shape,
+# the flat calculate_full_profile() shape (and older get_default_profile()) and
+# Settings-page strings like "庚 Geng" or "Metal 金".
+# Version 2 is the nested shape only, with plain element names:
+#   day_master {chinese, pinyin, element, polarity}, strength, strength_score,
+#   useful_gods / unfavorable_elements {primary, secondary, reasoning},
+#   ten_god_profile {dominant_god, profile_name, behavioral_traits},
+#   special_structures {wealth_vault, nobleman_present, other_structures, ...}
+# Other keys (settings, birth data, four_pillars, ...) are kept as they are.
+PROFILE_SCHEMA_VERSION = 2
+
+# Day Master used when a profile names none, as the app defaults to
+DEFAULT_STEM = STEMS[6]  # 庚 Geng
+
+_STEMS_BY_NAME = {**{s.chinese: s for s in STEMS}, **{s.pinyin: s for s in STEMS}}
+
+# Profile names ("Pioneer") by Ten God; gods longest first for label matching
+PROFILE_NAMES = {god: suggestion["profile"].partition(" (")[0] for god, suggestion in TEN_GOD_SUGGESTIONS.items()}
+_GODS_BY_LENGTH = sorted(TEN_GODS, key=len, reverse=True)
+
+
+# ==============================================================================
+# MIGRATIONS
+# ==============================================================================
+
+def _element_name(value: Any) -> str:
+    """Element name from "Metal" or "Metal 金" ("" if missing)"""
+    if not isinstance(value, str) or not value.strip():
+        return ""
+    return value.split()[0]
+
+
+def _pick(value: Any, index: int, key: str) -> str:
+    """The index-th entry of a list, or value[key] of a dict"""
+    if isinstance(value, dict):
+        return _element_name(value.get(key, ""))
+    if isinstance(value, (list, tuple)):
+        return _element_name(value[index]) if len(value) > index else ""
+    return ""
+
+
+def _find_stem(*names: Any):
+    """The first stem named by "Geng", "庚", "庚 Geng" or "Geng 庚" among names"""
+    for name in names:
+        if not isinstance(name, str) or not name:
+            continue
+        for token in name.split():
+            if token in _STEMS_BY_NAME:
+                return _STEMS_BY_NAME[token]
+        if name[0] in _STEMS_BY_NAME:
+            return _STEMS_BY_NAME[name[0]]
+    return None
+
+
+def _parse_profile_label(label: Any) -> Tuple[str, str]:
+    """(dominant god, profile name) from "Pioneer 🎯 (Indirect Wealth 偏财)" or "Friend (Connector)" labels"""
+    if not isinstance(label, str) or not label:
+        return "", ""
+    god = next((g for g in _GODS_BY_LENGTH if g in label), "")
+    name = next((n for n in PROFILE_NAMES.values() if n in label), "")
+    if not name:
+        head = label.partition(" (")[0].split()
+        name = head[0] if head and head[0] != god else ""
+    return god, name
+
+
+def _migrate_v1(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Any unversioned shape -> version 2"""
+    dm = profile.pop("day_master", None)
+    chinese = profile.pop("chinese", None)
+    element = profile.pop("element", None)
+    polarity = profile.pop("polarity", None)
+    pinyin = None
+    if isinstance(dm, dict):
+        chinese = dm.get("chinese", chinese)
+        pinyin = dm.get("pinyin")
+        element = dm.get("element", element)
+        polarity = dm.get("polarity", polarity)
+        stem = _find_stem(pinyin, chinese)
+    else:
+        stem = _find_stem(dm, chinese)
+        if stem is None and isinstance(dm, str) and dm:
+            pinyin = dm
+    if stem is None and pinyin is None and not chinese:
+        stem = DEFAULT_STEM
+    day_master = {
+        "chinese": stem.chinese if stem else (chinese or ""),
+        "pinyin": stem.pinyin if stem else (pinyin or ""),
+        "element": _element_name(element) or (stem.element if stem else ""),
+        "polarity": polarity or (stem.polarity if stem else ""),
+    }
+
+    useful = profile.pop("useful_gods", [])
+    useful_reasoning = profile.pop("useful_gods_reasoning", "")
+    unfavorable = profile.pop("unfavorable", None)
+    unfavorable_elements = profile.pop("unfavorable_elements", [])
+    if unfavorable is None:
+        unfavorable = unfavorable_elements
+    unfavorable_reasoning = profile.pop("unfavorable_reasoning", "")
+
+    ten_god = profile.pop("ten_god_profile", None)
+    ten_god = dict(ten_god) if isinstance(ten_god, dict) else {}
+    label_god, label_name = _parse_profile_label(profile.pop("profile", None))
+    dominant_god = profile.pop("dominant_god", None) or ten_god.get("dominant_god") or label_god
+    ten_god.update({
+        "dominant_god": dominant_god,
+        "profile_name": ten_god.get("profile_name") or label_name or PROFILE_NAMES.get(dominant_god, ""),
+        "behavioral_traits": ten_god.get("behavioral_traits", profile.pop("traits", [])),
+    })
+
+    special = profile.pop("special_structures", None)
+    special = dict(special) if isinstance(special, dict) else {}
+    flat_vault = profile.pop("wealth_vault", False)
+    flat_nobleman = profile.pop("nobleman", False)
+    flat_other = profile.pop("structures", [])
+    wealth_vault = special.pop("wealth_vault", flat_vault)
+    nobleman = special.pop("nobleman", flat_nobleman)
+    nobleman = special.pop("nobleman_present", nobleman)
+    other = special.pop("other", flat_other)
+    other = special.pop("other_structures", other)
+
+    migrated = {
+        SCHEMA_KEY: 2,
+        "day_master": day_master,
+        "strength": profile.pop("strength", "") or "",
+        "strength_score": profile.pop("strength_score", 5),
+        "useful_gods": {
+            **(useful if isinstance(useful, dict) else {}),
+            "primary": _pick(useful, 0, "primary"),
+            "secondary": _pick(useful, 1, "secondary"),
+            "reasoning": useful.get("reasoning", useful_reasoning) if isinstance(useful, dict) else useful_reasoning,
+        },
+        "unfavorable_elements": {
+            **(unfavorable if isinstance(unfavorable, dict) else {}),
+            "primary": _pick(unfavorable, 0, "primary"),
+            "secondary": _pick(unfavorable, 1, "secondary"),
+            "reasoning": unfavorable.get("reasoning", unfavorable_reasoning) if isinstance(unfavorable, dict)
+            else unfavorable_reasoning,
+        },
+        "ten_god_profile": ten_god,
+        "special_structures": {
+            "wealth_vault": bool(wealth_vault),
+            "nobleman_present": bool(nobleman),
+            "other_structures": list(other or []),
+            **special,
+        },
+    }
+    profile.pop(SCHEMA_KEY, None)
+    migrated.update(profile)
+    return migrated
+
+
+# Migration from each version to the next, by source version
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    1: _migrate_v1,
+}
+
+
+def profile_version(profile: Dict[str, Any]) -> int:
+    """Schema version of a profile (1 for unversioned profiles)"""
+    return profile.get(SCHEMA_KEY, 1)
+
+
+def migrate_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bring a profile up to PROFILE_SCHEMA_VERSION. A current profile is
+    returned as is; older ones are migrated on a copy. Raises ValueError
+    for versions newer than this code knows.
+    """
+    version = profile_version(profile)
+    if version == PROFILE_SCHEMA_VERSION:
+        return profile
+    if not isinstance(version, int) or version > PROFILE_SCHEMA_VERSION or version < 1:
+        raise ValueError(f"Unsupported profile schema version: {version!r}")
+    profile = copy.deepcopy(profile)
+    while version < PROFILE_SCHEMA_VERSION:
+        profile = MIGRATIONS[version](profile)
+        version = profile[SCHEMA_KEY]
+    return profile
+
+
+# ==============================================================================
+# BINARY FORM
+# ==============================================================================
+
+# Fields stored as one signed byte each: an index into the value table, or
+# -1 if the value is not in the table and follows the JSON remainder, in order
+_ELEMENTS = tuple(ELEMENT_ORDER) + ("",)
+# (section, or None for top-level fields, key, value table)
+_PACKED_FIELDS = (
+    ("day_master", "chinese", tuple(s.chinese for s in STEMS) + ("",)),
+    ("day_master", "pinyin", tuple(s.pinyin for s in STEMS) + ("",)),
+    ("day_master", "element", _ELEMENTS),
+    ("day_master", "polarity", ("Yang", "Yin", "")),
+    (None, "strength", ("Weak", "Balanced", "Strong", "Extremely Weak", "Extremely Strong", "")),
+    (None, "strength_score", tuple(range(11))),
+    ("useful_gods", "primary", _ELEMENTS),
+    ("useful_gods", "secondary", _ELEMENTS),
+    ("unfavorable_elements", "primary", _ELEMENTS),
+    ("unfavorable_elements", "secondary", _ELEMENTS),
+    ("ten_god_profile", "dominant_god", tuple(TEN_GODS) + ("",)),
+    ("ten_god_profile", "profile_name", tuple(PROFILE_NAMES[god] for god in TEN_GODS) + ("",)),
+    ("special_structures", "wealth_vault", (False, True)),
+    ("special_structures", "nobleman_present", (False, True)),
+)
+# Keyed by (type, value) so that True, 1 and 1.0 stay distinct
+_PACKED_CODES = [{(type(value), value): code for code, value in enumerate(table)} for _, _, table in _PACKED_FIELDS]
+
+PACKED_MAGIC = b"BZ"
+_HEADER = struct.Struct(f"<2sB{len(_PACKED_FIELDS)}b")
+
+
+def pack_profile(profile: Dict[str, Any]) -> bytes:
+    """
+    Compact binary form of a profile (migrated first): a header with the
+    schema version and one byte per coded field, then the remaining
+    fields as compact JSON. unpack_profile() restores it exactly.
+    """
+    rest = copy.deepcopy(migrate_profile(profile))
+    del rest[SCHEMA_KEY]
+    codes = []
+    uncoded = []
+    for (section, key, _), table_codes in zip(_PACKED_FIELDS, _PACKED_CODES):
+        value = (rest[section] if section else rest).pop(key)
+        try:
+            code = table_codes.get((type(value), value), -1)
+        except TypeError:  # unhashable
+            code = -1
+        if code < 0:
+            uncoded.append(value)
+        codes.append(code)
+    body = json.dumps([rest, *uncoded], ensure_ascii=False, separators=(",", ":"))
+    return _HEADER.pack(PACKED_MAGIC, PROFILE_SCHEMA_VERSION, *codes) + body.encode("utf-8")
+
+
+def unpack_profile(data: bytes) -> Dict[str, Any]:
+    """
+    Profile from pack_profile() bytes. Raises ValueError for bytes that
+    are not a packed profile or were packed under another schema version.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Not a packed profile")
+    magic, version, *codes = _HEADER.unpack_from(data)
+    if magic != PACKED_MAGIC:
+        raise ValueError("Not a packed profile")
+    if version != PROFILE_SCHEMA_VERSION:
+        raise ValueError(f"Packed profile has schema version {version}, expected {PROFILE_SCHEMA_VERSION}")
+    profile, *uncoded = json.loads(bytes(data[_HEADER.size:]))
+    uncoded.reverse()
+    for (section, key, table), code in zip(_PACKED_FIELDS, codes):
+        (profile[section] if section else profile)[key] = table[code] if code >= 0 else uncoded.pop()
+    return {SCHEMA_KEY: PROFILE_SCHEMA_VERSION, **profile}
+
+
+def try_unpack_profile(data: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """unpack_profile(), or None for missing, stale or unreadable bytes"""
+    if not data:
+        return None
+    try:
+        return unpack_profile(data)
+    except (ValueError, KeyError, IndexError, TypeError, struct.error):
+        return None
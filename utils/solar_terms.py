@@ -0,0 +1,232 @@
+"""
+Solar Terms Module
+Precomputed start instants of the 24 solar terms (节气) for 1900-2100,
+stored as a compact binary table and looked up by bisection.
+
+Instants are minutes since 1900-01-01 00:00 China Standard Time (UTC+8),
+as little-endian int32, 24 per year starting from 小寒. The table ships as
+solar_terms.bin and can be rebuilt with `python -m utils.solar_terms`.
+"""
+
+import sys
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import Optional, Tuple
+
+FIRST_YEAR = 1900
+LAST_YEAR = 2100
+TERMS_PER_YEAR = 24
+
+# Terms in table order, with the sun's apparent longitude (degrees) at each
+TERM_NAMES = [
+    "小寒", "大寒", "立春", "雨水", "惊蛰", "春分",
+    "清明", "谷雨", "立夏", "小满", "芒种", "夏至",
+    "小暑", "大暑", "立秋", "处暑", "白露", "秋分",
+    "寒露", "霜降", "立冬", "小雪", "大雪", "冬至",
+]
+TERM_LONGITUDES = [(285 + 15 * i) % 360 for i in range(TERMS_PER_YEAR)]
+
+# Term numbers of the year and month boundaries used by the pillars
+LICHUN = 2  # 立春 - start of the BaZi year
+
+TABLE_FILE = Path(__file__).parent / "solar_terms.bin"
+
+# Table epoch and time zone
+EPOCH = datetime(1900, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+CST = dt_timezone(timedelta(hours=8))
+
+_TERMS: Optional[array] = None
+
+
+# ==============================================================================
+# TABLE GENERATION
+# ==============================================================================
+
+# Earth heliocentric longitude, truncated VSOP87D series (Meeus, Appendix III)
+# Each series: (amplitude x 1e-8 rad, phase rad, frequency rad/millennium)
+_VSOP_L = [
+    [
+        (175347046, 0, 0), (3341656, 4.6692568, 6283.07585), (34894, 4.6261, 12566.1517),
+        (3497, 2.7441, 5753.3849), (3418, 2.8289, 3.5231), (3136, 3.6277, 77713.7715),
+        (2676, 4.4181, 7860.4194), (2343, 6.1352, 3930.2097), (1324, 0.7425, 11506.7698),
+        (1273, 2.0371, 529.691), (1199, 1.1096, 1577.3435), (990, 5.233, 5884.927),
+        (902, 2.045, 26.298), (857, 3.508, 398.149), (780, 1.179, 5223.694),
+        (753, 2.533, 5507.553), (505, 4.583, 18849.228), (492, 4.205, 775.523),
+        (357, 2.92, 0.067), (317, 5.849, 11790.629), (284, 1.899, 796.298),
+        (271, 0.315, 10977.079), (243, 0.345, 5486.778), (206, 4.806, 2544.314),
+        (205, 1.869, 5573.143), (202, 2.458, 6069.777), (156, 0.833, 213.299),
+        (132, 3.411, 2942.463), (126, 1.083, 20.775), (115, 0.645, 0.98),
+        (103, 0.636, 4694.003), (102, 0.976, 15720.839), (102, 4.267, 7.114),
+        (99, 6.21, 2146.17), (98, 0.68, 155.42), (86, 5.98, 161000.69),
+        (85, 1.3, 6275.96), (85, 3.67, 71430.7), (80, 1.81, 17260.15),
+        (79, 3.04, 12036.46), (75, 1.76, 5088.63), (74, 3.5, 3154.69),
+        (74, 4.68, 801.82), (70, 0.83, 9437.76), (62, 3.98, 8827.39),
+        (61, 1.82, 7084.9), (57, 2.78, 6286.6), (56, 4.39, 14143.5),
+        (56, 3.47, 6279.55), (52, 0.19, 12139.55), (52, 1.33, 1748.02),
+        (51, 0.28, 5856.48), (49, 0.49, 1194.45), (41, 5.37, 8429.24),
+        (41, 2.4, 19651.05), (39, 6.17, 10447.39), (37, 6.04, 10213.29),
+        (37, 2.57, 1059.38), (36, 1.71, 2352.87), (36, 1.78, 6812.77),
+        (33, 0.59, 17789.85), (30, 0.44, 83996.85), (30, 2.74, 1349.87),
+        (25, 3.16, 4690.48),
+    ],
+    [
+        (628331966747, 0, 0), (206059, 2.678235, 6283.07585), (4303, 2.6351, 12566.1517),
+        (425, 1.59, 3.523), (119, 5.796, 26.298), (109, 2.966, 1577.344),
+        (93, 2.59, 18849.23), (72, 1.14, 529.69), (68, 1.87, 398.15),
+        (67, 4.41, 5507.55), (59, 2.89, 5223.69), (56, 2.17, 155.42),
+        (45, 0.4, 796.3), (36, 0.47, 775.52), (29, 2.65, 7.11),
+        (21, 5.34, 0.98), (19, 1.85, 5486.78), (19, 4.97, 213.3),
+        (17, 2.99, 6275.96), (16, 0.03, 2544.31), (16, 1.43, 2146.17),
+        (15, 1.21, 10977.08), (12, 2.83, 1748.02), (12, 3.26, 5088.63),
+        (12, 5.27, 1194.45), (12, 2.08, 4694.0), (11, 0.77, 553.57),
+        (10, 1.3, 6286.6), (10, 4.24, 1349.87), (9, 2.7, 242.73),
+        (9, 5.64, 951.72), (8, 5.3, 2352.87), (6, 2.65, 9437.76),
+        (6, 4.67, 4690.48),
+    ],
+    [
+        (52919, 0, 0), (8720, 1.0721, 6283.0758), (309, 0.867, 12566.152),
+        (27, 0.05, 3.52), (16, 5.19, 26.3), (16, 3.68, 155.42),
+        (10, 0.76, 18849.23), (9, 2.06, 77713.77), (7, 0.83, 775.52),
+        (5, 4.66, 1577.34), (4, 1.03, 7.11), (4, 3.44, 5573.14),
+        (3, 5.14, 796.3), (3, 6.05, 5507.55), (3, 1.19, 242.73),
+        (3, 6.12, 529.69), (3, 0.31, 398.15), (3, 2.28, 553.57),
+        (2, 4.38, 5223.69), (2, 3.75, 0.98),
+    ],
+    [
+        (289, 5.844, 6283.076), (35, 0, 0), (17, 5.49, 12566.15),
+        (3, 5.2, 155.42), (1, 4.72, 3.52), (1, 5.3, 18849.23),
+        (1, 5.97, 242.73),
+    ],
+    [(114, 3.142, 0), (8, 4.13, 6283.08), (1, 3.84, 12566.15)],
+    [(1, 3.14, 0)],
+]
+
+JD_EPOCH_UT = 2415020.5 - 8 / 24  # Julian Day of the table epoch (UTC)
+J2000 = 2451545.0
+TROPICAL_YEAR = 365.242189
+
+
+def _delta_t_days(year):
+    """Approximate TT - UT (days), Morrison & Stephenson long-term parabola"""
+    u = (year - 1820) / 100
+    return (-20 + 32 * u * u) / 86400
+
+
+def _apparent_solar_longitude(jd_ut):
+    """Apparent geocentric longitude of the sun (degrees) for Julian Day(s) UT"""
+    import numpy as np
+
+    jd_tt = jd_ut + _delta_t_days((jd_ut - J2000) / 365.25 + 2000)
+    tau = (jd_tt - J2000) / 365250
+    heliocentric = sum(
+        tau ** power * sum(a * np.cos(b + c * tau) for a, b, c in series)
+        for power, series in enumerate(_VSOP_L)
+    ) / 1e8
+
+    t = tau * 10
+    omega = np.radians(125.04452 - 1934.136261 * t)
+    sun_mean = np.radians(280.4665 + 36000.7698 * t)
+    moon_mean = np.radians(218.3165 + 481267.8813 * t)
+    nutation = (-17.20 * np.sin(omega) - 1.32 * np.sin(2 * sun_mean)
+                - 0.23 * np.sin(2 * moon_mean) + 0.21 * np.sin(2 * omega))
+
+    # Geocentric = heliocentric + 180 deg; FK5 correction and aberration in arcseconds
+    longitude = np.degrees(heliocentric) + 180 + (-0.09033 + nutation - 20.4898) / 3600
+    return longitude % 360
+
+
+def compute_term_minutes(first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR) -> array:
+    """Solve for every term instant in [first_year, last_year] (table format)"""
+    import numpy as np
+
+    years = np.repeat(np.arange(first_year, last_year + 1), TERMS_PER_YEAR)
+    terms = np.tile(np.arange(TERMS_PER_YEAR), last_year - first_year + 1)
+    targets = np.array(TERM_LONGITUDES, dtype=float)[terms]
+
+    # Start from 小寒 ~ Jan 6 and half a month per term, then Newton-iterate
+    jan1 = np.array([datetime(y, 1, 1).toordinal() - EPOCH_ORDINAL for y in years], dtype=float)
+    jd = JD_EPOCH_UT + jan1 + 5.5 + terms * TROPICAL_YEAR / TERMS_PER_YEAR
+    for _ in range(6):
+        error = (targets - _apparent_solar_longitude(jd) + 180) % 360 - 180
+        jd = jd + error * TROPICAL_YEAR / 360
+
+    return array("i", np.floor((jd - JD_EPOCH_UT) * 1440).astype(int).tolist())
+
+
+def build_table_file(path: Path = TABLE_FILE) -> int:
+    """Write the term table to disk; returns the number of instants"""
+    terms = compute_term_minutes()
+    if sys.byteorder != "little":
+        terms.byteswap()
+    path.write_bytes(terms.tobytes())
+    return len(terms)
+
+
+# ==============================================================================
+# LOOKUP
+# ==============================================================================
+
+def load_table() -> array:
+    """The term table (minutes since EPOCH, CST), read from disk on first use"""
+    global _TERMS
+    if _TERMS is None:
+        terms = array("i")
+        expected = (LAST_YEAR - FIRST_YEAR + 1) * TERMS_PER_YEAR
+        try:
+            terms.frombytes(TABLE_FILE.read_bytes())
+            if sys.byteorder != "little":
+                terms.byteswap()
+        except OSError:
+            pass
+        if len(terms) != expected:
+            terms = compute_term_minutes()
+        _TERMS = terms
+    return _TERMS
+
+
+def to_minutes(dt: datetime) -> int:
+    """Minutes since EPOCH in China Standard Time (naive datetimes are taken as CST)"""
+    if getattr(dt, "tzinfo", None) is not None:
+        dt = dt.astimezone(CST).replace(tzinfo=None)
+    return (dt.toordinal() - EPOCH_ORDINAL) * 1440 + getattr(dt, "hour", 0) * 60 + getattr(dt, "minute", 0)
+
+
+def table_end() -> int:
+    """First minute after the table's coverage (小寒 of LAST_YEAR + 1, approximately)"""
+    return load_table()[-1] + 14 * 1440
+
+
+def term_position(dt) -> Optional[int]:
+    """Table position of the term in effect at dt, or None outside the table"""
+    terms = load_table()
+    minutes = to_minutes(dt)
+    if minutes < terms[0] or minutes >= table_end():
+        return None
+    return bisect_right(terms, minutes) - 1
+
+
+def term_at(dt) -> Optional[Tuple[int, int]]:
+    """(calendar year, term number 0-23 from 小寒) in effect at dt, or None outside the table"""
+    position = term_position(dt)
+    if position is None:
+        return None
+    return FIRST_YEAR + position // TERMS_PER_YEAR, position % TERMS_PER_YEAR
+
+
+def bazi_year_and_month(year: int, term: int) -> Tuple[int, int]:
+    """BaZi year and Chinese month (0 = 寅 ... 11 = 丑) from a term_at() result"""
+    return year - (term < LICHUN), (term - LICHUN) // 2 % 12
+
+
+def term_start(year: int, term: int) -> datetime:
+    """Start instant (naive CST) of a term in a year"""
+    minutes = load_table()[(year - FIRST_YEAR) * TERMS_PER_YEAR + term]
+    return EPOCH + timedelta(minutes=minutes)
+
+
+if __name__ == "__main__":
+    count = build_table_file()
+    print(f"Wrote {count} solar term instants to {TABLE_FILE}")
@@ -0,0 +1,119 @@
+"""
+Ten Gods Module
+Ten God (十神) labels of every stem and hidden stem for arrays of charts
+in one indexed pass, with dominant gods for ranking many clients
+"""
+
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from utils.bazi_calculator import (
+    HIDDEN_STEMS, STEM_INDEX, TEN_GODS, TEN_GOD_CODES, TEN_GOD_TABLE,
+    TEN_GOD_STEM_WEIGHTS, TEN_GOD_BRANCH_WEIGHTS, PILLAR_NAMES,
+    calculate_bazi_batch, parse_pillar
+)
+
+NO_GOD = -1  # padding for missing hidden stems and the Day Master's own stem
+
+# By [day master stem][other stem]
+TEN_GOD_MATRIX = np.array(TEN_GOD_TABLE, dtype=np.int8)
+
+# Hidden stems by [branch][slot], padded with -1 (stem) and 0.0 (weight)
+MAX_HIDDEN = max(len(hidden) for hidden in HIDDEN_STEMS)
+HIDDEN_STEM_CODES = np.full((12, MAX_HIDDEN), -1, dtype=np.int8)
+HIDDEN_STEM_WEIGHTS = np.zeros((12, MAX_HIDDEN))
+for _branch, _hidden in enumerate(HIDDEN_STEMS):
+    for _slot, (_stem, _weight) in enumerate(_hidden):
+        HIDDEN_STEM_CODES[_branch, _slot] = STEM_INDEX[_stem]
+        HIDDEN_STEM_WEIGHTS[_branch, _slot] = _weight
+del _branch, _hidden, _slot, _stem, _weight
+
+
+def label_ten_gods(pillars: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Ten God codes (into TEN_GODS) for a batch of charts (calculate_bazi_batch() output).
+
+    Returns "stems" (n, 4) by pillar with the day column set to -1,
+    "hidden_stems" (n, 4, MAX_HIDDEN) padded with -1, weighted "scores"
+    (n, 10) and the "dominant" god code (n,) of every chart. Scores add
+    up in the same order as calculate_ten_gods(), so both agree exactly.
+    """
+    dm = pillars["day_stem"].astype(np.intp)
+    n = len(dm)
+    stems = np.full((n, 4), NO_GOD, dtype=np.int8)
+    hidden = np.full((n, 4, MAX_HIDDEN), NO_GOD, dtype=np.int8)
+    scores = np.zeros((n, 10))
+    rows = np.arange(n)
+
+    for position, name in enumerate(PILLAR_NAMES):
+        if TEN_GOD_STEM_WEIGHTS[position]:
+            gods = TEN_GOD_MATRIX[dm, pillars[f"{name}_stem"]]
+            stems[:, position] = gods
+            scores[rows, gods] += TEN_GOD_STEM_WEIGHTS[position]
+
+        branch = pillars[f"{name}_branch"].astype(np.intp)
+        for slot in range(MAX_HIDDEN):
+            codes = HIDDEN_STEM_CODES[branch, slot]
+            present = codes >= 0
+            gods = np.where(present, TEN_GOD_MATRIX[dm, codes], NO_GOD)
+            hidden[:, position, slot] = gods
+            scores[rows[present], gods[present]] += TEN_GOD_BRANCH_WEIGHTS[position] * HIDDEN_STEM_WEIGHTS[branch[present], slot]
+
+    return {
+        "stems": stems,
+        "hidden_stems": hidden,
+        "scores": scores,
+        "dominant": scores.argmax(axis=1).astype(np.int8),
+    }
+
+
+def ten_gods_for_births(birth_dates, birth_hours=12) -> Dict[str, np.ndarray]:
+    """label_ten_gods() straight from arrays of birth dates and hours"""
+    return label_ten_gods(calculate_bazi_batch(birth_dates, birth_hours))
+
+
+def pillars_from_profiles(profiles: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Pillar index arrays from saved profiles with "four_pillars" display
+    strings ({"year": "甲子", ...}), as stored by calculate_full_profile()
+    """
+    values = np.zeros((len(profiles), 8), dtype=np.int8)
+    for i, profile in enumerate(profiles):
+        four_pillars = profile["four_pillars"]
+        for position, name in enumerate(PILLAR_NAMES):
+            values[i, 2 * position:2 * position + 2] = parse_pillar(four_pillars[name])
+    return {
+        f"{name}_{part}": values[:, 2 * position + offset]
+        for position, name in enumerate(PILLAR_NAMES)
+        for offset, part in enumerate(("stem", "branch"))
+    }
+
+
+def rank_by_dominant_god(
+    profiles: Sequence[Dict[str, Any]],
+    god: Optional[str] = None,
+    top: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Rank saved profiles by Ten God score.
+
+    With a god, profiles are ordered by that god's score (strongest
+    first); without one, by the score of each profile's own dominant god.
+    Returns [{"index", "dominant_god", "score"}, ...].
+    """
+    if not profiles:
+        return []
+    result = label_ten_gods(pillars_from_profiles(profiles))
+    scores = result["scores"]
+    rows = np.arange(len(scores))
+    ranked = scores[:, TEN_GOD_CODES[god]] if god else scores[rows, result["dominant"]]
+    order = np.argsort(-ranked, kind="stable")[:top]
+    return [
+        {
+            "index": int(i),
+            "dominant_god": TEN_GODS[result["dominant"][i]],
+            "score": round(float(ranked[i]), 2),
+        }
+        for i in order
+    ]
@@ -0,0 +1,180 @@
+"""
+BaZi Timeline Module
+10-year luck pillars (大运) with annual and monthly pillars across a
+lifetime, computed once per birth as compact arrays and served in pages
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Any, Iterator, List, Optional
+
+import numpy as np
+
+from utils import solar_terms
+from utils.bazi_calculator import (
+    PILLARS, calculate_bazi_batch, sexagenary_index, get_month_window
+)
+
+GENDERS = ("male", "female")
+
+DEFAULT_YEARS = 100
+DEFAULT_LUCK_PILLARS = 10
+DEFAULT_PAGE_SIZE = 10
+
+# Three days between birth and the governing solar term = one year of age
+DAYS_PER_LUCK_YEAR = 3
+
+_NO_LUCK = -1  # years before the first luck pillar starts
+
+
+def _pillar_display(stem: int, branch: int) -> str:
+    return PILLARS[sexagenary_index(int(stem), int(branch))].display
+
+
+class Timeline:
+    """
+    Luck, annual and monthly pillars for one birth, as int8 index arrays.
+
+    luck_stem / luck_branch / luck_start_age / luck_start_year: (n_luck,)
+    year / year_stem / year_branch / year_luck: (n_years,); year_luck indexes
+        the luck arrays (-1 before the first luck pillar)
+    month_stem / month_branch / month_start: (n_years, 12), months from 寅;
+        month_start is datetime64[m] CST (NaT outside the solar-term table)
+    """
+
+    def __init__(self, birth: datetime, gender: str, years: int = DEFAULT_YEARS,
+                 luck_pillars: int = DEFAULT_LUCK_PILLARS):
+        gender = gender.lower()
+        if gender not in GENDERS:
+            raise ValueError(f"Invalid gender: {gender!r} (expected 'male' or 'female')")
+        self.birth = birth
+        self.gender = gender
+
+        natal = {k: int(v[0]) for k, v in calculate_bazi_batch([birth], birth.hour).items()}
+
+        # Forward for yang-year males and yin-year females, backward otherwise
+        yang_year = natal["year_stem"] % 2 == 0
+        self.forward = yang_year == (gender == "male")
+
+        # BaZi year of birth (the calendar year, or the one before if before 立春)
+        year_index = sexagenary_index(natal["year_stem"], natal["year_branch"])
+        birth_year = birth.year - (birth.year - 1984 - year_index) % 60
+        self.birth_year = birth_year
+
+        # Start age from the distance to the next (or previous) month boundary
+        chinese_month = (natal["month_branch"] - 2) % 12
+        window_start, window_end = get_month_window(birth_year, chinese_month)
+        boundary = window_end if self.forward else window_start
+        days = abs((boundary - birth).total_seconds()) / 86400
+        self.start_age = round(days / DAYS_PER_LUCK_YEAR, 1)
+
+        # Luck pillars step through the 60 Jia Zi from the month pillar
+        step = 1 if self.forward else -1
+        month_index = sexagenary_index(natal["month_stem"], natal["month_branch"])
+        luck_index = (month_index + step * np.arange(1, luck_pillars + 1)) % 60
+        self.luck_stem = (luck_index % 10).astype(np.int8)
+        self.luck_branch = (luck_index % 12).astype(np.int8)
+        self.luck_start_age = self.start_age + 10 * np.arange(luck_pillars)
+        first_start = birth + timedelta(days=self.start_age * 365.2425)
+        self.luck_start_year = (first_start.year + 10 * np.arange(luck_pillars)).astype(np.int16)
+
+        # Annual pillars (ages by calendar year)
+        self.year = birth_year + np.arange(years, dtype=np.int16)
+        year_offset = (self.year.astype(np.int64) - 1984) % 60
+        self.year_stem = (year_offset % 10).astype(np.int8)
+        self.year_branch = (year_offset % 12).astype(np.int8)
+        year_luck = (self.year.astype(np.int64) - first_start.year) // 10
+        self.year_luck = np.where(
+            (year_luck >= 0) & (year_luck < luck_pillars), year_luck, _NO_LUCK
+        ).astype(np.int8)
+
+        # Monthly pillars (五虎遁) and their start instants
+        months = np.arange(12)
+        self.month_stem = (((self.year_stem[:, None] % 5) * 2 + 2 + months) % 10).astype(np.int8)
+        self.month_branch = np.broadcast_to(((months + 2) % 12).astype(np.int8), (years, 12))
+
+        terms = np.asarray(solar_terms.load_table(), dtype=np.int64)
+        positions = ((self.year[:, None].astype(np.int64) - solar_terms.FIRST_YEAR)
+                     * solar_terms.TERMS_PER_YEAR + solar_terms.LICHUN + 2 * months)
+        covered = (positions >= 0) & (positions < len(terms))
+        minutes = terms[np.clip(positions, 0, len(terms) - 1)]
+        epoch = np.datetime64(solar_terms.EPOCH, "m")
+        self.month_start = np.where(
+            covered, epoch + minutes.astype("timedelta64[m]"), np.datetime64("NaT", "m")
+        )
+
+    def __len__(self) -> int:
+        return len(self.year)
+
+    def page_count(self, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+        return -(-len(self) // page_size)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """One year of the timeline as display data"""
+        luck = int(self.year_luck[i])
+        month_start = self.month_start[i]
+        return {
+            "year": int(self.year[i]),
+            "age": int(self.year[i]) - self.birth_year,
+            "pillar": _pillar_display(self.year_stem[i], self.year_branch[i]),
+            "luck_pillar": _pillar_display(self.luck_stem[luck], self.luck_branch[luck]) if luck >= 0 else None,
+            "months": [
+                {
+                    "pillar": _pillar_display(self.month_stem[i, m], self.month_branch[i, m]),
+                    "start": None if np.isnat(month_start[m]) else month_start[m].astype(datetime),
+                }
+                for m in range(12)
+            ],
+        }
+
+    def page(self, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """Rows for one page (0-based); only these rows are decoded"""
+        start = page * page_size
+        return [self.row(i) for i in range(start, min(start + page_size, len(self)))]
+
+    def iter_pages(self, page_size: int = DEFAULT_PAGE_SIZE, start_page: int = 0) -> Iterator[List[Dict[str, Any]]]:
+        """Lazily stream pages of rows"""
+        page = start_page
+        while page * page_size < len(self):
+            yield self.page(page, page_size)
+            page += 1
+
+    def luck_pillars(self) -> List[Dict[str, Any]]:
+        """The luck pillars with start ages and calendar years"""
+        return [
+            {
+                "pillar": _pillar_display(self.luck_stem[k], self.luck_branch[k]),
+                "start_age": float(self.luck_start_age[k]),
+                "start_year": int(self.luck_start_year[k]),
+            }
+            for k in range(len(self.luck_stem))
+        ]
+
+
+@lru_cache(maxsize=256)
+def _cached_timeline(birth: datetime, gender: str, years: int) -> Timeline:
+    return Timeline(birth, gender, years)
+
+
+def get_timeline(birth: datetime, gender: str, years: int = DEFAULT_YEARS) -> Timeline:
+    """Timeline for a birth datetime (to the hour) and gender, built once and cached"""
+    return _cached_timeline(birth.replace(minute=0, second=0, microsecond=0), gender.lower(), years)
+
+
+def clear_timeline_cache():
+    """Drop all cached timelines"""
+    _cached_timeline.cache_clear()
+
+
+def get_profile_timeline(profile: Dict[str, Any], gender: Optional[str] = None,
+                         years: int = DEFAULT_YEARS) -> Optional[Timeline]:
+    """
+    Timeline for a saved profile with "birth_date" (ISO) and "birth_time"
+    ("HH:MM"). Returns None if the profile has no birth data or gender.
+    """
+    gender = gender or profile.get("gender")
+    if not profile.get("birth_date") or not gender:
+        return None
+    birth = datetime.fromisoformat(profile["birth_date"])
+    hour = int(str(profile.get("birth_time") or "12:00").split(":")[0])
+    return get_timeline(birth.replace(hour=hour), gender, years)